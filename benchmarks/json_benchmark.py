@@ -0,0 +1,65 @@
+import argparse
+import csv
+import os
+import sys
+import time
+from synthetic_ual import UAL_HEADERS, SyntheticUAL
+
+PARSER_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "parser", "Parser")
+sys.path.insert(0, PARSER_DIR)
+from json_backend import BACKEND_LOADERS, available_backends
+
+csv.field_size_limit(2**31 - 1)
+
+AUDIT_DATA_INDEX = UAL_HEADERS.index("AuditData")
+
+
+def build_samples(count=2000, seed=1213):
+    """
+    AuditData strings of synthetic UAL records, the same mix of operations the
+    pipeline benchmarks use.
+    """
+    return [row[AUDIT_DATA_INDEX] for row in SyntheticUAL(seed=seed).rows(count)]
+
+
+def load_samples(input_file, limit):
+    samples = []
+    with open(input_file, 'r', encoding='utf-8', newline='') as file:
+        reader = csv.reader(file)
+        audit_data_index = next(reader).index("AuditData")
+        for line in reader:
+            if len(line) > audit_data_index:
+                samples.append(line[audit_data_index])
+            if len(samples) >= limit:
+                break
+    return samples
+
+
+def run_benchmark(samples, repeat=5):
+    total_bytes = sum(len(s.encode('utf-8')) for s in samples)
+    results = []
+    for name in available_backends():
+        loads, _ = BACKEND_LOADERS[name]()
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for s in samples:
+                loads(s)
+            best = min(best, time.perf_counter() - start)
+        results.append((name, total_bytes / best / 1e6, len(samples) / best))
+    return total_bytes, results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure AuditData decode throughput per JSON backend.")
+    parser.add_argument("--input", help="UAL CSV to sample AuditData from (default: synthetic records)")
+    parser.add_argument("--samples", type=int, default=2000, help="Number of AuditData records to decode")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per backend; the best run is reported")
+    args = parser.parse_args()
+
+    samples = load_samples(args.input, args.samples) if args.input else build_samples(args.samples)
+    total_bytes, results = run_benchmark(samples, repeat=args.repeat)
+
+    print(f"📄 {len(samples)} AuditData records, {total_bytes / 1e6:.1f} MB")
+    for name, mb_per_s, records_per_s in results:
+        print(f"   {name:<8} {mb_per_s:8.1f} MB/s {records_per_s:12,.0f} records/s")
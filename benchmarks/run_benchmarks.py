@@ -0,0 +1,159 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import pyarrow.parquet as pq
+import yaml
+from synthetic_ual import write_suspicious_workbook, write_ual_csv
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PARSER_DIR = os.path.join(REPO_ROOT, "parser", "Parser")
+PARSER_SCRIPT = os.path.join(PARSER_DIR, "ual-file-parser-final-withAuditData.py")
+IP_PARSER_SCRIPT = os.path.join(PARSER_DIR, "IP-parser.py")
+GEO_FILES = ["GeoLite2-City.mmdb", "GeoLite2-ASN.mmdb", "msft-public-ips.csv"]
+
+STAGES = ["parser", "ip", "rules", "matcher", "db"]
+
+
+def run_stage(command, env=None, cwd=None):
+    """
+    Run one stage in a child process. Returns (seconds, peak RSS in MB or None).
+    The peak is the largest resident set of the stage process or any worker it waited for.
+    """
+    start = time.perf_counter()
+    process = subprocess.Popen(command, env=env, cwd=cwd)
+    if hasattr(os, "wait4"):
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        peak_mb = usage.ru_maxrss / 1024 if sys.platform != "darwin" else usage.ru_maxrss / 1024 ** 2
+    else:
+        process.wait()
+        peak_mb = None
+    elapsed = time.perf_counter() - start
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, command)
+    return elapsed, peak_mb
+
+
+def run_in_child(stage, config_file):
+    # Entry point of the rules/matcher/db stages inside their own process
+    sys.path.insert(0, REPO_ROOT)
+    with open(config_file, 'r') as f:
+        config = yaml.safe_load(f)
+    if stage == "rules":
+        from scripts.rules_engine import run_rules
+        run_rules(config)
+    elif stage == "matcher":
+        from scripts.matcher import run_matcher
+        run_matcher(config)
+    elif stage == "db":
+        from database.database import load_dataframes_to_postgres
+        load_dataframes_to_postgres(config)
+
+
+def prepare_case(workdir, rows, seed, db_uri):
+    case_dir = os.path.join(workdir, "case_bench")
+    processed_dir = os.path.join(case_dir, "processed")
+    os.makedirs(processed_dir, exist_ok=True)
+
+    input_file = os.path.join(workdir, "UAL-synthetic.csv")
+    print(f"🧪 Generating {rows} synthetic UAL records...")
+    start = time.perf_counter()
+    keys = write_ual_csv(input_file, rows, seed=seed, suspicious_every=500)
+    write_suspicious_workbook(os.path.join(processed_dir, "suspicious_bench", "suspicious_items.xlsx"), keys)
+    print(f"   {os.path.getsize(input_file) / 1e6:.1f} MB in {time.perf_counter() - start:.1f}s")
+
+    config = {
+        "paths": {"current_case": case_dir},
+        "exports": {"marked_xlsx": False},
+        "postgres": {"sqlalchemy_uri": db_uri},
+    }
+    config_file = os.path.join(workdir, "settings.yaml")
+    with open(config_file, 'w') as f:
+        yaml.dump(config, f)
+    return input_file, case_dir, config_file
+
+
+def run_benchmarks(rows, workdir, stages, workers=1, chunk_size=50000, seed=1213, db_uri=None,
+                   geo_dir=PARSER_DIR):
+    input_file, case_dir, config_file = prepare_case(workdir, rows, seed, db_uri)
+    output_file = os.path.join(case_dir, "processed", "output_accessed.parquet")
+    marked_file = os.path.join(case_dir, "processed", "output_accessed_marked.parquet")
+    missing = [f for f in GEO_FILES if not os.path.exists(os.path.join(geo_dir, f))]
+    if missing:
+        print(f"❌ Missing {', '.join(missing)} in {geo_dir} — pass --geo-dir.")
+        return []
+
+    results = []
+    for stage in stages:
+        env = os.environ.copy()
+        env["UAL_GEO_DIR"] = geo_dir
+        if stage == "parser":
+            env.update({
+                "UAL_INPUT_FILE": input_file,
+                "UAL_OUTPUT_FILE": output_file,
+                "UAL_PARSE_WORKERS": str(workers),
+                "UAL_CHUNK_SIZE": str(chunk_size),
+            })
+            env.pop("UAL_PARSE_CACHE", None)
+            command = [sys.executable, PARSER_SCRIPT]
+        elif stage == "ip":
+            env["UAL_INPUT_FILE"] = input_file
+            command = [sys.executable, IP_PARSER_SCRIPT]
+        else:
+            if stage == "db" and not db_uri:
+                print("⚠️ Skipping DB load — no --db-uri given.")
+                continue
+            if stage == "db" and not os.path.exists(marked_file):
+                print("⚠️ Skipping DB load — run the matcher stage first.")
+                continue
+            command = [sys.executable, os.path.abspath(__file__), "--stage", stage, "--config", config_file]
+
+        print(f"\n⏱️ Running stage '{stage}'...")
+        elapsed, peak_mb = run_stage(command, env=env, cwd=workdir)
+        if stage == "ip":
+            stage_rows = rows
+        else:
+            stage_rows = pq.ParquetFile(marked_file if stage == "db" else output_file).metadata.num_rows
+        results.append((stage, stage_rows, elapsed, peak_mb))
+    return results
+
+
+def print_report(results):
+    print("\n📊 Benchmark results")
+    print(f"   {'stage':<10}{'rows':>12}{'seconds':>10}{'rows/s':>14}{'peak RSS':>12}")
+    for stage, rows, elapsed, peak_mb in results:
+        peak = f"{peak_mb:,.0f} MB" if peak_mb is not None else "n/a"
+        print(f"   {stage:<10}{rows:>12,}{elapsed:>10.2f}{rows / elapsed:>14,.0f}{peak:>12}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the UAL pipeline stages on synthetic data.")
+    parser.add_argument("--rows", type=int, default=100_000, help="Number of synthetic UAL records")
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"Comma separated subset of {STAGES}")
+    parser.add_argument("--workers", type=int, default=1, help="Parser worker processes")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="Parser chunk size")
+    parser.add_argument("--seed", type=int, default=1213, help="Seed of the synthetic data")
+    parser.add_argument("--geo-dir", default=PARSER_DIR, help="Folder with the GeoLite2 databases and msft-public-ips.csv")
+    parser.add_argument("--db-uri", help="SQLAlchemy URI of a scratch Postgres database for the DB load stage")
+    parser.add_argument("--workdir", help="Directory for the generated case (default: a temporary directory)")
+    parser.add_argument("--stage", help=argparse.SUPPRESS)
+    parser.add_argument("--config", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.stage:
+        run_in_child(args.stage, args.config)
+        sys.exit(0)
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip() in STAGES]
+    if args.workdir:
+        os.makedirs(args.workdir, exist_ok=True)
+        results = run_benchmarks(args.rows, args.workdir, stages, args.workers, args.chunk_size, args.seed,
+                                 args.db_uri, args.geo_dir)
+    else:
+        with tempfile.TemporaryDirectory(prefix="ual-bench-") as workdir:
+            results = run_benchmarks(args.rows, workdir, stages, args.workers, args.chunk_size, args.seed,
+                                     args.db_uri, args.geo_dir)
+    print_report(results)
@@ -0,0 +1,236 @@
+import argparse
+import csv
+import datetime
+import json
+import os
+import random
+import pandas as pd
+
+# Header of a Microsoft-Extractor-Suite UAL export
+UAL_HEADERS = [
+    "RecordId", "CreationDate", "RecordType", "Operation", "UserId", "AuditData",
+    "ResultIndex", "ResultCount", "Identity", "IsValid", "ObjectState",
+]
+
+CREATION_DATE_FORMAT = "%d/%m/%Y %I:%M:%S %p"
+
+# (Operation, RecordType, Workload, weight)
+OPERATIONS = [
+    ("MailItemsAccessed", 50, "Exchange", 40),
+    ("UserLoggedIn", 15, "AzureActiveDirectory", 14),
+    ("UserLoginFailed", 15, "AzureActiveDirectory", 4),
+    ("FileAccessed", 6, "SharePoint", 12),
+    ("FileDownloaded", 6, "OneDrive", 5),
+    ("Send", 2, "Exchange", 6),
+    ("MoveToDeletedItems", 2, "Exchange", 4),
+    ("SearchQueryPerformed", 30, "Exchange", 4),
+    ("Update", 2, "Exchange", 5),
+    ("New-InboxRule", 1, "Exchange", 1),
+    ("Set-InboxRule", 1, "Exchange", 1),
+    ("Add member to role.", 8, "AzureActiveDirectory", 1),
+    ("Add service principal.", 8, "AzureActiveDirectory", 1),
+]
+
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4 Safari/605.1.15",
+    "Microsoft Office/16.0 (Windows NT 10.0; Microsoft Outlook 16.0.17531; Pro)",
+    "axios/1.6.7",
+]
+
+CLIENT_INFO_STRINGS = [
+    "Client=OWA;Action=ViaProxy",
+    "Client=REST;Client=RESTSystem;;",
+    "Client=MSExchangeRPC",
+    "Client=REST;;axios/1.6.7",
+]
+
+ORGANIZATION_ID = "4f2b3c1d-5e6f-4a7b-8c9d-0e1f2a3b4c5d"
+
+
+class SyntheticUAL:
+    """
+    Deterministic generator of realistic UAL export rows.
+
+    The same seed always yields the same rows, so runs are comparable across
+    machines and commits. Rows are produced one at a time, so any row count
+    can be written without holding the file in memory.
+    """
+
+    def __init__(self, seed=1213, users=200, ips=5000, ipv6_share=0.3, private_share=0.05,
+                 start=datetime.datetime(2025, 7, 1)):
+        self.rng = random.Random(seed)
+        self.start = start
+        self.users = [f"user{i:04d}@contoso.com" for i in range(users)]
+        self.ips = [self._ip(ipv6_share, private_share) for _ in range(ips)]
+        self.operations = [op[:3] for op in OPERATIONS]
+        self.weights = [op[3] for op in OPERATIONS]
+        self.sessions = {}
+
+    def _ip(self, ipv6_share, private_share):
+        rng = self.rng
+        roll = rng.random()
+        if roll < private_share:
+            return f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+        if roll < private_share + ipv6_share:
+            prefix = rng.choice(["2a00:1450:4009", "2603:10a6:20b", "2a02:c7c:{:x}".format(rng.randint(0, 0xffff))])
+            return f"{prefix}::{rng.randint(1, 0xffff):x}"
+        first = rng.choice([8, 20, 40, 52, 81, 86, 92, 104, 151, 185, 194, 212])
+        return f"{first}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}"
+
+    def _guid(self):
+        return "{:08x}-{:04x}-{:04x}-{:04x}-{:012x}".format(
+            self.rng.getrandbits(32), self.rng.getrandbits(16), self.rng.getrandbits(16),
+            self.rng.getrandbits(16), self.rng.getrandbits(48))
+
+    def _session(self, user):
+        # Users keep a session for a while before starting a new one
+        session = self.sessions.get(user)
+        if session is None or self.rng.random() < 0.02:
+            session = self.sessions[user] = self._guid()
+        return session
+
+    def _folders(self):
+        rng = self.rng
+        folders = []
+        for f in range(rng.randint(1, 4)):
+            folders.append({
+                "Id": f"LgAAAAA{rng.getrandbits(64):016x}",
+                "Path": rng.choice(["\\Inbox", "\\Sent Items", "\\Archive", "\\Inbox\\Finance"]) + f"\\{f}",
+                "FolderItems": [
+                    {
+                        "Id": f"RgAAAAA{rng.getrandbits(96):024x}",
+                        "InternetMessageId": f"<{rng.getrandbits(64):x}@mail.contoso.com>",
+                        "SizeInBytes": rng.randint(2_000, 900_000),
+                    }
+                    for _ in range(rng.randint(1, 10))
+                ],
+            })
+        return folders
+
+    def _audit_data(self, operation, record_type, workload, created, user, ip):
+        rng = self.rng
+        audit = {
+            "CreationTime": created.strftime("%Y-%m-%dT%H:%M:%S"),
+            "Id": self._guid(),
+            "Operation": operation,
+            "OrganizationId": ORGANIZATION_ID,
+            "RecordType": record_type,
+            "ResultStatus": "Succeeded",
+            "UserKey": f"10032001{rng.getrandbits(32):08X}",
+            "UserType": 0,
+            "Version": 1,
+            "Workload": workload,
+            "ClientIP": ip,
+            "UserId": user,
+        }
+        if workload == "Exchange":
+            audit.update({
+                "AppId": "00000002-0000-0ff1-ce00-000000000000",
+                "ClientAppId": "00000002-0000-0ff1-ce00-000000000000",
+                "ClientIPAddress": ip,
+                "ClientInfoString": rng.choice(CLIENT_INFO_STRINGS),
+                "ExternalAccess": False,
+                "LogonType": 0,
+                "MailboxOwnerUPN": user,
+                "SessionId": self._session(user),
+            })
+            if operation == "MailItemsAccessed":
+                folders = self._folders()
+                audit["OperationProperties"] = [
+                    {"Name": "MailAccessType", "Value": rng.choice(["Bind", "Sync"])},
+                    {"Name": "IsThrottled", "Value": "False"},
+                ]
+                audit["Folders"] = folders
+                audit["OperationCount"] = sum(len(f["FolderItems"]) for f in folders)
+            elif operation.endswith("InboxRule"):
+                audit["Parameters"] = [
+                    {"Name": "Name", "Value": rng.choice([".", "..", "RSS", "Archive"])},
+                    {"Name": "MoveToFolder", "Value": "RSS Feeds"},
+                    {"Name": "MarkAsRead", "Value": "True"},
+                ]
+            else:
+                audit["Item"] = {
+                    "Id": f"RgAAAAA{rng.getrandbits(96):024x}",
+                    "Subject": rng.choice(["Invoice", "Payment details", "Re: meeting", "Wire transfer"]),
+                    "SizeInBytes": rng.randint(2_000, 400_000),
+                }
+        elif workload == "AzureActiveDirectory":
+            audit["ExtendedProperties"] = [
+                {"Name": "ResultStatusDetail", "Value": "Success"},
+                {"Name": "UserAgent", "Value": rng.choice(USER_AGENTS)},
+                {"Name": "RequestType", "Value": "OAuth2:Authorize"},
+            ]
+            audit["Actor"] = [{"ID": self._guid(), "Type": 0}, {"ID": user, "Type": 5}]
+            audit["ActorIpAddress"] = ip
+            audit["DeviceProperties"] = [{"Name": "OS", "Value": "Windows 10"}, {"Name": "BrowserType", "Value": "Edge"}]
+            if operation == "UserLoginFailed":
+                audit["ResultStatus"] = "Failed"
+                audit["LogonError"] = "InvalidUserNameOrPassword"
+        else:
+            audit.update({
+                "EventSource": "SharePoint",
+                "ItemType": "File",
+                "UserAgent": rng.choice(USER_AGENTS),
+                "SourceFileName": f"report_{rng.randint(1, 9999)}.xlsx",
+                "SourceRelativeUrl": "Shared Documents/Finance",
+                "ObjectId": "https://contoso.sharepoint.com/sites/finance/Shared Documents/Finance/report.xlsx",
+            })
+        return audit
+
+    def rows(self, count):
+        """
+        Yield `count` UAL rows (lists matching UAL_HEADERS), in time order.
+        """
+        rng = self.rng
+        created = self.start
+        for _ in range(count):
+            created += datetime.timedelta(seconds=rng.randint(0, 4))
+            operation, record_type, workload = rng.choices(self.operations, self.weights)[0]
+            user = rng.choice(self.users)
+            ip = rng.choice(self.ips)
+            audit = self._audit_data(operation, record_type, workload, created, user, ip)
+            yield [
+                audit["Id"], created.strftime(CREATION_DATE_FORMAT), record_type, operation, user,
+                json.dumps(audit), 1, count, audit["Id"], "True", "Unchanged",
+            ]
+
+
+def write_ual_csv(output_file, rows, seed=1213, suspicious_every=0):
+    """
+    Write a synthetic UAL export. With `suspicious_every`, every n-th Exchange
+    record is also returned as a (CreationTime, SessionId) match key.
+    """
+    generator = SyntheticUAL(seed=seed)
+    suspicious = []
+    with open(output_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(UAL_HEADERS)
+        for i, row in enumerate(generator.rows(rows)):
+            writer.writerow(row)
+            if suspicious_every and i % suspicious_every == 0 and '"SessionId"' in row[5]:
+                audit = json.loads(row[5])
+                suspicious.append({"CreationTime": audit["CreationTime"], "SessionId": audit["SessionId"]})
+    return suspicious
+
+
+def write_suspicious_workbook(output_file, keys):
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    pd.DataFrame(keys, columns=["CreationTime", "SessionId"]).to_excel(output_file, index=False)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate a deterministic synthetic UAL export.")
+    parser.add_argument("--rows", type=int, default=100_000, help="Number of UAL records to generate")
+    parser.add_argument("--output", default="UAL-synthetic.csv", help="CSV file to write")
+    parser.add_argument("--seed", type=int, default=1213, help="Random seed; the same seed gives the same file")
+    parser.add_argument("--suspicious", help="Also write a suspicious-items workbook for the matcher here")
+    parser.add_argument("--suspicious-every", type=int, default=500, help="Take every n-th record as suspicious")
+    args = parser.parse_args()
+
+    keys = write_ual_csv(args.output, args.rows, seed=args.seed,
+                         suspicious_every=args.suspicious_every if args.suspicious else 0)
+    print(f"✅ Wrote {args.rows} synthetic UAL records to '{args.output}'")
+    if args.suspicious:
+        write_suspicious_workbook(args.suspicious, keys)
+        print(f"✅ Wrote {len(keys)} suspicious match keys to '{args.suspicious}'")
@@ -1,8 +1,164 @@
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
 from sqlalchemy import create_engine
+from psycopg2 import sql
 import os
+import tempfile
+import time
 import yaml
 
+# Rows read and sent per COPY batch; each batch's CSV buffer spills to disk above SPOOL_MAX_SIZE bytes
+COPY_CHUNK_SIZE = 100000
+SPOOL_MAX_SIZE = 64 * 1024 * 1024
+
+
+def postgres_type(series):
+    # Column type for a pandas column, matching what to_sql used to create
+    dtype = series.dtype
+    if dtype == object:
+        # Object columns holding only one kind of Python value keep that type
+        inferred = pd.api.types.infer_dtype(series, skipna=True)
+        if inferred == "boolean":
+            return "BOOLEAN"
+        if inferred == "integer":
+            return "BIGINT"
+        if inferred in ("floating", "mixed-integer-float"):
+            return "DOUBLE PRECISION"
+        if inferred in ("datetime64", "datetime"):
+            return "TIMESTAMP WITHOUT TIME ZONE"
+        return "TEXT"
+    if pd.api.types.is_bool_dtype(dtype):
+        return "BOOLEAN"
+    if pd.api.types.is_integer_dtype(dtype):
+        return "BIGINT"
+    if pd.api.types.is_float_dtype(dtype):
+        return "DOUBLE PRECISION"
+    if isinstance(dtype, pd.DatetimeTZDtype):
+        return "TIMESTAMP WITH TIME ZONE"
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return "TIMESTAMP WITHOUT TIME ZONE"
+    return "TEXT"
+
+
+def postgres_type_for_arrow(arrow_type):
+    # Column type for an Arrow column, matching postgres_type for the same data
+    if pa.types.is_dictionary(arrow_type):
+        arrow_type = arrow_type.value_type
+    if pa.types.is_boolean(arrow_type):
+        return "BOOLEAN"
+    if pa.types.is_integer(arrow_type):
+        return "BIGINT"
+    if pa.types.is_floating(arrow_type):
+        return "DOUBLE PRECISION"
+    if pa.types.is_timestamp(arrow_type):
+        return "TIMESTAMP WITH TIME ZONE" if arrow_type.tz else "TIMESTAMP WITHOUT TIME ZONE"
+    return "TEXT"
+
+
+def create_table(cursor, table_name, column_types):
+    columns = sql.SQL(", ").join(
+        sql.SQL("{} {}").format(sql.Identifier(name), sql.SQL(pg_type)) for name, pg_type in column_types.items()
+    )
+    cursor.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(table_name)))
+    cursor.execute(sql.SQL("CREATE TABLE {} ({})").format(sql.Identifier(table_name), columns))
+
+
+def arrow_table(df, column_types):
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Object columns mixing value types are sent as text
+        mixed = [col for col in df.columns if df[col].dtype == object and column_types[col] == "TEXT"]
+        return pa.Table.from_pandas(df.astype({col: "string" for col in mixed}), preserve_index=False)
+
+
+def copy_table(cursor, table, table_name):
+    """
+    Stream an Arrow table into an existing table with COPY FROM STDIN.
+
+    Rows are serialized with Arrow's CSV writer into a spooled buffer. Strings
+    are always quoted, so unquoted empty fields are NULLs and "" stays an
+    empty string.
+    """
+    copy_sql = sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv)").format(
+        sql.Identifier(table_name),
+        sql.SQL(", ").join(sql.Identifier(col) for col in table.column_names)
+    ).as_string(cursor)
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as buffer:
+        pa_csv.write_csv(table, buffer, pa_csv.WriteOptions(include_header=False))
+        buffer.seek(0)
+        cursor.copy_expert(copy_sql, buffer)
+
+
+def copy_chunks_to_postgres(engine, chunks, table_name):
+    """
+    Replace the table with a stream of chunks (Arrow tables or DataFrames),
+    copying each one as soon as it arrives so only one chunk is in memory.
+    Column types come from the first chunk. Everything runs in a single
+    transaction. Returns the number of rows written.
+    """
+    rows = 0
+    column_types = None
+    connection = engine.raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            for chunk in chunks:
+                if column_types is None:
+                    if isinstance(chunk, pa.Table):
+                        column_types = {field.name: postgres_type_for_arrow(field.type) for field in chunk.schema}
+                    else:
+                        column_types = {col: postgres_type(chunk[col]) for col in chunk.columns}
+                    create_table(cursor, table_name, column_types)
+                table = chunk if isinstance(chunk, pa.Table) else arrow_table(chunk, column_types)
+                copy_table(cursor, table, table_name)
+                rows += table.num_rows
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+    return rows
+
+
+def prepare_chunk(batch):
+    """
+    Apply the case-table column conventions to one record batch of the marked output:
+    lower-case names, and a parsed creationdate with creation_day/creation_time columns.
+    """
+    table = pa.Table.from_batches([batch])
+    table = table.rename_columns([name.strip().lower() for name in table.column_names])
+
+    if "creationdate" in table.column_names:
+        creationdate = pd.to_datetime(
+            table.column("creationdate").to_pandas().astype(str),
+            format="%d/%m/%Y %I:%M:%S %p",
+            errors='coerce'
+        )
+        table = table.set_column(
+            table.column_names.index("creationdate"), "creationdate",
+            pa.array(creationdate, type=pa.timestamp("ns"), from_pandas=True)
+        )
+        table = table.append_column(
+            "creation_day", pa.array(creationdate.dt.strftime('%Y-%m-%d'), type=pa.string(), from_pandas=True)
+        )
+        table = table.append_column(
+            "creation_time", pa.array(creationdate.dt.strftime('%H:%M:%S'), type=pa.string(), from_pandas=True)
+        )
+    return table
+
+
+def iter_parquet_chunks(file_path, chunk_size=COPY_CHUNK_SIZE):
+    """
+    Prepared Arrow tables of at most chunk_size rows, read lazily from a Parquet file.
+    """
+    parquet_file = pq.ParquetFile(file_path)
+    for batch in parquet_file.iter_batches(batch_size=chunk_size):
+        yield prepare_chunk(batch)
+
+
 def load_dataframes_to_postgres(config):
 
     # Create engine
@@ -14,35 +170,28 @@ def load_dataframes_to_postgres(config):
     prefix = f"case_{case_id}_"
 
     # Only process this file
-    filename = "output_accessed_marked.xlsx"
+    filename = "output_accessed_marked.parquet"
     table_name = f"{prefix}marked_records"
 
     file_path = os.path.join(config["paths"]["current_case"], "processed", filename)
 
-    try:
-        df = pd.read_excel(file_path)
-    except FileNotFoundError:
+    if not os.path.exists(file_path):
         print(f"❌ File not found: {file_path}")
         return
-    except Exception as e:
-        print(f"❌ Failed to load {file_path}: {e}")
-        return
 
-    # Normalize columns
-    df.columns = df.columns.str.strip().str.lower()
-
-    if "creationdate" in df.columns:
-        df["creationdate"] = pd.to_datetime(
-            df["creationdate"].astype(str),
-            format="%d/%m/%Y %I:%M:%S %p",
-            errors='coerce'
-        )
-        df["creation_day"] = df["creationdate"].dt.strftime('%Y-%m-%d')
-        df["creation_time"] = df["creationdate"].dt.strftime('%H:%M:%S')
+    chunk_size = config["postgres"].get("copy_chunk_size", COPY_CHUNK_SIZE)
+    chunks = iter_parquet_chunks(file_path, chunk_size)
 
+    start = time.perf_counter()
     try:
-        df.to_sql(table_name, engine, if_exists="replace", index=False)
-        print(f"✅ Written to table: {table_name}")
+        if engine.dialect.name == "postgresql":
+            rows = copy_chunks_to_postgres(engine, chunks, table_name)
+        else:
+            rows = 0
+            for chunk in chunks:
+                chunk.to_pandas().to_sql(table_name, engine, if_exists="replace" if rows == 0 else "append", index=False)
+                rows += chunk.num_rows
+        elapsed = time.perf_counter() - start
+        print(f"✅ Written to table: {table_name} ({rows} rows in {elapsed:.1f}s, {rows / max(elapsed, 1e-9):,.0f} rows/s)")
     except Exception as e:
         print(f"❌ Failed to write {table_name} to database: {e}")
-
@@ -0,0 +1,125 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from sqlalchemy import create_engine
+
+from database import (copy_chunks_to_postgres, iter_parquet_chunks, load_dataframes_to_postgres, postgres_type,
+                      postgres_type_for_arrow, prepare_chunk)
+
+# COPY tests run against a scratch database, e.g. postgresql+psycopg2://postgres@/postgres?host=/tmp/pgdata
+POSTGRES_URI = os.environ.get("UAL_TEST_POSTGRES_URI")
+needs_postgres = pytest.mark.skipif(not POSTGRES_URI, reason="UAL_TEST_POSTGRES_URI is not set")
+
+
+def marked_frame():
+    return pd.DataFrame({
+        "CreationDate": ["01/05/2024 10:00:00 AM", "01/05/2024 01:30:15 PM", "not a date"],
+        "UserId": ["a@contoso.com", "", None],
+        "LogonType": pd.array([0, None, 2], dtype="Int64"),
+        "ExternalAccess": pd.array([True, None, False], dtype="boolean"),
+        "Score": [0.5, np.nan, 1.5],
+        "AllNull": [None, None, None],
+        "SUSPICIOUS": ["yes", "no", "no"],
+    })
+
+
+def test_postgres_types_agree_for_pandas_and_arrow():
+    df = marked_frame().drop(columns=["CreationDate"])
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pandas_types = {col: postgres_type(df[col]) for col in df.columns}
+    arrow_types = {field.name: postgres_type_for_arrow(field.type) for field in table.schema}
+    assert pandas_types == {"UserId": "TEXT", "LogonType": "BIGINT", "ExternalAccess": "BOOLEAN",
+                            "Score": "DOUBLE PRECISION", "AllNull": "TEXT", "SUSPICIOUS": "TEXT"}
+    assert arrow_types == pandas_types
+    assert postgres_type(pd.Series([1, 2], dtype=object)) == "BIGINT"
+    assert postgres_type(pd.Series([1, "a"], dtype=object)) == "TEXT"
+    assert postgres_type_for_arrow(pa.dictionary(pa.int32(), pa.string())) == "TEXT"
+    assert postgres_type_for_arrow(pa.timestamp("ns", tz="UTC")) == "TIMESTAMP WITH TIME ZONE"
+
+
+def test_prepare_chunk():
+    batch = pa.RecordBatch.from_pandas(marked_frame(), preserve_index=False)
+    table = prepare_chunk(batch)
+    assert table.column_names == ["creationdate", "userid", "logontype", "externalaccess", "score", "allnull",
+                                  "suspicious", "creation_day", "creation_time"]
+    assert table.schema.field("creationdate").type == pa.timestamp("ns")
+    assert table.column("creation_day").to_pylist() == ["2024-05-01", "2024-05-01", None]
+    assert table.column("creation_time").to_pylist() == ["10:00:00", "13:30:15", None]
+    assert table.column("userid").to_pylist() == ["a@contoso.com", "", None]
+
+
+def write_case(tmp_path, df, row_group_size=None):
+    processed = tmp_path / "case_test" / "processed"
+    os.makedirs(processed)
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), processed / "output_accessed_marked.parquet",
+                   row_group_size=row_group_size)
+    return str(tmp_path / "case_test")
+
+
+def test_iter_parquet_chunks(tmp_path):
+    case = write_case(tmp_path, marked_frame())
+    chunks = list(iter_parquet_chunks(os.path.join(case, "processed", "output_accessed_marked.parquet"), 2))
+    assert [chunk.num_rows for chunk in chunks] == [2, 1]
+    assert all("creation_day" in chunk.column_names for chunk in chunks)
+
+
+def test_load_without_postgres_falls_back_to_to_sql(tmp_path, capsys):
+    case = write_case(tmp_path, marked_frame())
+    uri = f"sqlite:///{tmp_path / 'ual.db'}"
+    load_dataframes_to_postgres({"postgres": {"sqlalchemy_uri": uri, "copy_chunk_size": 2}, "paths": {"current_case": case}})
+    assert "✅ Written to table: case_test_marked_records (3 rows" in capsys.readouterr().out
+    loaded = pd.read_sql_table("case_test_marked_records", create_engine(uri))
+    assert loaded["suspicious"].tolist() == ["yes", "no", "no"]
+
+
+def test_load_reports_missing_file(tmp_path, capsys):
+    load_dataframes_to_postgres({"postgres": {"sqlalchemy_uri": "sqlite://"}, "paths": {"current_case": str(tmp_path)}})
+    assert "❌ File not found" in capsys.readouterr().out
+
+
+@needs_postgres
+def test_copy_loader_round_trip(tmp_path):
+    df = pd.concat([marked_frame()] * 4, ignore_index=True)
+    df["UserId"] = df["UserId"].where(df.index % 4 != 1, 'quote " and, comma\nnewline')
+    case = write_case(tmp_path, df, row_group_size=5)
+    load_dataframes_to_postgres({"postgres": {"sqlalchemy_uri": POSTGRES_URI, "copy_chunk_size": 3},
+                                 "paths": {"current_case": case}})
+
+    engine = create_engine(POSTGRES_URI)
+    loaded = pd.read_sql_table("case_test_marked_records", engine)
+    types = pd.read_sql(
+        "SELECT column_name, data_type FROM information_schema.columns "
+        "WHERE table_name = 'case_test_marked_records'", engine
+    ).set_index("column_name")["data_type"].to_dict()
+    assert types == {
+        "creationdate": "timestamp without time zone", "userid": "text", "logontype": "bigint",
+        "externalaccess": "boolean", "score": "double precision", "allnull": "text", "suspicious": "text",
+        "creation_day": "text", "creation_time": "text",
+    }
+    assert len(loaded) == 12
+    # NULLs and empty strings survive COPY apart
+    assert loaded["userid"].tolist()[:5] == ["a@contoso.com", 'quote " and, comma\nnewline', None, "a@contoso.com", ""]
+    assert loaded["allnull"].isna().all()
+    assert loaded["logontype"].isna().sum() == 4
+    assert loaded["creation_time"].tolist()[:3] == ["10:00:00", "13:30:15", None]
+
+
+@needs_postgres
+def test_copy_rolls_back_on_error():
+    engine = create_engine(POSTGRES_URI)
+    good = pa.table({"id": pa.array([1, 2], type=pa.int64())})
+    assert copy_chunks_to_postgres(engine, iter([good]), "ual_copy_test") == 2
+
+    def chunks():
+        yield good
+        raise RuntimeError("broken chunk")
+
+    with pytest.raises(RuntimeError):
+        copy_chunks_to_postgres(engine, chunks(), "ual_copy_test")
+    # The failed reload left the previous table in place
+    assert pd.read_sql_table("ual_copy_test", engine)["id"].tolist() == [1, 2]
+    assert copy_chunks_to_postgres(engine, iter([]), "ual_copy_empty") == 0
@@ -10,6 +10,7 @@ from scripts.data_swap import swap_dataset
 from scripts.run_microsoft_extractor import open_gui
 from datetime import datetime
 from scripts.matcher import run_matcher
+from scripts.rules_engine import run_rules
 from scripts.test_create_case_dashboard import import_dashboard, clone_and_swap
 import yaml
 import sys
@@ -78,13 +79,25 @@ def run_parser_on_file(input_file_path, config):
 
     parser_script = os.path.abspath(config["scripts"]["parser"])
     ip_parser_script = os.path.abspath(config["scripts"]["ip_parser"])
-    output_file = os.path.join(config["paths"]["current_case"], "processed", "output_accessed.xlsx")
+    output_file = os.path.join(config["paths"]["current_case"], "processed", "output_accessed.parquet")
 
 
     env = os.environ.copy()
     env["UAL_INPUT_FILE"] = input_file_path
     env["UAL_OUTPUT_FILE"] = output_file
 
+    parsing = config.get("parsing", {})
+    env["UAL_CHUNK_SIZE"] = str(parsing.get("chunk_size", 50000))
+    env["UAL_PARSE_WORKERS"] = str(parsing.get("workers", 1))
+    env["UAL_DEDUP"] = "1" if parsing.get("dedup", True) else "0"
+    env["UAL_GEO_BY_NETWORK"] = "1" if parsing.get("geo_by_network", False) else "0"
+    if parsing.get("cache", False):
+        env["UAL_PARSE_CACHE"] = os.path.join(config["paths"]["current_case"], "processed", "parse_cache")
+    if parsing.get("columns"):
+        env["UAL_COLUMNS"] = ",".join(parsing["columns"])
+    if parsing.get("dashboard_projection", False):
+        env["UAL_DASHBOARD_EXPORT"] = os.path.abspath(config["paths"]["dashboard_zip"])
+
     try:
         subprocess.run([sys.executable, parser_script], check=True, env=env)
         print(f"✅ Parsing complete. Output saved to: {output_file}")
@@ -250,6 +263,8 @@ def main():
         run_analyzer(input_file, config)
 
         run_parser_on_file(input_file, config)
+
+        run_rules(config)
         
         run_matcher(config)
         
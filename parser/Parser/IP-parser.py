@@ -4,17 +4,13 @@ import csv
 import datetime
 import os
 import sys
+import pandas as pd
+from geo_cache import GeoCache
+from geo_enrichment import load_msft_ip_ranges, geo_lookup_frame, geo_lookup_networks
+from ip_ranges import public_mask
 
 input_file = os.getenv("UAL_INPUT_FILE", "UAL.csv")
  
-try:
-    import geoip2.database
-except ImportError:
-    print("❌ Required module 'geoip2' not found.")
-    print("💡 Please install it using:")
-    print("   sudo apt install python3-geoip2\n")
-    exit(1)
- 
 VERSION = "2.0.0"
  
 def print_intro():
@@ -36,7 +32,67 @@ def browser_check(ip):
     else:
         return True
  
-def extract_ips_from_csv(file_path):
+# Fields that hold the client address in UAL AuditData and in sign-in/audit CSV exports
+IP_FIELDS = ["ClientIP", "ClientIPAddress", "ActorIpAddress", "IPAddress", "SourceIp"]
+
+IP_FIELD_PATTERN = re.compile(
+    r'"(?:' + "|".join(IP_FIELDS) + r')"\s*:\s*"([^"]+)"',
+    re.IGNORECASE
+)
+
+csv.field_size_limit(min(sys.maxsize, 2**31 - 1))
+
+
+def normalize_ip(value):
+    """
+    Strip ports and brackets from a field value such as "1.2.3.4:50000"
+    or "[2603:10a6::1]:443".
+    """
+    value = value.strip()
+    if value.startswith("["):
+        value = value[1:value.find("]")] if "]" in value else value[1:]
+    elif value.count(":") == 1:
+        value = value.split(":")[0]
+    return value
+
+
+def public_ips_of(candidates):
+    """
+    Canonical forms of the public addresses among candidate strings, classified in one batch.
+    """
+    candidates = list(candidates)
+    return {
+        str(ipaddress.ip_address(ip))
+        for ip, public in zip(candidates, public_mask(candidates)) if public
+    }
+
+
+def extract_ips_from_fields(file_path, fields=IP_FIELDS):
+    """
+    Stream the CSV row by row and collect the distinct addresses found in the
+    known IP fields, either as CSV columns or as keys inside the AuditData JSON.
+    Only the set of distinct addresses is kept in memory.
+    """
+    wanted = {f.lower() for f in fields}
+    candidates = set()
+    with open(file_path, 'r', encoding='utf-8', errors='ignore', newline='') as file:
+        reader = csv.reader(file)
+        headers = next(reader, [])
+        ip_columns = [i for i, h in enumerate(headers) if h.strip().lower() in wanted]
+        audit_data_index = headers.index("AuditData") if "AuditData" in headers else None
+
+        for line in reader:
+            for i in ip_columns:
+                if i < len(line) and line[i]:
+                    candidates.add(line[i])
+            if audit_data_index is not None and audit_data_index < len(line):
+                candidates.update(IP_FIELD_PATTERN.findall(line[audit_data_index]))
+
+    return sorted(public_ips_of({normalize_ip(value) for value in candidates}))
+
+
+def extract_ips_by_regex(file_path):
+    # Legacy mode: every IP-looking string anywhere in the file
     with open(file_path, 'r', encoding='utf-8', errors='ignore') as file:
         content = file.read()
  
@@ -47,111 +103,66 @@ def extract_ips_from_csv(file_path):
     ipv6_matches = re.findall(ipv6_pattern, content)
  
     all_ips = set(ipv4_matches + ipv6_matches)
-    public_ips = set()
- 
-    for ip_str in all_ips:
-        try:
-            ip_obj = ipaddress.ip_address(ip_str)
-            if not (
-                ip_obj.is_private or ip_obj.is_loopback or ip_obj.is_link_local or
-                ip_obj.is_multicast or ip_obj.is_reserved or ip_obj.is_unspecified or
-                not browser_check(str(ip_obj))
-            ):
-                public_ips.add(str(ip_obj))
-        except ValueError:
-            continue
+    public_ips = {ip for ip in public_ips_of(all_ips) if browser_check(ip)}
  
     return sorted(public_ips)
- 
-def load_msft_ip_ranges(msft_csv_path):
-    msft_ranges = []
-    with open(msft_csv_path, 'r') as f:
-        next(f)  # Skip header
-        for line in f:
-            prefix = line.strip().split(',')[0]
-            try:
-                msft_ranges.append(ipaddress.ip_network(prefix))
-            except ValueError:
-                continue
-    return msft_ranges
- 
-def is_msft_ip(ip_str, msft_ranges):
-    try:
-        ip_obj = ipaddress.ip_address(ip_str)
-        return any(ip_obj in net for net in msft_ranges)
-    except ValueError:
-        return False
- 
-def geo_lookup(ip_list, city_db_path, asn_db_path, msft_ranges):
-    results = []
- 
-    with geoip2.database.Reader(city_db_path) as city_reader, \
-         geoip2.database.Reader(asn_db_path) as asn_reader:
- 
-        for ip in ip_list:
-            entry = {'ClientIP': ip}
- 
-            # GeoIP city data
-            try:
-                city_resp = city_reader.city(ip)
-                entry.update({
-                    'Country': city_resp.country.name or 'N/A',
-                    'City': city_resp.city.name or 'N/A',
-                    'Latitude': city_resp.location.latitude,
-                    'Longitude': city_resp.location.longitude
-                })
-            except geoip2.errors.AddressNotFoundError:
-                entry.update({
-                    'Country': 'N/A',
-                    'City': 'N/A',
-                    'Latitude': 'N/A',
-                    'Longitude': 'N/A'
-                })
- 
-            # ASN data
-            try:
-                asn_resp = asn_reader.asn(ip)
-                entry.update({
-                    'ASN': asn_resp.autonomous_system_number,
-                    'ISP': asn_resp.autonomous_system_organization
-                })
-            except geoip2.errors.AddressNotFoundError:
-                entry.update({
-                    'ASN': 'N/A',
-                    'ISP': 'N/A'
-                })
- 
-            # Check for Microsoft fallback
-            if entry['ISP'] == 'N/A' and is_msft_ip(ip, msft_ranges):
-                entry['ISP'] = 'Microsoft'
-                # Leave ASN as "N/A" unless you want to assign a custom value
- 
-            results.append(entry)
- 
-    return results
- 
+
+
+def extract_ips_from_csv(file_path, mode="fields"):
+    """
+    Distinct public IPs of a log export. "fields" reads only the known IP
+    fields; "regex" scans the whole file for anything shaped like an address.
+    """
+    if mode == "regex":
+        return extract_ips_by_regex(file_path)
+    return extract_ips_from_fields(file_path)
+
+
 def save_to_csv(data, output_file='public_ips_geolocation_accessed.csv'):
-    with open(output_file, 'w', newline='', encoding='utf-8') as csvfile:
-        fieldnames = ['ClientIP', 'Country', 'City', 'Latitude', 'Longitude', 'ASN', 'ISP']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        for row in data:
-            writer.writerow(row)
- 
+    fieldnames = ['ClientIP', 'Country', 'City', 'Latitude', 'Longitude', 'ASN', 'ISP']
+    pd.DataFrame(data, columns=fieldnames).to_csv(output_file, index=False)
+
+
+def save_networks_to_csv(networks, table, output_file='public_ips_geolocation_accessed.csv',
+                         networks_file='public_networks_geolocation_accessed.csv'):
+    # Per-IP rows as in the default mode, plus the Network each IP belongs to
+    fieldnames = ['ClientIP', 'Network', 'Country', 'City', 'Latitude', 'Longitude', 'ASN', 'ISP']
+    per_ip = table.reindex(networks.values).set_axis(networks.index).assign(Network=networks.values)
+    per_ip.reset_index()[fieldnames].to_csv(output_file, index=False)
+
+    # One row per network block, with the number of distinct addresses seen in it
+    fieldnames = ['Network', 'IPCount', 'Country', 'City', 'Latitude', 'Longitude', 'ASN', 'ISP']
+    table = table.assign(IPCount=networks.value_counts()).reset_index()
+    table[fieldnames].to_csv(networks_file, index=False)
+
+
 if __name__ == '__main__':
     print_intro()
  
 # ---- CONFIG ----
     script_dir = os.path.dirname(os.path.abspath(__file__))
     input_file = os.getenv("UAL_INPUT_FILE", os.path.join(script_dir, "UAL.csv"))
-    city_db = os.path.join(script_dir, "GeoLite2-City.mmdb")
-    asn_db = os.path.join(script_dir, "GeoLite2-ASN.mmdb")
-    msft_ip_file = os.path.join(script_dir, "msft-public-ips.csv")
+    geo_dir = os.getenv("UAL_GEO_DIR", script_dir)
+    city_db = os.path.join(geo_dir, "GeoLite2-City.mmdb")
+    asn_db = os.path.join(geo_dir, "GeoLite2-ASN.mmdb")
+    msft_ip_file = os.path.join(geo_dir, "msft-public-ips.csv")
+    geo_cache_file = os.getenv("UAL_GEO_CACHE", os.path.join(geo_dir, "geo_cache.sqlite"))
  
     # ---- PIPELINE ----
-    ips = extract_ips_from_csv(input_file)
+    ips = extract_ips_from_csv(input_file, mode=os.getenv("UAL_IP_EXTRACTION", "fields"))
     msft_ranges = load_msft_ip_ranges(msft_ip_file)
-    enriched_data = geo_lookup(ips, city_db_path=city_db, asn_db_path=asn_db, msft_ranges=msft_ranges)
-    save_to_csv(enriched_data)
- 
-    print(f"\n✅ Saved {len(enriched_data)} public IPs with geo and ASN info to 'public_ips_geolocation_accessed.csv'")
+    if os.getenv("UAL_GEO_BY_NETWORK", "0") == "1":
+        networks, table = geo_lookup_networks(ips, city_db_path=city_db, asn_db_path=asn_db, msft_ranges=msft_ranges)
+        save_networks_to_csv(networks, table)
+        print(f"\n✅ Saved {len(ips)} public IPs to 'public_ips_geolocation_accessed.csv' and their "
+              f"{len(table)} networks to 'public_networks_geolocation_accessed.csv'")
+    else:
+        geo_cache = GeoCache(geo_cache_file) if geo_cache_file != "0" else None
+        enriched_data = geo_lookup_frame(ips, city_db_path=city_db, asn_db_path=asn_db, msft_ranges=msft_ranges,
+                                         cache=geo_cache)
+        if geo_cache is not None:
+            print(f"♻️ GeoIP cache: {geo_cache.hits} hit(s), {geo_cache.misses} lookup(s).")
+            geo_cache.close()
+        save_to_csv(enriched_data)
+
+        print(f"\n✅ Saved {len(enriched_data)} public IPs with geo and ASN info to 'public_ips_geolocation_accessed.csv'")
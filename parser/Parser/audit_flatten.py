@@ -0,0 +1,162 @@
+import csv
+import sys
+from itertools import islice
+import numpy as np
+import pandas as pd
+from json_backend import DECODE_ERRORS, loads
+from parse_cache import HASH_COLUMN, record_hash
+
+# AuditData blobs (e.g. MailItemsAccessed Folders) can exceed the default csv field limit
+csv.field_size_limit(min(sys.maxsize, 2**31 - 1))
+
+DEFAULT_CHUNK_SIZE = 50000
+
+
+def flatten_audit_data(obj, prefix="", sep=".", out=None):
+    """
+    Flatten a decoded AuditData object into a single dict with dotted keys.
+    Mirrors pd.json_normalize for one record: nested dicts are expanded,
+    lists and scalars are kept as values, empty dicts produce no key.
+    """
+    if out is None:
+        out = {}
+    for key, value in obj.items():
+        name = f"{prefix}{sep}{key}" if prefix else str(key)
+        if isinstance(value, dict):
+            flatten_audit_data(value, name, sep, out)
+        else:
+            out[name] = value
+    return out
+
+
+def _row_hash(line, audit_data_index, record_id_index):
+    try:
+        record_id = line[record_id_index] if record_id_index is not None else ""
+        return record_hash(line[audit_data_index], record_id)
+    except IndexError:
+        return None
+
+
+def flatten_ual_row(headers, audit_data_index, line, keep_raw=True, row_hash=None, projection=None):
+    """
+    Merge the CSV columns of one UAL row with its flattened AuditData.
+    With a ColumnProjection only the allowed AuditData paths are extracted.
+    Returns None when the AuditData cell is missing or is not a JSON object.
+    """
+    try:
+        audit_data_raw = line[audit_data_index]
+        json_obj = loads(audit_data_raw)
+        record = {
+            headers[i]: line[i]
+            for i in range(len(headers))
+            if i != audit_data_index
+        }
+    except (*DECODE_ERRORS, IndexError):
+        return None
+    if not isinstance(json_obj, dict):
+        return None
+
+    if projection is not None:
+        flat_dict = projection.flatten(json_obj)
+    else:
+        flat_dict = flatten_audit_data(json_obj)
+
+    # Add raw AuditData for debugging
+    if keep_raw:
+        flat_dict["AuditDataRaw"] = audit_data_raw
+
+    # Combine ClientIP and ClientIPAddress
+    flat_dict["ResolvedClientIP"] = flat_dict.get("ClientIP") or flat_dict.get("ClientIPAddress")
+
+    # Fingerprint used by the re-parse cache
+    if row_hash is None:
+        record_id = record.get("RecordId", "")
+        row_hash = record_hash(audit_data_raw, record_id)
+    flat_dict[HASH_COLUMN] = row_hash
+
+    record.update(flat_dict)
+    return record
+
+
+def iter_record_chunks(headers, lines, chunk_size=DEFAULT_CHUNK_SIZE, keep_raw=True, projection=None):
+    """
+    Flatten parsed CSV rows and yield DataFrames of at most `chunk_size` records.
+    With a ColumnProjection, AuditDataRaw is only kept when it is on the allow-list.
+    """
+    audit_data_index = headers.index("AuditData")
+    if projection is not None:
+        keep_raw = keep_raw and projection.keep_raw
+
+    rows = []
+    for line in lines:
+        record = flatten_ual_row(headers, audit_data_index, line, keep_raw=keep_raw, projection=projection)
+        if record is None:
+            continue
+        rows.append(record)
+        if len(rows) >= chunk_size:
+            yield pd.DataFrame.from_records(rows)
+            rows = []
+    if rows:
+        yield pd.DataFrame.from_records(rows)
+
+
+def iter_record_batches(headers, lines, cache, batch_size=DEFAULT_CHUNK_SIZE, keep_raw=True, projection=None):
+    """
+    Flatten parsed CSV rows against a ParseCache, `batch_size` input rows at a time.
+    Rows already in the cache are hashed but not decoded.
+
+    Yields (df, positions, hit_positions, hit_hashes) per batch: the freshly
+    flattened records and their row numbers in the batch, and the row numbers
+    and hashes of the cached rows, so ParseCache.fill can restore the input order.
+    """
+    audit_data_index = headers.index("AuditData")
+    record_id_index = headers.index("RecordId") if "RecordId" in headers else None
+    if projection is not None:
+        keep_raw = keep_raw and projection.keep_raw
+
+    lines = iter(lines)
+    while True:
+        batch = list(islice(lines, batch_size))
+        if not batch:
+            return
+        hashes = [_row_hash(line, audit_data_index, record_id_index) for line in batch]
+        hashed = np.array([h is not None for h in hashes], dtype=bool)
+        cached = cache.contains([h if h is not None else 0 for h in hashes]) & hashed
+
+        rows = []
+        positions = []
+        for i, (line, row_hash) in enumerate(zip(batch, hashes)):
+            if cached[i]:
+                continue
+            record = flatten_ual_row(headers, audit_data_index, line, keep_raw=keep_raw, row_hash=row_hash,
+                                     projection=projection)
+            if record is not None:
+                rows.append(record)
+                positions.append(i)
+
+        hit_positions = np.flatnonzero(cached)
+        hit_hashes = np.array([hashes[i] for i in hit_positions], dtype=np.int64)
+        yield pd.DataFrame.from_records(rows), np.array(positions, dtype=np.int64), hit_positions, hit_hashes
+
+
+def iter_flattened_chunks(input_file, chunk_size=DEFAULT_CHUNK_SIZE, keep_raw=True, projection=None):
+    """
+    Stream a UAL CSV and yield DataFrames of at most `chunk_size` flattened records,
+    so only one chunk of rows is held in memory at a time.
+    """
+    with open(input_file, 'r', encoding='utf-8', newline='') as file:
+        reader = csv.reader(file)
+        headers = next(reader)
+        yield from iter_record_chunks(headers, reader, chunk_size=chunk_size, keep_raw=keep_raw,
+                                      projection=projection)
+
+
+def iter_flattened_batches(input_file, cache, batch_size=DEFAULT_CHUNK_SIZE, keep_raw=True, projection=None):
+    """
+    Stream a UAL CSV through iter_record_batches.
+    """
+    with open(input_file, 'r', encoding='utf-8', newline='') as file:
+        reader = csv.reader(file)
+        headers = next(reader)
+        yield from iter_record_batches(headers, reader, cache, batch_size=batch_size, keep_raw=keep_raw,
+                                       projection=projection)
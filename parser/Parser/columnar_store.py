@@ -0,0 +1,148 @@
+import json
+import os
+import shutil
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+
+def _to_text(value):
+    if value is None or value != value:
+        return None
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, default=str)
+    return str(value)
+
+
+def _column_to_array(series):
+    """
+    Convert one DataFrame column to an Arrow array. Nested values (lists, dicts)
+    are stored as JSON text and mixed-type columns fall back to strings, so every
+    part file has flat, mergeable column types.
+    """
+    try:
+        array = pa.Array.from_pandas(series)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        array = None
+    if array is None or pa.types.is_nested(array.type):
+        array = pa.array(series.map(_to_text), type=pa.string(), from_pandas=True)
+    return array
+
+
+def frame_to_table(df):
+    columns = [str(c) for c in df.columns]
+    arrays = [_column_to_array(df.iloc[:, i]) for i in range(len(columns))]
+    return pa.Table.from_arrays(arrays, names=columns)
+
+
+def write_part(df, path):
+    # DataFrame chunks are converted; Arrow tables (e.g. from the parse cache) are written as-is
+    table = df if isinstance(df, pa.Table) else frame_to_table(df)
+    pq.write_table(table, path)
+    return table.num_rows
+
+
+def _common_type(types):
+    types = [t for t in types if not pa.types.is_null(t)]
+    if not types:
+        return pa.null()
+    first = types[0]
+    if all(t == first for t in types):
+        return first
+    if all(pa.types.is_integer(t) for t in types):
+        return pa.int64()
+    if all(pa.types.is_integer(t) or pa.types.is_floating(t) for t in types):
+        return pa.float64()
+    if all(pa.types.is_timestamp(t) for t in types):
+        return pa.timestamp("ns")
+    if all(pa.types.is_dictionary(t) and pa.types.is_string(t.value_type) for t in types):
+        return pa.dictionary(pa.int32(), pa.string())
+    return pa.string()
+
+
+def unify_schemas(schemas):
+    """
+    Build one schema covering every column seen in the parts, in first-seen order.
+    Conflicting column types are widened (ints to float, anything else to string).
+    """
+    field_types = {}
+    for schema in schemas:
+        for field in schema:
+            field_types.setdefault(field.name, []).append(field.type)
+    return pa.schema([(name, _common_type(types)) for name, types in field_types.items()])
+
+
+def conform_table(table, schema):
+    """
+    Reorder, pad with nulls and cast a part table to the unified schema.
+    """
+    arrays = []
+    for field in schema:
+        if field.name not in table.column_names:
+            arrays.append(pa.nulls(table.num_rows, type=field.type))
+            continue
+        column = table.column(field.name)
+        if column.type != field.type:
+            if pa.types.is_null(column.type):
+                column = pa.nulls(table.num_rows, type=field.type)
+            else:
+                column = pc.cast(column, field.type)
+        arrays.append(column)
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def merge_parts(part_files, output_file, row_filter=None):
+    """
+    Stream part files, in the given order, into a single Parquet file.
+    Only one part is held in memory at a time. `row_filter`, if given, maps each
+    conformed part table to the rows that should be kept.
+    """
+    schema = unify_schemas([pq.read_schema(p) for p in part_files])
+    total_rows = 0
+    with pq.ParquetWriter(output_file, schema) as writer:
+        for part in part_files:
+            table = conform_table(pq.read_table(part), schema)
+            if row_filter is not None:
+                table = row_filter(table)
+            writer.write_table(table)
+            total_rows += table.num_rows
+    return total_rows
+
+
+class ChunkedParquetWriter:
+    """
+    Collect DataFrame chunks with varying columns into one typed Parquet file.
+    Chunks are spooled to part files next to the output and merged on close().
+    """
+
+    def __init__(self, output_file, spool_dir=None):
+        self.output_file = output_file
+        self.spool_dir = spool_dir or f"{output_file}.parts"
+        self.part_files = []
+        if os.path.exists(self.spool_dir):
+            shutil.rmtree(self.spool_dir)
+        os.makedirs(self.spool_dir)
+
+    def write(self, df):
+        if (df.num_rows if isinstance(df, pa.Table) else len(df)) == 0:
+            return
+        part = os.path.join(self.spool_dir, f"part-{len(self.part_files):05d}.parquet")
+        write_part(df, part)
+        self.part_files.append(part)
+
+    def add_part(self, part):
+        """
+        Register a part file written directly into the spool directory (e.g. by a worker).
+        """
+        self.part_files.append(part)
+
+    def close(self, row_filter=None):
+        try:
+            if self.part_files:
+                total_rows = merge_parts(self.part_files, self.output_file, row_filter=row_filter)
+            else:
+                pq.write_table(pa.table({}), self.output_file)
+                total_rows = 0
+        finally:
+            shutil.rmtree(self.spool_dir, ignore_errors=True)
+        return total_rows
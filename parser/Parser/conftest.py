@@ -0,0 +1,76 @@
+import csv
+import json
+
+import pytest
+
+# Columns of the small UAL exports written by the write_ual fixture
+UAL_COLUMNS = ["RecordId", "CreationDate", "RecordType", "Operation", "UserId", "AuditData"]
+
+# City and ASN records of the test databases, by network
+CITY_RECORDS = {
+    "8.8.8.0/24": {"country": ("US", "United States"), "region": "California", "city": "Mountain View",
+                   "location": (37.4, -122.0)},
+    "81.2.69.0/24": {"country": ("GB", "United Kingdom"), "region": "England", "city": "London",
+                     "location": (51.5, -0.1)},
+    "2a00:1450:4009::/48": {"country": ("IE", "Ireland"), "region": "Leinster", "city": "Dublin",
+                            "location": (53.3, -6.2)},
+}
+ASN_RECORDS = {
+    "8.8.8.0/24": {"autonomous_system_number": 15169, "autonomous_system_organization": "GOOGLE"},
+    # ASN record without an organization name
+    "81.2.69.0/24": {"autonomous_system_number": 20712},
+    "2a00:1450:4009::/48": {"autonomous_system_number": 15169, "autonomous_system_organization": "GOOGLE"},
+}
+MSFT_PREFIXES = ["13.64.0.0/11", "40.64.0.0/10", "2603:1000::/24"]
+
+
+def write_mmdb(path, database_type, records):
+    mmdb_writer = pytest.importorskip("mmdb_writer")
+    netaddr = pytest.importorskip("netaddr")
+    writer = mmdb_writer.MMDBWriter(ip_version=6, database_type=database_type, ipv4_compatible=True)
+    for network, record in records.items():
+        writer.insert_network(netaddr.IPSet([network]), record)
+    writer.to_db_file(str(path))
+
+
+@pytest.fixture
+def geo_dir(tmp_path):
+    """
+    Folder with small GeoLite2-City/ASN databases and an msft-public-ips.csv.
+    """
+    city = {}
+    for network, entry in CITY_RECORDS.items():
+        latitude, longitude = entry["location"]
+        iso_code, country = entry["country"]
+        city[network] = {
+            "country": {"iso_code": iso_code, "names": {"en": country}},
+            "subdivisions": [{"names": {"en": entry["region"]}}],
+            "city": {"names": {"en": entry["city"]}},
+            "location": {"latitude": latitude, "longitude": longitude},
+        }
+    write_mmdb(tmp_path / "GeoLite2-City.mmdb", "GeoLite2-City", city)
+    write_mmdb(tmp_path / "GeoLite2-ASN.mmdb", "GeoLite2-ASN", ASN_RECORDS)
+    (tmp_path / "msft-public-ips.csv").write_text(
+        "Prefix,Type\n" + "".join(f"{prefix},Azure\n" for prefix in MSFT_PREFIXES)
+    )
+    return tmp_path
+
+
+@pytest.fixture
+def write_ual():
+    """
+    Writer of small UAL exports, one row per AuditData dict. RecordId, RecordType,
+    Operation and UserId are taken from the record; `indent` pretty-prints
+    AuditData so every record spans several lines.
+    """
+    def write(path, records, indent=None):
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(UAL_COLUMNS)
+            for record in records:
+                writer.writerow([
+                    record.get("Id", ""), "01/05/2024 10:00:00 AM", record.get("RecordType", ""),
+                    record.get("Operation", ""), record.get("UserId", ""), json.dumps(record, indent=indent),
+                ])
+        return path
+    return write
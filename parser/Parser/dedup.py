@@ -0,0 +1,115 @@
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from parse_cache import HASH_COLUMN
+
+# Columns holding the UAL record Id, in order of preference
+ID_COLUMNS = ["Id", "RecordId"]
+
+# Keeps content-hash keys apart from Id-hash keys
+CONTENT_SALT = np.int64(0x5BD1E9955BD1E995)
+
+DEFAULT_MEMORY_KEYS = 2_000_000
+MAX_LEVELS = 8
+
+
+class RecordDeduplicator:
+    """
+    Streaming duplicate filter for UAL records.
+
+    Records are identified by a 64-bit hash of their Id (AuditData Id, else the
+    RecordId column), falling back to the AuditDataHash content fingerprint.
+    Seen keys are held as sorted in-memory arrays; once more than
+    `max_memory_keys` are held they are spilled to a sorted .npy run on disk
+    and probed through a memory map, so memory stays bounded for any case size.
+    The first occurrence of a record is kept.
+    """
+
+    def __init__(self, spill_dir, max_memory_keys=DEFAULT_MEMORY_KEYS):
+        self.spill_dir = spill_dir
+        self.max_memory_keys = max_memory_keys
+        self._levels = []
+        self._memory_keys = 0
+        self._runs = []
+        self.dropped = 0
+
+    def record_keys(self, table):
+        """
+        Return (keys, has_key) arrays for an Arrow table of parsed records.
+        """
+        keys = np.zeros(table.num_rows, dtype=np.int64)
+        has_key = np.zeros(table.num_rows, dtype=bool)
+
+        for name in ID_COLUMNS:
+            if name not in table.column_names:
+                continue
+            ids = table.column(name).to_pandas().astype(object)
+            valid = ids.notna().to_numpy() & ~has_key
+            if not valid.any():
+                continue
+            values = ids[valid].astype(str)
+            non_empty = (values.str.len() > 0).to_numpy()
+            valid[valid] = non_empty
+            keys[valid] = pd.util.hash_array(values[non_empty].to_numpy(dtype=object)).view(np.int64)
+            has_key |= valid
+
+        if HASH_COLUMN in table.column_names:
+            hashes = table.column(HASH_COLUMN).to_pandas()
+            valid = hashes.notna().to_numpy() & ~has_key
+            keys[valid] = hashes[valid].to_numpy(dtype=np.int64) ^ CONTENT_SALT
+            has_key |= valid
+
+        return keys, has_key
+
+    def _contains(self, keys):
+        found = np.zeros(len(keys), dtype=bool)
+        for sorted_keys in self._levels + self._runs:
+            if sorted_keys.size == 0:
+                continue
+            pos = np.searchsorted(sorted_keys, keys).clip(max=sorted_keys.size - 1)
+            found |= sorted_keys[pos] == keys
+        return found
+
+    def _add(self, keys):
+        if keys.size == 0:
+            return
+        self._levels.append(keys)
+        self._memory_keys += keys.size
+        if len(self._levels) > MAX_LEVELS:
+            self._levels = [np.unique(np.concatenate(self._levels))]
+        if self._memory_keys > self.max_memory_keys:
+            self._spill()
+
+    def _spill(self):
+        os.makedirs(self.spill_dir, exist_ok=True)
+        run = np.unique(np.concatenate(self._levels))
+        path = os.path.join(self.spill_dir, f"run-{len(self._runs):05d}.npy")
+        np.save(path, run)
+        self._runs.append(np.load(path, mmap_mode='r'))
+        self._levels = []
+        self._memory_keys = 0
+
+    def filter_table(self, table):
+        """
+        Drop records already seen, in this table or in earlier ones.
+        """
+        keys, has_key = self.record_keys(table)
+        if not has_key.any():
+            return table
+
+        candidate_keys = keys[has_key]
+        duplicate = pd.Series(candidate_keys).duplicated().to_numpy() | self._contains(candidate_keys)
+        self._add(np.unique(candidate_keys[~duplicate]))
+
+        if not duplicate.any():
+            return table
+        keep = np.ones(table.num_rows, dtype=bool)
+        keep[has_key] = ~duplicate
+        self.dropped += int((~keep).sum())
+        return table.filter(pa.array(keep))
+
+    def close(self):
+        self._runs = []
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
@@ -0,0 +1,86 @@
+import os
+import sqlite3
+import pandas as pd
+
+# Lookup fields stored per IP (the Microsoft fallback is applied on top)
+CACHE_FIELDS = ['Country', 'City', 'Latitude', 'Longitude', 'ASN', 'ISP']
+
+BATCH_SIZE = 500
+
+
+class GeoCache:
+    """
+    Persistent GeoIP/ASN results shared by all cases.
+
+    Entries are stored in SQLite keyed by IP together with the build epochs of
+    the City and ASN databases they came from. Entries of an older build are
+    purged as soon as the cache is used with updated .mmdb files, so only
+    cache misses need an MMDB lookup.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+        self._epoch = None
+        self.hits = 0
+        self.misses = 0
+
+    def __getstate__(self):
+        # Each process opens its own connection
+        state = self.__dict__.copy()
+        state["_conn"] = None
+        state["_epoch"] = None
+        return state
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=60)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS geo ("
+                "ip TEXT PRIMARY KEY, city_epoch INTEGER, asn_epoch INTEGER, "
+                "country, city, latitude, longitude, asn, isp)"
+            )
+        return self._conn
+
+    def _use_epoch(self, epoch):
+        if self._epoch != epoch:
+            with self.conn:
+                self.conn.execute("DELETE FROM geo WHERE city_epoch != ? OR asn_epoch != ?", epoch)
+            self._epoch = epoch
+
+    def get(self, ips, epoch):
+        """
+        Return the entries cached for this (city, asn) build epoch as a DataFrame indexed by IP.
+        """
+        self._use_epoch(epoch)
+        ips = list(dict.fromkeys(ips))
+        rows = []
+        for i in range(0, len(ips), BATCH_SIZE):
+            batch = ips[i:i + BATCH_SIZE]
+            rows.extend(self.conn.execute(
+                f"SELECT ip, country, city, latitude, longitude, asn, isp FROM geo "
+                f"WHERE ip IN ({','.join('?' * len(batch))})", batch
+            ))
+        found = pd.DataFrame(rows, columns=['ClientIP'] + CACHE_FIELDS, dtype=object).set_index('ClientIP')
+        self.hits += len(found)
+        self.misses += len(ips) - len(found)
+        return found
+
+    def put(self, entries, epoch):
+        """
+        Store a DataFrame of lookup results indexed by IP.
+        """
+        self._use_epoch(epoch)
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO geo VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(ip, *epoch, *values) for ip, *values in entries[CACHE_FIELDS].itertuples(name=None)]
+            )
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
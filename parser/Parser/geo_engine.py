@@ -0,0 +1,188 @@
+import ipaddress
+import os
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+import maxminddb
+import pandas as pd
+from ip_ranges import encode_ips
+
+LOOKUP_COLUMNS = ['Country', 'City', 'Latitude', 'Longitude', 'ASN', 'ISP']
+
+# Distinct-IP count above which lookups are spread over a process pool
+POOL_THRESHOLD = 50000
+BATCH_SIZE = 25000
+
+# One memory-mapped reader per database file and process
+_READERS = {}
+
+
+def open_reader(path):
+    reader = _READERS.get(path)
+    if reader is None:
+        try:
+            reader = maxminddb.open_database(path, maxminddb.MODE_MMAP_EXT)
+        except (ImportError, ValueError):
+            reader = maxminddb.open_database(path, maxminddb.MODE_MMAP)
+        _READERS[path] = reader
+    return reader
+
+
+def build_epochs(city_db_path, asn_db_path):
+    return (open_reader(city_db_path).metadata().build_epoch,
+            open_reader(asn_db_path).metadata().build_epoch)
+
+
+def _name(record, key):
+    names = (record.get(key) or {}).get('names') or {}
+    return names.get('en') or 'N/A'
+
+
+def lookup_batch(ips, city_db_path, asn_db_path):
+    """
+    City/ASN columns for a list of IPs, with 'N/A' where a database has no record.
+    """
+    city_get = open_reader(city_db_path).get
+    asn_get = open_reader(asn_db_path).get
+    na = 'N/A'
+    country, city, latitude, longitude, asn, isp = [], [], [], [], [], []
+    for ip in ips:
+        record = city_get(ip)
+        if record is None:
+            country.append(na)
+            city.append(na)
+            latitude.append(na)
+            longitude.append(na)
+        else:
+            location = record.get('location') or {}
+            country.append(_name(record, 'country'))
+            city.append(_name(record, 'city'))
+            latitude.append(location.get('latitude'))
+            longitude.append(location.get('longitude'))
+
+        record = asn_get(ip)
+        if record is None:
+            asn.append(na)
+            isp.append(na)
+        else:
+            asn.append(record.get('autonomous_system_number'))
+            isp.append(record.get('autonomous_system_organization'))
+
+    return pd.DataFrame(
+        {'Country': country, 'City': city, 'Latitude': latitude, 'Longitude': longitude, 'ASN': asn, 'ISP': isp},
+        index=pd.Index(ips, name='ClientIP'), dtype=object
+    )
+
+
+def _city_fields(record):
+    if record is None:
+        return ['N/A'] * 4
+    location = record.get('location') or {}
+    return [_name(record, 'country'), _name(record, 'city'), location.get('latitude'), location.get('longitude')]
+
+
+def _asn_fields(record):
+    if record is None:
+        return ['N/A'] * 2
+    return [record.get('autonomous_system_number'), record.get('autonomous_system_organization')]
+
+
+def _sweep_blocks(values, ips, reader, bits):
+    """
+    Walk addresses in sorted order and look up one address per MMDB network block.
+    Returns {position: (block start, prefix length, record)} for every address.
+    """
+    order = sorted(range(len(values)), key=values.__getitem__)
+    sorted_values = [values[k] for k in order]
+    blocks = {}
+    i = 0
+    while i < len(order):
+        record, prefix_len = reader.get_with_prefix_len(ips[order[i]])
+        host_bits = bits - prefix_len
+        start = sorted_values[i] >> host_bits << host_bits
+        j = bisect_right(sorted_values, start + (1 << host_bits) - 1, i)
+        block = (start, prefix_len, record)
+        for k in order[i:j]:
+            blocks[k] = block
+        i = j
+    return blocks
+
+
+def lookup_networks(ips, city_db_path, asn_db_path):
+    """
+    Resolve each MMDB network block once instead of each address.
+
+    Addresses are sorted and every block the City or ASN database returns is
+    looked up a single time; all member addresses map to it. The Network of an
+    address is the more specific of its City and ASN blocks. Returns
+    (networks, table): one Network label per IP ("" for invalid ones) and the
+    lookup columns indexed by Network.
+    """
+    ips = list(ips)
+    city_reader = open_reader(city_db_path)
+    asn_reader = open_reader(asn_db_path)
+    v4_rows, v4, v6_rows, v6_hi, v6_lo = encode_ips(ips)
+
+    networks = [""] * len(ips)
+    labels = {}
+    rows = {}
+    for rows_of, values, bits, make_address in (
+        (v4_rows.tolist(), v4.tolist(), 32, ipaddress.IPv4Address),
+        (v6_rows.tolist(), [(h << 64) | l for h, l in zip(v6_hi.tolist(), v6_lo.tolist())], 128,
+         ipaddress.IPv6Address),
+    ):
+        members = [ips[r] for r in rows_of]
+        city_blocks = _sweep_blocks(values, members, city_reader, bits)
+        asn_blocks = _sweep_blocks(values, members, asn_reader, bits)
+        for k, row in enumerate(rows_of):
+            city_start, city_len, city_record = city_blocks[k]
+            asn_start, asn_len, asn_record = asn_blocks[k]
+            start, prefix_len = (city_start, city_len) if city_len >= asn_len else (asn_start, asn_len)
+            key = (start, prefix_len)
+            label = labels.get(key)
+            if label is None:
+                label = labels[key] = f"{make_address(start)}/{prefix_len}"
+                rows[label] = _city_fields(city_record) + _asn_fields(asn_record)
+            networks[row] = label
+
+    table = pd.DataFrame(
+        list(rows.values()), index=pd.Index(list(rows), name='Network'), columns=LOOKUP_COLUMNS, dtype=object
+    )
+    return networks, table
+
+
+def _lookup_task(task):
+    return lookup_batch(*task)
+
+
+class GeoEngine:
+    """
+    Batched GeoIP/ASN lookups over memory-mapped MaxMind databases.
+
+    Each process opens the .mmdb files once and reuses them; large sets of
+    distinct IPs are split into batches and looked up by a process pool.
+    Results are returned as a DataFrame indexed by IP, one column per field.
+    """
+
+    def __init__(self, city_db_path, asn_db_path, workers=None):
+        self.city_db_path = city_db_path
+        self.asn_db_path = asn_db_path
+        self.workers = workers or os.cpu_count() or 1
+
+    @property
+    def epoch(self):
+        return build_epochs(self.city_db_path, self.asn_db_path)
+
+    def lookup(self, ips):
+        ips = list(ips)
+        if len(ips) < POOL_THRESHOLD or self.workers < 2:
+            return lookup_batch(ips, self.city_db_path, self.asn_db_path)
+
+        tasks = [
+            (ips[i:i + BATCH_SIZE], self.city_db_path, self.asn_db_path)
+            for i in range(0, len(ips), BATCH_SIZE)
+        ]
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            return pd.concat(executor.map(_lookup_task, tasks))
+
+    def lookup_networks(self, ips):
+        return lookup_networks(ips, self.city_db_path, self.asn_db_path)
@@ -0,0 +1,149 @@
+import pandas as pd
+from geo_engine import LOOKUP_COLUMNS, GeoEngine
+from ip_ranges import IPRangeIndex, public_mask
+
+GEO_COLUMNS = ['Country', 'City', 'ASN', 'ISP']
+
+
+def load_msft_ip_ranges(msft_csv_path):
+    # Compiled interval index, cached next to the CSV until the CSV changes
+    return IPRangeIndex.load(msft_csv_path)
+
+
+def geo_lookup_frame(ip_list, city_db_path, asn_db_path, msft_ranges, cache=None, engine=None):
+    """
+    City/ASN details of distinct IPs as a DataFrame with a ClientIP column.
+    With a GeoCache only IPs not cached for the current database builds are
+    looked up in the MMDB files.
+    """
+    engine = engine or GeoEngine(city_db_path, asn_db_path)
+    ips = list(dict.fromkeys(ip_list))
+    if not ips:
+        return pd.DataFrame(columns=['ClientIP'] + LOOKUP_COLUMNS)
+
+    epoch = engine.epoch
+    found = cache.get(ips, epoch) if cache is not None else pd.DataFrame(columns=LOOKUP_COLUMNS)
+    missing = [ip for ip in ips if ip not in found.index]
+    new = engine.lookup(missing) if missing else pd.DataFrame(columns=LOOKUP_COLUMNS)
+    if cache is not None and len(new):
+        cache.put(new, epoch)
+
+    table = pd.concat([found, new]).reindex(ips)
+
+    # Check for Microsoft fallback, leaving ASN as "N/A"
+    table.loc[(table['ISP'] == 'N/A').to_numpy() & msft_ranges.contains(ips), 'ISP'] = 'Microsoft'
+
+    table.index.name = 'ClientIP'
+    return table.reset_index()
+
+
+def geo_lookup_networks(ip_list, city_db_path, asn_db_path, msft_ranges, engine=None):
+    """
+    Network-aggregated counterpart of geo_lookup_frame: each MMDB network block
+    is resolved once. Returns (networks, table), a Series mapping every distinct
+    IP to its Network and the lookup columns indexed by Network.
+    """
+    engine = engine or GeoEngine(city_db_path, asn_db_path)
+    ips = list(dict.fromkeys(ip_list))
+    labels, table = engine.lookup_networks(ips)
+    networks = pd.Series(labels, index=pd.Index(ips, name='ClientIP'), dtype=object)
+
+    # Microsoft fallback: a block without ASN data gets a second entry for its Microsoft addresses
+    msft = (table['ISP'].reindex(networks.values) == 'N/A').to_numpy() & msft_ranges.contains(ips)
+    if msft.any():
+        blocks = networks[msft].unique()
+        extra = table.loc[blocks].set_axis(pd.Index([f"{b} (Microsoft)" for b in blocks], name='Network'))
+        extra['ISP'] = 'Microsoft'
+        networks[msft] = networks[msft] + " (Microsoft)"
+        table = pd.concat([table, extra])
+        table = table[table.index.isin(networks.unique())]
+
+    return networks, table
+
+
+def place_geo_columns(df, ip_column='ResolvedClientIP'):
+    # Reorder columns to place Country, City, ASN, ISP right after the IP column
+    cols = list(df.columns)
+    geo_columns = GEO_COLUMNS + ['Network']
+    if ip_column in cols:
+        for col in geo_columns:
+            if col in cols:
+                cols.remove(col)
+        ip_index = cols.index(ip_column)
+        cols[ip_index + 1:ip_index + 1] = [c for c in geo_columns if c in df.columns]
+    return df[cols]
+
+
+class GeoEnricher:
+    """
+    In-process geolocation stage for parsed UAL chunks.
+
+    Only the distinct IPs of each chunk that have not been seen before are looked
+    up (through the GeoCache, when given); results are kept in a lookup table
+    indexed by IP and joined back onto the chunk in one vectorized reindex.
+    Private and unparsable IPs get empty values.
+
+    With `by_network`, IPs are mapped to the MMDB network block they belong to
+    and the lookup table holds one row per network, resolved once; a Network
+    column is added to the chunks. This mode does not use the GeoCache.
+    """
+
+    def __init__(self, city_db_path, asn_db_path, msft_ranges, cache=None, by_network=False):
+        self.city_db_path = city_db_path
+        self.asn_db_path = asn_db_path
+        self.msft_ranges = msft_ranges
+        self.cache = cache
+        self.by_network = by_network
+        # Chunks are already spread over the parse workers
+        self.engine = GeoEngine(city_db_path, asn_db_path, workers=1)
+        self.table = pd.DataFrame(columns=GEO_COLUMNS, dtype=object)
+        self.networks = pd.Series(dtype=object)
+
+    def resolve(self, ips):
+        """
+        Look up IPs missing from the table and add them to it.
+        """
+        known = self.networks.index if self.by_network else self.table.index
+        new_ips = pd.Index(ips).difference(known)
+        if new_ips.empty:
+            return
+        public = list(new_ips[public_mask(new_ips)])
+        if self.by_network:
+            self._resolve_networks(new_ips, public)
+            return
+        rows = pd.DataFrame("", index=new_ips, columns=GEO_COLUMNS, dtype=object)
+        if public:
+            found = geo_lookup_frame(
+                public, self.city_db_path, self.asn_db_path, self.msft_ranges, cache=self.cache, engine=self.engine
+            ).set_index('ClientIP')[GEO_COLUMNS].fillna("N/A").astype(str)
+            rows.loc[found.index] = found
+        self.table = pd.concat([self.table, rows]) if not self.table.empty else rows
+
+    def _resolve_networks(self, new_ips, public):
+        networks = pd.Series("", index=new_ips, dtype=object)
+        if public:
+            found, table = geo_lookup_networks(
+                public, self.city_db_path, self.asn_db_path, self.msft_ranges, engine=self.engine
+            )
+            networks.loc[found.index] = found
+            table = table.loc[~table.index.isin(self.table.index), GEO_COLUMNS].fillna("N/A").astype(str)
+            self.table = pd.concat([self.table, table]) if not self.table.empty else table
+        self.networks = pd.concat([self.networks, networks]) if not self.networks.empty else networks
+
+    def enrich(self, df, ip_column='ResolvedClientIP'):
+        if ip_column not in df.columns:
+            return df
+        ips = df[ip_column].astype(object).where(df[ip_column].notna(), None)
+        self.resolve(ips.dropna().unique())
+
+        # Add geolocation info based on the IP column with a single join
+        if self.by_network:
+            networks = self.networks.reindex(ips.values)
+            geo = self.table.reindex(networks.values)
+            df['Network'] = networks.fillna("").values
+        else:
+            geo = self.table.reindex(ips.values)
+        for col in GEO_COLUMNS:
+            df[col] = geo[col].fillna("").values
+
+        return place_geo_columns(df, ip_column)
@@ -0,0 +1,259 @@
+import ipaddress
+import os
+import socket
+import numpy as np
+
+
+def encode_ips(ips):
+    """
+    Encode IP strings as integers for array lookups.
+
+    Returns (v4_rows, v4, v6_rows, v6_hi, v6_lo): the positions of the IPv4
+    addresses and their uint32 values, and the positions of the IPv6 addresses
+    with the upper and lower 64 bits of each. Invalid strings are in neither.
+    """
+    v4_rows, v4_bytes, v6_rows, v6_bytes = [], [], [], []
+    for i, ip in enumerate(ips):
+        if not isinstance(ip, str):
+            continue
+        try:
+            if ":" in ip:
+                v6_bytes.append(socket.inet_pton(socket.AF_INET6, ip))
+                v6_rows.append(i)
+            else:
+                v4_bytes.append(socket.inet_pton(socket.AF_INET, ip))
+                v4_rows.append(i)
+        except OSError:
+            continue
+    v4 = np.frombuffer(b"".join(v4_bytes), dtype='>u4').astype(np.uint32)
+    v6 = np.frombuffer(b"".join(v6_bytes), dtype='>u8').astype(np.uint64).reshape(-1, 2)
+    return np.array(v4_rows, dtype=np.int64), v4, np.array(v6_rows, dtype=np.int64), v6[:, 0], v6[:, 1]
+
+
+def merge_intervals(starts, ends):
+    """
+    Sort [start, end] intervals and merge overlapping ones.
+    """
+    if starts.size == 0:
+        return starts, ends
+    order = np.argsort(starts, kind='stable')
+    starts, ends = starts[order], ends[order]
+    reach = np.maximum.accumulate(ends)
+    begins = np.ones(starts.size, dtype=bool)
+    begins[1:] = starts[1:] > reach[:-1]
+    first = np.flatnonzero(begins)
+    last = np.append(first[1:] - 1, starts.size - 1)
+    return starts[first], reach[last]
+
+
+def in_intervals(values, starts, ends):
+    """
+    Boolean mask of values inside any of the sorted, disjoint [start, end] intervals.
+    """
+    if starts.size == 0 or values.size == 0:
+        return np.zeros(values.size, dtype=bool)
+    pos = np.searchsorted(starts, values, side='right') - 1
+    found = pos >= 0
+    found[found] = values[found] <= ends[pos[found]]
+    return found
+
+
+class IPRangeIndex:
+    """
+    Sorted integer interval index over a list of IP prefixes.
+
+    IPv4 prefixes are uint32 intervals. IPv6 prefixes up to /64 are intervals
+    over the upper 64 bits; the few longer ones are kept as (upper 64 bits,
+    lower 64-bit interval) triples. Lookups are batched binary searches.
+    """
+
+    def __init__(self, v4_starts, v4_ends, v6_starts, v6_ends, v6_long):
+        self.v4_starts, self.v4_ends = v4_starts, v4_ends
+        self.v6_starts, self.v6_ends = v6_starts, v6_ends
+        self.v6_long = v6_long
+
+    @classmethod
+    def from_prefixes(cls, prefixes):
+        v4, v6, v6_long = [], [], []
+        for prefix in prefixes:
+            try:
+                net = ipaddress.ip_network(prefix)
+            except ValueError:
+                continue
+            first, last = int(net.network_address), int(net.broadcast_address)
+            if net.version == 4:
+                v4.append((first, last))
+            elif net.prefixlen <= 64:
+                v6.append((first >> 64, last >> 64))
+            else:
+                v6_long.append((first >> 64, first & 0xFFFFFFFFFFFFFFFF, last & 0xFFFFFFFFFFFFFFFF))
+
+        v4 = np.array(v4, dtype=np.uint32).reshape(-1, 2)
+        v6 = np.array(v6, dtype=np.uint64).reshape(-1, 2)
+        v4_starts, v4_ends = merge_intervals(v4[:, 0], v4[:, 1])
+        v6_starts, v6_ends = merge_intervals(v6[:, 0], v6[:, 1])
+        return cls(v4_starts, v4_ends, v6_starts, v6_ends, np.array(v6_long, dtype=np.uint64).reshape(-1, 3))
+
+    @classmethod
+    def from_csv(cls, csv_path):
+        prefixes = []
+        with open(csv_path, 'r') as f:
+            next(f)  # Skip header
+            for line in f:
+                prefixes.append(line.strip().split(',')[0])
+        return cls.from_prefixes(prefixes)
+
+    @classmethod
+    def load(cls, csv_path):
+        """
+        Load the compiled index cached next to the CSV, rebuilding it when the CSV changed.
+        """
+        stat = os.stat(csv_path)
+        stamp = np.array([stat.st_mtime_ns, stat.st_size], dtype=np.int64)
+        cache_path = f"{csv_path}.index.npz"
+        try:
+            with np.load(cache_path) as cached:
+                if np.array_equal(cached["stamp"], stamp):
+                    return cls(cached["v4_starts"], cached["v4_ends"], cached["v6_starts"],
+                               cached["v6_ends"], cached["v6_long"])
+        except (OSError, KeyError, ValueError):
+            pass
+
+        index = cls.from_csv(csv_path)
+        try:
+            with open(cache_path, 'wb') as f:
+                np.savez(f, stamp=stamp, v4_starts=index.v4_starts, v4_ends=index.v4_ends,
+                         v6_starts=index.v6_starts, v6_ends=index.v6_ends, v6_long=index.v6_long)
+        except OSError:
+            pass
+        return index
+
+    def __len__(self):
+        return self.v4_starts.size + self.v6_starts.size + len(self.v6_long)
+
+    def contains_encoded(self, v4, v6_hi, v6_lo):
+        """
+        Masks of encoded IPv4 and IPv6 addresses that fall inside the index.
+        """
+        v4_found = in_intervals(v4, self.v4_starts, self.v4_ends)
+        v6_found = in_intervals(v6_hi, self.v6_starts, self.v6_ends)
+        for hi, lo_start, lo_end in self.v6_long:
+            v6_found |= (v6_hi == hi) & (v6_lo >= lo_start) & (v6_lo <= lo_end)
+        return v4_found, v6_found
+
+    def contains(self, ips):
+        """
+        Boolean array telling for each IP string whether it is in one of the ranges.
+        """
+        ips = list(ips)
+        v4_rows, v4, v6_rows, v6_hi, v6_lo = encode_ips(ips)
+        v4_found, v6_found = self.contains_encoded(v4, v6_hi, v6_lo)
+        found = np.zeros(len(ips), dtype=bool)
+        found[v4_rows] = v4_found
+        found[v6_rows] = v6_found
+        return found
+
+
+# Special-purpose ranges behind the ipaddress is_* properties (Python 3.11)
+IPV4_SPECIAL = {
+    'private': [
+        '0.0.0.0/8', '10.0.0.0/8', '127.0.0.0/8', '169.254.0.0/16', '172.16.0.0/12', '192.0.0.0/29',
+        '192.0.0.170/31', '192.0.2.0/24', '192.168.0.0/16', '198.18.0.0/15', '198.51.100.0/24',
+        '203.0.113.0/24', '240.0.0.0/4', '255.255.255.255/32',
+    ],
+    'loopback': ['127.0.0.0/8'],
+    'link_local': ['169.254.0.0/16'],
+    'multicast': ['224.0.0.0/4'],
+    'reserved': ['240.0.0.0/4'],
+    'unspecified': ['0.0.0.0/32'],
+}
+
+IPV6_SPECIAL = {
+    'private': [
+        '::1/128', '::/128', '::ffff:0:0/96', '100::/64', '2001::/23', '2001:2::/48', '2001:db8::/32',
+        '2001:10::/28', 'fc00::/7', 'fe80::/10',
+    ],
+    'loopback': ['::1/128'],
+    'link_local': ['fe80::/10'],
+    'multicast': ['ff00::/8'],
+    'reserved': [
+        '::/8', '100::/8', '200::/7', '400::/6', '800::/5', '1000::/4', '4000::/3', '6000::/3', '8000::/3',
+        'a000::/3', 'c000::/3', 'e000::/4', 'f000::/5', 'f800::/6', 'fe00::/9',
+    ],
+    'unspecified': ['::/128'],
+}
+
+IPV4_MAPPED = ipaddress.ip_network('::ffff:0:0/96')
+
+
+def _v4_bounds(prefixes):
+    nets = [ipaddress.ip_network(p) for p in prefixes]
+    return [(np.uint32(int(n.network_address)), np.uint32(int(n.broadcast_address))) for n in nets]
+
+
+def _v6_bounds(prefixes):
+    bounds = []
+    for net in (ipaddress.ip_network(p) for p in prefixes):
+        first, last = int(net.network_address), int(net.broadcast_address)
+        bounds.append((np.uint64(first >> 64), np.uint64(first & 0xFFFFFFFFFFFFFFFF),
+                       np.uint64(last >> 64), np.uint64(last & 0xFFFFFFFFFFFFFFFF)))
+    return bounds
+
+
+IPV4_SPECIAL_BOUNDS = {flag: _v4_bounds(p) for flag, p in IPV4_SPECIAL.items()}
+IPV6_SPECIAL_BOUNDS = {flag: _v6_bounds(p) for flag, p in IPV6_SPECIAL.items()}
+
+
+def _in_v4(v4, bounds):
+    found = np.zeros(v4.size, dtype=bool)
+    for start, end in bounds:
+        found |= (v4 >= start) & (v4 <= end)
+    return found
+
+
+def _in_v6(hi, lo, bounds):
+    found = np.zeros(hi.size, dtype=bool)
+    for first_hi, first_lo, last_hi, last_lo in bounds:
+        after_first = (hi > first_hi) | ((hi == first_hi) & (lo >= first_lo))
+        before_last = (hi < last_hi) | ((hi == last_hi) & (lo <= last_lo))
+        found |= after_first & before_last
+    return found
+
+
+def classify_ips(ips):
+    """
+    Vectorized counterpart of the ipaddress is_private/is_loopback/is_link_local/
+    is_multicast/is_reserved/is_unspecified properties for a batch of IP strings.
+
+    Returns a dict of boolean arrays: one per property, plus 'valid'.
+    """
+    ips = list(ips)
+    v4_rows, v4, v6_rows, v6_hi, v6_lo = encode_ips(ips)
+    flags = {'valid': np.zeros(len(ips), dtype=bool)}
+    flags['valid'][v4_rows] = True
+    flags['valid'][v6_rows] = True
+
+    # IPv4-mapped IPv6 addresses are private when the embedded IPv4 address is
+    mapped = (v6_hi == 0) & ((v6_lo >> np.uint64(32)) == np.uint64(0xFFFF))
+    mapped_v4 = (v6_lo[mapped] & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+
+    for flag in IPV4_SPECIAL:
+        found = np.zeros(len(ips), dtype=bool)
+        found[v4_rows] = _in_v4(v4, IPV4_SPECIAL_BOUNDS[flag])
+        v6_found = _in_v6(v6_hi, v6_lo, IPV6_SPECIAL_BOUNDS[flag])
+        if flag == 'private':
+            v6_found[mapped] = _in_v4(mapped_v4, IPV4_SPECIAL_BOUNDS['private'])
+        found[v6_rows] = v6_found
+        flags[flag] = found
+    return flags
+
+
+def public_mask(ips):
+    """
+    Boolean array of the valid IPs that fall in none of the special-purpose ranges.
+    """
+    flags = classify_ips(ips)
+    mask = flags.pop('valid')
+    for found in flags.values():
+        mask &= ~found
+    return mask
@@ -0,0 +1,63 @@
+import json
+import os
+
+# Fastest first; the first importable backend is used unless UAL_JSON_BACKEND says otherwise
+PREFERRED_BACKENDS = ["orjson", "msgspec", "json"]
+
+
+def _load_orjson():
+    import orjson
+    return orjson.loads, (orjson.JSONDecodeError,)
+
+
+def _load_msgspec():
+    import msgspec
+    return msgspec.json.Decoder().decode, (msgspec.DecodeError,)
+
+
+def _load_stdlib():
+    return json.loads, (json.JSONDecodeError,)
+
+
+BACKEND_LOADERS = {
+    "orjson": _load_orjson,
+    "msgspec": _load_msgspec,
+    "json": _load_stdlib,
+}
+
+
+def available_backends():
+    names = []
+    for name in PREFERRED_BACKENDS:
+        try:
+            BACKEND_LOADERS[name]()
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def get_backend(name=None):
+    """
+    Return (name, loads, decode_errors) for the requested backend, or for the
+    fastest installed one. Unknown or missing backends fall back to stdlib json.
+    """
+    name = name or os.getenv("UAL_JSON_BACKEND")
+    candidates = [name] if name else PREFERRED_BACKENDS
+    for candidate in candidates:
+        loader = BACKEND_LOADERS.get(candidate)
+        if loader is None:
+            print(f"⚠️ Unknown JSON backend '{candidate}', using stdlib json.")
+            continue
+        try:
+            loads, errors = loader()
+        except ImportError:
+            if name:
+                print(f"⚠️ JSON backend '{candidate}' is not installed, using stdlib json.")
+            continue
+        return candidate, loads, errors
+    loads, errors = _load_stdlib()
+    return "json", loads, errors
+
+
+BACKEND_NAME, loads, DECODE_ERRORS = get_backend()
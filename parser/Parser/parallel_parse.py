@@ -0,0 +1,169 @@
+import csv
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+import pyarrow as pa
+from audit_flatten import DEFAULT_CHUNK_SIZE, iter_record_batches, iter_record_chunks
+from columnar_store import write_part
+
+BLOCK_SIZE = 16 * 1024 * 1024
+SHARDS_PER_WORKER = 4
+
+
+def find_record_boundaries(input_file, n_shards, block_size=BLOCK_SIZE):
+    """
+    Split a CSV file into record-aligned byte ranges of roughly equal size.
+
+    A newline only ends a record when it is outside a quoted field, i.e. when the
+    number of quote characters seen so far is even (escaped quotes are doubled,
+    so they never change the parity). Quoted multi-line AuditData values are
+    therefore never cut in half.
+
+    Returns (header_end, ranges) where ranges is a list of (start, end) offsets
+    covering every data row after the header.
+    """
+    size = os.path.getsize(input_file)
+    targets = [size * k // n_shards for k in range(1, n_shards)]
+    boundaries = []
+    target_index = 0
+    in_quotes = False
+    seeking = True  # the first record end found is the end of the header row
+
+    with open(input_file, 'rb') as f:
+        offset = 0
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            pos = 0
+            while True:
+                if not seeking:
+                    if target_index >= len(targets) or targets[target_index] >= offset + len(block):
+                        in_quotes ^= bool(block.count(b'"', pos) & 1)
+                        break
+                    target = max(targets[target_index] - offset, pos)
+                    in_quotes ^= bool(block.count(b'"', pos, target) & 1)
+                    pos = target
+                    seeking = True
+
+                newline = block.find(b'\n', pos)
+                if newline == -1:
+                    in_quotes ^= bool(block.count(b'"', pos) & 1)
+                    break
+                in_quotes ^= bool(block.count(b'"', pos, newline) & 1)
+                pos = newline + 1
+                if in_quotes:
+                    continue
+
+                boundary = offset + pos
+                boundaries.append(boundary)
+                while target_index < len(targets) and targets[target_index] <= boundary:
+                    target_index += 1
+                seeking = False
+            offset += len(block)
+
+    if not boundaries:
+        return size, []
+    header_end = boundaries[0]
+    edges = [b for b in boundaries if b < size] + [size]
+    ranges = [(start, end) for start, end in zip(edges, edges[1:]) if end > start]
+    return header_end, ranges
+
+
+def read_headers(input_file, header_end):
+    with open(input_file, 'rb') as f:
+        header_text = f.read(header_end).decode('utf-8')
+    return next(csv.reader(io.StringIO(header_text, newline='')))
+
+
+class ByteRangeReader(io.RawIOBase):
+    """
+    Raw stream over the [start, end) byte range of an open binary file, so a
+    shard is decoded and parsed through a small buffer instead of read whole.
+    """
+
+    def __init__(self, f, start, end):
+        self.f = f
+        self.f.seek(start)
+        self.remaining = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self.remaining)
+        if size <= 0:
+            return 0
+        read = self.f.readinto(memoryview(buffer)[:size])
+        self.remaining -= read
+        return read
+
+
+def _parse_shard(task):
+    (input_file, start, end, headers, chunk_size, process_chunk, registry, cache, projection,
+     spool_dir, shard_index) = task
+
+    def process(df):
+        if process_chunk is not None:
+            df = process_chunk(df)
+        if registry is not None:
+            df = registry.apply(df)
+        return df
+
+    part_files = []
+    with open(input_file, 'rb') as f:
+        text = io.TextIOWrapper(io.BufferedReader(ByteRangeReader(f, start, end)), encoding='utf-8', newline='')
+        reader = csv.reader(text)
+        if cache is not None:
+            # Cached rows are put back in place, so each part keeps the input row order
+            chunks = (
+                cache.fill(process(df) if not df.empty else df, positions, hit_positions, hit_hashes)
+                for df, positions, hit_positions, hit_hashes in iter_record_batches(
+                    headers, reader, cache, batch_size=chunk_size, projection=projection)
+            )
+        else:
+            chunks = (process(df) for df in iter_record_chunks(headers, reader, chunk_size=chunk_size,
+                                                               projection=projection))
+
+        for chunk in chunks:
+            if (chunk.num_rows if isinstance(chunk, pa.Table) else len(chunk)) == 0:
+                continue
+            part = os.path.join(spool_dir, f"part-{shard_index:05d}-{len(part_files):05d}.parquet")
+            write_part(chunk, part)
+            part_files.append(part)
+    schemas = registry.schemas if registry is not None else None
+    reused = cache.reused if cache is not None else 0
+    return part_files, schemas, reused
+
+
+def parse_parallel(input_file, writer, process_chunk=None, workers=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                   registry=None, cache=None, projection=None):
+    """
+    Flatten a UAL CSV with a process pool. Each worker parses one byte range and
+    spools its chunks as part files; the parts are handed to `writer` in the
+    original shard order, so the merged output keeps the input row order.
+    `process_chunk` must be picklable (a module-level function or a partial).
+    Each worker types its chunks with a copy of `registry`; what the workers
+    learn is merged back into it. Rows found in `cache` are not decoded; the
+    workers read them back from the cache in place. `projection` limits the
+    AuditData paths each worker extracts.
+    """
+    workers = workers or os.cpu_count() or 1
+    header_end, ranges = find_record_boundaries(input_file, workers * SHARDS_PER_WORKER)
+    if not ranges:
+        return
+    headers = read_headers(input_file, header_end)
+
+    tasks = [
+        (input_file, start, end, headers, chunk_size, process_chunk, registry, cache, projection, writer.spool_dir, i)
+        for i, (start, end) in enumerate(ranges)
+    ]
+    print(f"⚙️ Parsing {len(ranges)} shard(s) with {workers} worker(s)...")
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for part_files, schemas, reused in executor.map(_parse_shard, tasks):
+            for part in part_files:
+                writer.add_part(part)
+            if registry is not None:
+                registry.merge(schemas)
+            if cache is not None:
+                cache.reused += reused
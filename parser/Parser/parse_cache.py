@@ -0,0 +1,148 @@
+import hashlib
+import os
+import shutil
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from columnar_store import conform_table, frame_to_table, unify_schemas
+
+HASH_COLUMN = "AuditDataHash"
+
+# Row groups of records.parquet kept in memory while cached records are read back
+CACHED_ROW_GROUPS = 4
+
+
+def record_hash(audit_data_raw, record_id=""):
+    """
+    64-bit fingerprint of one UAL record, from its RecordId and raw AuditData text.
+    """
+    digest = hashlib.blake2b(f"{record_id}\x1f{audit_data_raw}".encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little', signed=True)
+
+
+class ParseCache:
+    """
+    Per-case store of already flattened and enriched UAL records.
+
+    The previous run's output is kept as records.parquet together with a sorted
+    array of its record hashes and the row each hash was first written at. A
+    re-run only decodes rows whose hash is not in the cache; cached rows are
+    read back from records.parquet, row group by row group, and put back in
+    their input position, so the output has the same row order as a fresh
+    parse. The cache is only reused when it was written with the same
+    `signature` (projection, GeoIP/ASN database builds and geo mode).
+    """
+
+    def __init__(self, cache_dir, signature="full"):
+        self.cache_dir = cache_dir
+        self.signature = signature
+        self.records_file = os.path.join(cache_dir, "records.parquet")
+        self.hashes_file = os.path.join(cache_dir, "hashes.npy")
+        self.positions_file = os.path.join(cache_dir, "positions.npy")
+        self.signature_file = os.path.join(cache_dir, "signature.txt")
+        self._known = None
+        self._positions = None
+        self._parquet = None
+        self._group_starts = None
+        self._groups = {}
+        self.reused = 0
+
+    def __getstate__(self):
+        # Workers reload the hash arrays and reopen the records file instead of receiving pickled copies
+        state = self.__dict__.copy()
+        state.update(_known=None, _positions=None, _parquet=None, _group_starts=None, _groups={}, reused=0)
+        return state
+
+    def _signature_matches(self):
+        if not os.path.exists(self.signature_file):
+            return self.signature == "full"
+        with open(self.signature_file, 'r', encoding='utf-8') as f:
+            return f.read() == self.signature
+
+    def _load(self):
+        if (os.path.exists(self.hashes_file) and os.path.exists(self.positions_file)
+                and os.path.exists(self.records_file) and self._signature_matches()):
+            self._known = np.load(self.hashes_file)
+            self._positions = np.load(self.positions_file)
+        else:
+            self._known = np.empty(0, dtype=np.int64)
+            self._positions = np.empty(0, dtype=np.int64)
+
+    @property
+    def known(self):
+        if self._known is None:
+            self._load()
+        return self._known
+
+    def contains(self, hashes):
+        hashes = np.asarray(hashes, dtype=np.int64)
+        known = self.known
+        if known.size == 0:
+            return np.zeros(len(hashes), dtype=bool)
+        pos = np.searchsorted(known, hashes).clip(max=known.size - 1)
+        return known[pos] == hashes
+
+    def _row_group(self, index):
+        table = self._groups.get(index)
+        if table is None:
+            if len(self._groups) >= CACHED_ROW_GROUPS:
+                self._groups.pop(next(iter(self._groups)))
+            table = self._groups[index] = self._parquet.read_row_group(index)
+        return table
+
+    def take(self, hashes):
+        """
+        Cached records for the given (cached) hashes, in that order, as an Arrow table.
+        Only the row groups holding them are read; the last few are kept open, so
+        re-runs over an export in the same order read records.parquet about once.
+        """
+        hashes = np.asarray(hashes, dtype=np.int64)
+        if self._parquet is None:
+            self._parquet = pq.ParquetFile(self.records_file)
+            sizes = [self._parquet.metadata.row_group(i).num_rows for i in range(self._parquet.num_row_groups)]
+            self._group_starts = np.cumsum([0] + sizes[:-1]).astype(np.int64)
+        known = self.known
+        rows = self._positions[np.searchsorted(known, hashes)]
+        groups = np.searchsorted(self._group_starts, rows, side='right') - 1
+
+        pieces = []
+        for index in np.unique(groups):
+            in_group = groups == index
+            pieces.append(self._row_group(int(index)).take(rows[in_group] - self._group_starts[index]))
+        table = pa.concat_tables(pieces)
+        # Pieces are grouped by row group; restore the order of `hashes`
+        return table.take(np.argsort(np.argsort(groups, kind='stable'), kind='stable'))
+
+    def fill(self, df, positions, hit_positions, hit_hashes):
+        """
+        Put the cached records of one input batch back between its freshly parsed
+        (and processed) rows. `positions` and `hit_positions` are the input row
+        numbers of the rows of `df` and of the cache hits. Returns an Arrow table.
+        """
+        fresh = frame_to_table(df)
+        if len(hit_hashes) == 0:
+            return fresh
+        self.reused += len(hit_hashes)
+        cached = self.take(hit_hashes)
+        if fresh.num_rows == 0:
+            return cached
+        # Columns keep the order of the previous output, new ones come after
+        schema = unify_schemas([cached.schema, fresh.schema])
+        table = pa.concat_tables([conform_table(fresh, schema), conform_table(cached, schema)])
+        order = np.argsort(np.concatenate([positions, hit_positions]), kind='stable')
+        return table.take(order)
+
+    def update(self, output_file):
+        """
+        Make the freshly written output the cache for the next run.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        if HASH_COLUMN not in pq.read_schema(output_file).names:
+            return
+        hashes = pq.read_table(output_file, columns=[HASH_COLUMN]).column(HASH_COLUMN)
+        shutil.copyfile(output_file, self.records_file)
+        known, first = np.unique(hashes.to_numpy(zero_copy_only=False).astype(np.int64), return_index=True)
+        np.save(self.hashes_file, known)
+        np.save(self.positions_file, first.astype(np.int64))
+        with open(self.signature_file, 'w', encoding='utf-8') as f:
+            f.write(self.signature)
@@ -0,0 +1,118 @@
+import os
+import zipfile
+import yaml
+from audit_flatten import flatten_audit_data
+
+# Chart params that name dataset columns directly
+COLUMN_LIST_PARAMS = ["all_columns", "groupby", "columns", "series_columns"]
+COLUMN_PARAMS = ["x_axis", "series", "entity", "granularity_sqla"]
+
+# Columns the pipeline itself needs (ResolvedClientIP, dedup, matcher keys, schema keys, detection rules)
+PIPELINE_COLUMNS = {
+    "id", "clientip", "clientipaddress", "creationtime", "sessionid", "userid",
+    "operation", "workload", "recordtype", "clientinfostring", "useragent", "actorinfostring",
+}
+
+
+def _chart_columns(params):
+    columns = set()
+    for name in COLUMN_LIST_PARAMS:
+        for value in params.get(name) or []:
+            if isinstance(value, str):
+                columns.add(value)
+    for name in COLUMN_PARAMS:
+        value = params.get(name)
+        if isinstance(value, str):
+            columns.add(value)
+    for metric in params.get("metrics") or []:
+        if isinstance(metric, dict) and isinstance(metric.get("column"), dict):
+            columns.add(metric["column"].get("column_name"))
+    for adhoc_filter in params.get("adhoc_filters") or []:
+        if isinstance(adhoc_filter, dict) and isinstance(adhoc_filter.get("subject"), str):
+            columns.add(adhoc_filter["subject"])
+    columns.update((params.get("temporal_columns_lookup") or {}).keys())
+    return {c.lower() for c in columns if c}
+
+
+def columns_from_dashboard_export(path):
+    """
+    Collect the dataset columns used by the charts of a Superset dashboard export
+    (an export folder or .zip), lower-cased like the columns of the case table.
+    """
+    charts = []
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zf:
+            for name in zf.namelist():
+                if "/charts/" in name and name.endswith(".yaml"):
+                    charts.append(yaml.safe_load(zf.read(name)))
+    else:
+        for root, _, files in os.walk(path):
+            if os.path.basename(root) != "charts":
+                continue
+            for f in files:
+                if f.endswith(".yaml"):
+                    with open(os.path.join(root, f), 'r', encoding='utf-8') as fh:
+                        charts.append(yaml.safe_load(fh))
+
+    columns = set()
+    for chart in charts:
+        columns |= _chart_columns((chart or {}).get("params") or {})
+    return columns
+
+
+class ColumnProjection:
+    """
+    Flatten only the AuditData paths on a column allow-list.
+
+    Names are matched case-insensitively against the dotted flattened path
+    (e.g. "item.subject" selects Item.Subject). Nested objects are only walked
+    when an allowed path lies beneath them; everything else is skipped without
+    being flattened or stored.
+    """
+
+    def __init__(self, columns):
+        self.paths = {c.strip().lower() for c in columns if c and c.strip()} | PIPELINE_COLUMNS
+        self.prefixes = set()
+        for path in self.paths:
+            parts = path.split(".")
+            for i in range(1, len(parts)):
+                self.prefixes.add(".".join(parts[:i]))
+        self.keep_raw = "auditdataraw" in self.paths
+        self._lower = {}
+
+    @property
+    def signature(self):
+        return ",".join(sorted(self.paths))
+
+    def flatten(self, obj, prefix="", sep=".", out=None):
+        if out is None:
+            out = {}
+        lower = self._lower
+        for key, value in obj.items():
+            name = f"{prefix}{sep}{key}" if prefix else str(key)
+            lname = lower.get(name)
+            if lname is None:
+                lname = lower[name] = name.lower()
+            if lname in self.paths:
+                if isinstance(value, dict):
+                    flatten_audit_data(value, name, sep, out)
+                else:
+                    out[name] = value
+            elif lname in self.prefixes and isinstance(value, dict):
+                self.flatten(value, name, sep, out)
+        return out
+
+
+def load_projection(columns=None, dashboard_export=None):
+    """
+    Build a ColumnProjection from an explicit column list and/or a dashboard export.
+    Returns None (full flattening) when neither is given.
+    """
+    allowed = set()
+    if columns:
+        allowed |= {c.strip().lower() for c in columns if c.strip()}
+    if dashboard_export:
+        allowed |= columns_from_dashboard_export(dashboard_export)
+    if not allowed:
+        return None
+    return ColumnProjection(allowed)
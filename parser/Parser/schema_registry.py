@@ -0,0 +1,215 @@
+import json
+import os
+import re
+import pandas as pd
+
+SCHEMA_KEYS = ["Workload", "Operation", "RecordType"]
+
+# Widening order used when two observations of a column disagree
+KIND_RANK = {"bool": 0, "int": 1, "float": 2, "datetime": 3, "category": 4, "string": 5}
+
+# Columns whose type is known up front, regardless of what the samples look like
+DECLARED_COLUMNS = {
+    "CreationTime": "datetime",
+    "RecordType": "int",
+    "UserType": "int",
+    "Version": "int",
+    "LogonType": "int",
+    "InternalLogonType": "int",
+    "OperationCount": "int",
+    "ExternalAccess": "bool",
+    "Workload": "category",
+    "Operation": "category",
+    "ResultStatus": "category",
+    "OrganizationId": "category",
+    "AuditDataRaw": "string",
+}
+
+ISO_TIMESTAMP = re.compile(r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}")
+SAMPLE_SIZE = 200
+MIN_LEARN_ROWS = 100
+MAX_CATEGORIES = 256
+
+
+def infer_kind(values):
+    """
+    Infer the storage kind of a column from a sample of its non-null values.
+    """
+    if len(values) == 0:
+        return None
+    types = {type(v) for v in values}
+    if types <= {bool}:
+        return "bool"
+    if types <= {int}:
+        return "int"
+    if types <= {int, float}:
+        return "float"
+    if types <= {str}:
+        if all(ISO_TIMESTAMP.match(v) for v in values):
+            return "datetime"
+        unique = len(set(values))
+        if unique <= MAX_CATEGORIES and unique * 2 <= len(values):
+            return "category"
+    return "string"
+
+
+def sample_values(values):
+    """
+    Non-null sample of a column for infer_kind. from_records turns sparse int
+    fields into float64, so an all-integral float sample counts as ints.
+    """
+    sample = values.iloc[:SAMPLE_SIZE]
+    if pd.api.types.is_float_dtype(sample.dtype) and (sample % 1 == 0).all():
+        return [int(v) for v in sample]
+    return sample.tolist()
+
+
+def widen(a, b):
+    if a is None:
+        return b
+    if b is None or a == b:
+        return a
+    if {a, b} <= {"bool", "int", "float"}:
+        return max(a, b, key=KIND_RANK.get)
+    return "string"
+
+
+def cast_column(series, kind):
+    """
+    Cast a column to the dtype of its kind. If any value does not fit the kind,
+    the column is returned unchanged rather than losing data.
+    """
+    nulls = series.isna().sum()
+    try:
+        if kind == "datetime":
+            converted = pd.to_datetime(series, errors="coerce", utc=True).dt.tz_convert(None)
+            return converted if converted.isna().sum() == nulls else series
+        if kind in ("int", "float"):
+            numeric = pd.to_numeric(series, errors="coerce")
+            if numeric.isna().sum() != nulls:
+                return series
+            if kind == "int" and (numeric.dropna() % 1 == 0).all():
+                return numeric.astype("Int64")
+            return numeric.astype("float64")
+        if kind == "bool":
+            return series.astype("boolean")
+        if kind == "category":
+            return series.astype("category")
+    except (TypeError, ValueError):
+        pass
+    return series
+
+
+def needs_cast(series, kind):
+    """
+    Whether a column still has to be cast to its kind. Besides object columns,
+    sparse int/bool fields arrive as float64 (NaN for missing) from from_records.
+    """
+    if series.dtype == object:
+        return True
+    if kind == "int":
+        return pd.api.types.is_float_dtype(series.dtype)
+    if kind == "bool":
+        return pd.api.types.is_float_dtype(series.dtype) or series.dtype == bool
+    return False
+
+
+class SchemaRegistry:
+    """
+    Typed column schemas for flattened AuditData, keyed by Workload/Operation/RecordType.
+
+    Each key maps column names to a storage kind (datetime, int, float, bool,
+    category, string). Kinds come from DECLARED_COLUMNS or are learned from the
+    first MIN_LEARN_ROWS rows seen for that key, then reused for every later
+    chunk and, once saved, for later cases.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.schemas = {}
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.schemas = json.load(f)
+
+    def _chunk_keys(self, df):
+        parts = []
+        for col in SCHEMA_KEYS:
+            if col in df.columns:
+                parts.append(df[col].astype(str).where(df[col].notna(), ""))
+            else:
+                parts.append(pd.Series("", index=df.index))
+        return parts[0].str.cat(parts[1:], sep="|")
+
+    def learn(self, df, keys=None):
+        """
+        Record kinds for (key, column) pairs not yet seen, or seen on too few rows.
+        """
+        if keys is None:
+            keys = self._chunk_keys(df)
+        present = df.notna().groupby(keys.values).any()
+        positions = pd.Series(range(len(df)), index=df.index).groupby(keys.values).indices
+
+        for key, row in present.iterrows():
+            schema = self.schemas.setdefault(key, {})
+            rows = positions[key]
+            for col in row.index[row.values]:
+                entry = schema.get(col)
+                if entry is not None and entry["rows"] >= MIN_LEARN_ROWS:
+                    continue
+                values = df[col].iloc[rows].dropna()
+                kind = infer_kind(sample_values(values))
+                if entry is None:
+                    schema[col] = {"kind": kind, "rows": len(values)}
+                else:
+                    entry["kind"] = widen(entry["kind"], kind)
+                    entry["rows"] += len(values)
+
+    def resolve(self, df, keys=None):
+        """
+        Return {column: kind} for a chunk, merging the schemas of every key in it.
+        """
+        if keys is None:
+            keys = self._chunk_keys(df)
+        kinds = {}
+        for key in keys.unique():
+            for col, entry in self.schemas.get(key, {}).items():
+                if col in df.columns:
+                    kinds[col] = widen(kinds.get(col), entry["kind"])
+        for col, kind in DECLARED_COLUMNS.items():
+            if col in df.columns:
+                kinds[col] = kind
+        return kinds
+
+    def apply(self, df):
+        """
+        Learn from a chunk and cast its columns to their registered dtypes.
+        """
+        if df.empty:
+            return df
+        keys = self._chunk_keys(df)
+        self.learn(df, keys)
+        for col, kind in self.resolve(df, keys).items():
+            if kind and kind != "string" and needs_cast(df[col], kind):
+                df[col] = cast_column(df[col], kind)
+        return df
+
+    def merge(self, schemas):
+        """
+        Fold schemas learned elsewhere (e.g. by parse workers) into this registry.
+        """
+        for key, columns in schemas.items():
+            schema = self.schemas.setdefault(key, {})
+            for col, entry in columns.items():
+                current = schema.get(col)
+                if current is None:
+                    schema[col] = dict(entry)
+                else:
+                    current["kind"] = widen(current["kind"], entry["kind"])
+                    current["rows"] = max(current["rows"], entry["rows"])
+
+    def save(self, path=None):
+        path = path or self.path
+        if not path:
+            return
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.schemas, f, indent=2, sort_keys=True)
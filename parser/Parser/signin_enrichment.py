@@ -0,0 +1,177 @@
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from geo_engine import open_reader
+from geo_enrichment import load_msft_ip_ranges
+from ip_ranges import public_mask
+
+SIGNIN_COLUMNS = ['City', 'Region', 'Country', 'Org']
+
+DEFAULT_CHUNK_SIZE = 100000
+
+
+def _city(record):
+    return (((record or {}).get('city') or {}).get('names') or {}).get('en', "")
+
+
+def _region(record):
+    subdivisions = (record or {}).get('subdivisions') or []
+    if not subdivisions:
+        return ""
+    return (subdivisions[0].get('names') or {}).get('en', "")
+
+
+def _country(record):
+    # ISO code, as ipinfo returns it (and enrich-signin.ps1 wrote it)
+    record = record or {}
+    country = record.get('country') or record.get('registered_country') or {}
+    return country.get('iso_code', "")
+
+
+def _org(asn, isp):
+    if isp in ("N/A", None, ""):
+        return ""
+    if asn in ("N/A", None, ""):
+        return isp
+    return f"AS{asn} {isp}"
+
+
+def collect_ips(input_file, ip_column="IPAddress", chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Distinct values of the IP column, read one chunk at a time.
+    """
+    ips = set()
+    for chunk in pd.read_csv(input_file, usecols=[ip_column], dtype=str, chunksize=chunk_size):
+        ips.update(chunk[ip_column].dropna().str.strip())
+    ips.discard("")
+    return ips
+
+
+def offline_lookup(ips, city_db_path, asn_db_path, msft_ranges):
+    """
+    City/Region/Country/Org per public IP from the local GeoLite2 databases
+    and the Microsoft range index, in ipinfo's format (Country is the ISO code).
+    Each IP is read once from the City and once from the ASN database.
+    Returns a DataFrame indexed by IP.
+    """
+    ips = list(ips)
+    public = [ip for ip, keep in zip(ips, public_mask(ips)) if keep]
+    table = pd.DataFrame("", index=pd.Index(ips, name='IPAddress'), columns=SIGNIN_COLUMNS, dtype=object)
+    if not public:
+        return table
+
+    city_get = open_reader(city_db_path).get
+    asn_get = open_reader(asn_db_path).get
+    rows = []
+    for ip, microsoft in zip(public, msft_ranges.contains(public)):
+        city = city_get(ip)
+        asn = asn_get(ip)
+        if asn is None:
+            # Microsoft fallback, as in the UAL enrichment
+            asn = {'autonomous_system_organization': 'Microsoft'} if microsoft else {}
+        rows.append([
+            _city(city), _region(city), _country(city),
+            _org(asn.get('autonomous_system_number'), asn.get('autonomous_system_organization')),
+        ])
+    table.loc[public] = pd.DataFrame(rows, index=public, columns=SIGNIN_COLUMNS, dtype=object)
+    return table
+
+
+class RateLimiter:
+    """
+    Spaces calls at least 1/rate seconds apart across threads.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.lock = threading.Lock()
+        self.next_call = 0.0
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_call - now
+            self.next_call = max(now, self.next_call) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def http_lookup(ips, base_url="https://ipinfo.io", token=None, workers=8, rate=10.0, timeout=10):
+    """
+    ipinfo-style HTTP lookups for IPs the offline databases could not resolve,
+    run concurrently but no faster than `rate` requests per second.
+    Returns a DataFrame indexed by IP; failed lookups stay empty.
+    """
+    limiter = RateLimiter(rate)
+
+    def fetch(ip):
+        url = f"{base_url.rstrip('/')}/{ip}/json"
+        if token:
+            url += f"?token={token}"
+        limiter.wait()
+        try:
+            with urllib.request.urlopen(url, timeout=timeout) as response:
+                data = json.loads(response.read().decode('utf-8'))
+        except (urllib.error.URLError, OSError, ValueError):
+            print(f"⚠️ Failed to fetch data for IP {ip}")
+            return ["", "", "", ""]
+        return [data.get(col.lower()) or "" for col in SIGNIN_COLUMNS]
+
+    ips = list(ips)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        rows = list(executor.map(fetch, ips))
+    return pd.DataFrame(rows, index=pd.Index(ips, name='IPAddress'), columns=SIGNIN_COLUMNS, dtype=object)
+
+
+def enrich_signin_csv(input_file, output_file, lookup, ip_column="IPAddress", chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Stream the sign-in CSV and write it back with City/Region/Country/Org
+    columns joined from the lookup table, one chunk at a time.
+    """
+    rows = 0
+    for i, chunk in enumerate(pd.read_csv(input_file, dtype=str, keep_default_na=False, chunksize=chunk_size)):
+        geo = lookup.reindex(chunk[ip_column].str.strip())
+        for col in SIGNIN_COLUMNS:
+            chunk[col] = geo[col].fillna("").values
+        chunk.to_csv(output_file, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+        rows += len(chunk)
+    return rows
+
+
+if __name__ == '__main__':
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    input_file = os.getenv("SIGNIN_INPUT_FILE", "SignInLogs.csv")
+    output_file = os.getenv("SIGNIN_OUTPUT_FILE", "SignInLogs_WithLocation.csv")
+    ip_column = os.getenv("SIGNIN_IP_COLUMN", "IPAddress")
+    geo_dir = os.getenv("UAL_GEO_DIR", script_dir)
+    http_fallback = os.getenv("SIGNIN_HTTP_FALLBACK", "0") == "1"
+
+    ips = collect_ips(input_file, ip_column)
+    print(f"🌍 {len(ips)} distinct IP(s) in '{input_file}'")
+
+    lookup = offline_lookup(
+        ips,
+        city_db_path=os.path.join(geo_dir, "GeoLite2-City.mmdb"),
+        asn_db_path=os.path.join(geo_dir, "GeoLite2-ASN.mmdb"),
+        msft_ranges=load_msft_ip_ranges(os.path.join(geo_dir, "msft-public-ips.csv"))
+    )
+
+    # Public IPs the local databases know nothing about
+    unresolved = lookup.index[(lookup == "").all(axis=1).to_numpy() & public_mask(lookup.index)]
+    if http_fallback and len(unresolved):
+        print(f"🌐 Looking up {len(unresolved)} unresolved IP(s) over HTTP...")
+        lookup.loc[unresolved] = http_lookup(
+            unresolved,
+            base_url=os.getenv("IPINFO_URL", "https://ipinfo.io"),
+            token=os.getenv("IPINFO_TOKEN"),
+            workers=int(os.getenv("SIGNIN_HTTP_WORKERS", "8")),
+            rate=float(os.getenv("SIGNIN_HTTP_RATE", "10"))
+        )
+
+    rows = enrich_signin_csv(input_file, output_file, lookup, ip_column)
+    print(f"✅ Done! {rows} sign-in row(s) saved to: {output_file}")
@@ -0,0 +1,64 @@
+import csv
+import json
+
+import pandas as pd
+import pytest
+
+from audit_flatten import flatten_audit_data, iter_flattened_chunks
+
+RECORDS = [
+    {"Id": "r0", "Operation": "MailItemsAccessed", "ClientIPAddress": "2a00:1450:4009::1", "LogonType": 0,
+     "Folders": [{"Id": "f1", "FolderItems": [{"SizeInBytes": 10}]}], "OperationProperties": []},
+    {"Id": "r1", "Operation": "Send", "ClientIP": "8.8.8.8", "Item": {"Subject": "Invoice", "Attachments": None,
+                                                                     "ParentFolder": {"Path": "\\Sent Items"}}},
+    {"Id": "r2", "Operation": "UserLoggedIn", "ExtendedProperties": [{"Name": "UserAgent", "Value": "axios/1.6.7"}],
+     "DeviceProperties": {}, "ClientIP": "", "ClientIPAddress": "81.2.69.160"},
+    {"Id": "r3", "Operation": "FileAccessed", "Nested": {"Empty": {}, "Deep": {"Er": {"Value": 1.5}}}, "Flag": True},
+]
+
+
+@pytest.mark.parametrize("record", RECORDS)
+def test_flatten_matches_json_normalize(record):
+    assert flatten_audit_data(record) == pd.json_normalize(record).iloc[0].to_dict()
+
+
+def reference_rows(path):
+    # The per-row pd.json_normalize parse the flattener replaced
+    rows = []
+    with open(path, "r", encoding="utf-8") as file:
+        reader = csv.reader(file)
+        headers = next(reader)
+        audit_data_index = headers.index("AuditData")
+        for line in reader:
+            try:
+                audit_data_raw = line[audit_data_index]
+                flat_dict = pd.json_normalize(json.loads(audit_data_raw)).iloc[0].to_dict()
+                base_row = {headers[i]: line[i] for i in range(len(headers)) if i != audit_data_index}
+            except (json.JSONDecodeError, IndexError):
+                continue
+            flat_dict["AuditDataRaw"] = audit_data_raw
+            flat_dict["ResolvedClientIP"] = flat_dict.get("ClientIP") or flat_dict.get("ClientIPAddress")
+            rows.append({**base_row, **flat_dict})
+    return pd.DataFrame(rows)
+
+
+def test_chunks_match_json_normalize_parse(tmp_path, write_ual):
+    path = write_ual(tmp_path / "UAL.csv", RECORDS * 3, indent=2)
+    with open(path, "a", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        # Undecodable AuditData and a row without an AuditData cell are skipped
+        writer.writerow(["bad", "", "", "Send", "", "{not json"])
+        writer.writerow(["short"])
+
+    chunks = list(iter_flattened_chunks(str(path), chunk_size=5))
+    assert [len(chunk) for chunk in chunks] == [5, 5, 2]
+    flattened = pd.concat(chunks, ignore_index=True)
+    expected = reference_rows(path)
+    assert flattened["ResolvedClientIP"].tolist()[:4] == ["2a00:1450:4009::1", "8.8.8.8", "81.2.69.160", None]
+    pd.testing.assert_frame_equal(flattened[expected.columns], expected)
+
+
+def test_empty_export(tmp_path):
+    path = tmp_path / "UAL.csv"
+    path.write_text("RecordId,Operation,AuditData\n")
+    assert list(iter_flattened_chunks(str(path))) == []
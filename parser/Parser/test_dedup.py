@@ -0,0 +1,56 @@
+import numpy as np
+import pyarrow as pa
+
+from dedup import RecordDeduplicator
+from parse_cache import HASH_COLUMN
+
+
+def ids_table(ids):
+    return pa.table({"Id": pa.array(ids, type=pa.string()), "Seq": pa.array(range(len(ids)), type=pa.int64())})
+
+
+def test_first_occurrence_is_kept(tmp_path):
+    dedup = RecordDeduplicator(str(tmp_path / "spill"))
+    first = dedup.filter_table(ids_table(["a", "b", "a", "c"]))
+    assert first.column("Seq").to_pylist() == [0, 1, 3]
+    second = dedup.filter_table(ids_table(["c", "d", "b"]))
+    assert second.column("Id").to_pylist() == ["d"]
+    assert dedup.dropped == 3
+
+
+def test_spilled_keys_are_still_found(tmp_path):
+    spill_dir = tmp_path / "spill"
+    dedup = RecordDeduplicator(str(spill_dir), max_memory_keys=10)
+    for start in range(0, 96, 8):
+        dedup.filter_table(ids_table([f"r{i}" for i in range(start, start + 8)]))
+    assert len(dedup._runs) > 1
+    assert sorted(p.name for p in spill_dir.iterdir())[0] == "run-00000.npy"
+
+    again = dedup.filter_table(ids_table([f"r{i}" for i in range(0, 110, 5)]))
+    assert again.column("Id").to_pylist() == ["r100", "r105"]
+    assert dedup.dropped == 20
+
+    dedup.close()
+    assert not spill_dir.exists()
+
+
+def test_falls_back_to_record_id_and_content_hash(tmp_path):
+    dedup = RecordDeduplicator(str(tmp_path / "spill"))
+    table = pa.table({
+        "Id": pa.array(["a", None, "", None, None], type=pa.string()),
+        "RecordId": pa.array(["x", "r1", "r2", None, None], type=pa.string()),
+        HASH_COLUMN: pa.array([1, 2, 3, 4, 4], type=pa.int64()),
+    })
+    keys, has_key = dedup.record_keys(table)
+    assert has_key.all()
+    assert keys[3] == keys[4]
+    assert len(set(keys[:4].tolist())) == 4
+    assert dedup.filter_table(table).num_rows == 4
+
+
+def test_rows_without_any_key_are_kept(tmp_path):
+    dedup = RecordDeduplicator(str(tmp_path / "spill"))
+    table = pa.table({"Id": pa.array([None, None], type=pa.string()), "Seq": [0, 1]})
+    assert dedup.filter_table(table).num_rows == 2
+    assert dedup.filter_table(pa.table({"Seq": pa.array([], type=pa.int64())})).num_rows == 0
+    assert dedup._contains(np.array([1], dtype=np.int64)).tolist() == [False]
@@ -0,0 +1,58 @@
+import pickle
+import sqlite3
+
+import pandas as pd
+
+from geo_cache import CACHE_FIELDS, GeoCache
+from geo_enrichment import geo_lookup_frame, load_msft_ip_ranges
+
+
+def entries(ips, country):
+    return pd.DataFrame([[country, "City", 1.0, 2.0, 64500, "ISP"]] * len(ips), columns=CACHE_FIELDS,
+                        index=pd.Index(ips, name="ClientIP"))
+
+
+def test_entries_of_an_older_build_are_purged(tmp_path):
+    path = tmp_path / "cache" / "geo_cache.sqlite"
+    cache = GeoCache(str(path))
+    cache.put(entries(["8.8.8.8", "81.2.69.160"], "US"), (1, 1))
+    found = cache.get(["8.8.8.8", "1.1.1.1", "8.8.8.8"], (1, 1))
+    assert found.index.tolist() == ["8.8.8.8"]
+    assert found.loc["8.8.8.8", "Country"] == "US"
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.close()
+
+    # A new City or ASN build drops every entry of the old one
+    cache = GeoCache(str(path))
+    assert cache.get(["8.8.8.8", "81.2.69.160"], (1, 2)).empty
+    cache.put(entries(["81.2.69.160"], "GB"), (1, 2))
+    cache.close()
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT ip, city_epoch, asn_epoch, country FROM geo").fetchall() == [
+            ("81.2.69.160", 1, 2, "GB")]
+
+
+def test_cache_is_picklable(tmp_path):
+    cache = GeoCache(str(tmp_path / "geo_cache.sqlite"))
+    cache.put(entries(["8.8.8.8"], "US"), (1, 1))
+    copy = pickle.loads(pickle.dumps(cache))
+    assert copy.get(["8.8.8.8"], (1, 1)).loc["8.8.8.8", "Country"] == "US"
+    copy.close()
+    cache.close()
+
+
+def test_geo_lookup_frame_only_looks_up_misses(tmp_path, geo_dir):
+    city_db, asn_db = str(geo_dir / "GeoLite2-City.mmdb"), str(geo_dir / "GeoLite2-ASN.mmdb")
+    msft_ranges = load_msft_ip_ranges(str(geo_dir / "msft-public-ips.csv"))
+    ips = ["8.8.8.8", "81.2.69.160", "13.64.0.5"]
+    uncached = geo_lookup_frame(ips, city_db, asn_db, msft_ranges)
+
+    cache = GeoCache(str(tmp_path / "geo_cache.sqlite"))
+    first = geo_lookup_frame(ips[:2], city_db, asn_db, msft_ranges, cache=cache)
+    assert (cache.hits, cache.misses) == (0, 2)
+    second = geo_lookup_frame(ips, city_db, asn_db, msft_ranges, cache=cache)
+    assert (cache.hits, cache.misses) == (2, 3)
+    cache.close()
+
+    pd.testing.assert_frame_equal(second, uncached, check_dtype=False)
+    pd.testing.assert_frame_equal(first, uncached.iloc[:2], check_dtype=False)
@@ -0,0 +1,43 @@
+import pandas as pd
+
+from geo_engine import GeoEngine, lookup_batch
+
+IPS = [
+    "8.8.8.8", "81.2.69.160", "8.8.8.9", "2a00:1450:4009::1", "2a00:1450:4009:ffff::2",
+    "81.2.69.1", "1.1.1.1", "9.9.9.9", "10.1.2.3", "not-an-ip",
+]
+
+
+def engine(geo_dir):
+    return GeoEngine(str(geo_dir / "GeoLite2-City.mmdb"), str(geo_dir / "GeoLite2-ASN.mmdb"), workers=1)
+
+
+def test_lookup_batch(geo_dir):
+    table = engine(geo_dir).lookup(["8.8.8.8", "81.2.69.160", "1.1.1.1"])
+    assert table.index.name == "ClientIP"
+    assert table.loc["8.8.8.8"].tolist() == ["United States", "Mountain View", 37.4, -122.0, 15169, "GOOGLE"]
+    assert table.loc["81.2.69.160", "ASN"] == 20712
+    assert table.loc["81.2.69.160", "ISP"] is None
+    assert table.loc["1.1.1.1"].tolist() == ["N/A"] * 6
+
+
+def test_network_sweep_matches_per_address_lookup(geo_dir):
+    networks, table = engine(geo_dir).lookup_networks(IPS)
+    assert networks[0] == networks[2] == "8.8.8.0/24"
+    assert networks[1] == networks[5] == "81.2.69.0/24"
+    assert networks[3] == networks[4] == "2a00:1450:4009::/48"
+    assert networks[-1] == ""
+    # One row per network block, not per address
+    assert table.index.is_unique
+    assert len(table) == len(set(networks) - {""})
+
+    valid = [ip for ip, network in zip(IPS, networks) if network]
+    expected = lookup_batch(valid, engine(geo_dir).city_db_path, engine(geo_dir).asn_db_path)
+    swept = table.loc[[network for network in networks if network]].set_axis(expected.index)
+    pd.testing.assert_frame_equal(swept, expected)
+
+
+def test_network_sweep_of_no_addresses(geo_dir):
+    networks, table = engine(geo_dir).lookup_networks(["", "bogus"])
+    assert networks == ["", ""]
+    assert table.empty
@@ -0,0 +1,46 @@
+import pandas as pd
+
+from geo_enrichment import GeoEnricher, load_msft_ip_ranges
+
+
+def make_enricher(geo_dir, by_network=False):
+    return GeoEnricher(
+        str(geo_dir / "GeoLite2-City.mmdb"), str(geo_dir / "GeoLite2-ASN.mmdb"),
+        load_msft_ip_ranges(str(geo_dir / "msft-public-ips.csv")), by_network=by_network
+    )
+
+
+def enrich(geo_dir, ips, by_network=False):
+    df = pd.DataFrame({"Operation": "MailItemsAccessed", "ResolvedClientIP": ips})
+    return make_enricher(geo_dir, by_network).enrich(df)
+
+
+def test_enrich_places_geo_columns_after_ip(geo_dir):
+    df = enrich(geo_dir, ["8.8.8.8"])
+    assert list(df.columns) == ["Operation", "ResolvedClientIP", "Country", "City", "ASN", "ISP"]
+    assert df.iloc[0][["Country", "City", "ASN", "ISP"]].tolist() == ["United States", "Mountain View", "15169", "GOOGLE"]
+
+
+def test_missing_asn_organization_is_na(geo_dir):
+    for by_network in (False, True):
+        df = enrich(geo_dir, ["81.2.69.160"], by_network=by_network)
+        assert df.loc[0, "ASN"] == "20712"
+        assert df.loc[0, "ISP"] == "N/A"
+
+
+def test_private_unknown_and_missing_ips(geo_dir):
+    df = enrich(geo_dir, ["10.0.0.1", "1.1.1.1", None, "40.90.1.1"])
+    assert df["Country"].tolist() == ["", "N/A", "", "N/A"]
+    # Public Microsoft address without an ASN record
+    assert df.loc[3, "ISP"] == "Microsoft"
+    assert df.loc[2, "ISP"] == ""
+
+
+def test_resolve_only_looks_up_new_ips(geo_dir, monkeypatch):
+    enricher = make_enricher(geo_dir)
+    enricher.enrich(pd.DataFrame({"ResolvedClientIP": ["8.8.8.8", "8.8.4.4"]}))
+    looked_up = []
+    lookup = enricher.engine.lookup
+    monkeypatch.setattr(enricher.engine, "lookup", lambda ips: looked_up.extend(ips) or lookup(ips))
+    enricher.enrich(pd.DataFrame({"ResolvedClientIP": ["8.8.8.8", "2a00:1450:4009::1"]}))
+    assert looked_up == ["2a00:1450:4009::1"]
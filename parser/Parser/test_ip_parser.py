@@ -0,0 +1,70 @@
+import importlib.util
+import os
+
+import pandas as pd
+import pytest
+
+
+@pytest.fixture(scope="module")
+def ip_parser():
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "IP-parser.py")
+    spec = importlib.util.spec_from_file_location("ip_parser", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_normalize_ip(ip_parser):
+    assert ip_parser.normalize_ip(" 8.8.8.8:50000 ") == "8.8.8.8"
+    assert ip_parser.normalize_ip("[2a00:1450:4009::1]:443") == "2a00:1450:4009::1"
+    assert ip_parser.normalize_ip("[2a00:1450:4009::1") == "2a00:1450:4009::1"
+    assert ip_parser.normalize_ip("2a00:1450:4009::1") == "2a00:1450:4009::1"
+
+
+def test_field_mode_reads_only_ip_fields(tmp_path, write_ual, ip_parser):
+    path = write_ual(tmp_path / "UAL.csv", [
+        {"Id": "r0", "Operation": "MailItemsAccessed", "ClientIP": "8.8.8.8:50000", "ClientIPAddress": "8.8.8.8"},
+        {"Id": "r1", "Operation": "UserLoggedIn", "ActorIpAddress": "[2A00:1450:4009::1]:443",
+         "clientip": "81.2.69.160"},
+        {"Id": "r2", "Operation": "FileAccessed", "ClientIP": "10.1.2.3", "ObjectId": "https://9.9.9.9/share"},
+        {"Id": "r3", "Operation": "Send", "ClientIP": "not an ip", "UserAgent": "Mozilla/5.0 Chrome/124.0.0.0"},
+    ])
+    # An IP column of a sign-in style export is read as well
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('r4,,,Send,,"{""Operation"": ""Send""}",1.1.1.1\n')
+    with open(path, "r+", encoding="utf-8") as f:
+        content = f.read().replace("AuditData\n", "AuditData,IPAddress\n", 1)
+        f.seek(0)
+        f.write(content)
+
+    ips = ip_parser.extract_ips_from_csv(str(path))
+    assert ips == sorted(["8.8.8.8", "2a00:1450:4009::1", "81.2.69.160", "1.1.1.1"])
+    # The legacy regex mode also picks up addresses outside the IP fields
+    assert "9.9.9.9" in ip_parser.extract_ips_from_csv(str(path), mode="regex")
+
+
+def test_field_mode_without_ip_fields(tmp_path, ip_parser):
+    path = tmp_path / "empty.csv"
+    path.write_text("RecordId,Operation\nr0,Send\n")
+    assert ip_parser.extract_ips_from_csv(str(path)) == []
+    path.write_text("")
+    assert ip_parser.extract_ips_from_csv(str(path)) == []
+
+
+def test_save_networks_to_csv_keeps_per_ip_file(tmp_path, geo_dir, ip_parser):
+    from geo_enrichment import geo_lookup_networks, load_msft_ip_ranges
+
+    ips = ["81.2.69.160", "81.2.69.161", "8.8.8.8"]
+    networks, table = geo_lookup_networks(ips, str(geo_dir / "GeoLite2-City.mmdb"), str(geo_dir / "GeoLite2-ASN.mmdb"),
+                                          load_msft_ip_ranges(str(geo_dir / "msft-public-ips.csv")))
+    per_ip_file, networks_file = tmp_path / "ips.csv", tmp_path / "networks.csv"
+    ip_parser.save_networks_to_csv(networks, table, output_file=str(per_ip_file), networks_file=str(networks_file))
+
+    # The per-IP file keeps the ClientIP column the UAL parser joins on
+    per_ip = pd.read_csv(per_ip_file).set_index("ClientIP")
+    assert list(per_ip.index) == ips
+    assert per_ip.loc["81.2.69.160", "Network"] == per_ip.loc["81.2.69.161", "Network"]
+    blocks = pd.read_csv(networks_file).set_index("Network")
+    assert blocks["IPCount"].sum() == len(ips)
+    assert blocks.loc[per_ip.loc["81.2.69.160", "Network"], "IPCount"] == 2
+    assert per_ip.loc["8.8.8.8", "Country"] == blocks.loc[per_ip.loc["8.8.8.8", "Network"], "Country"]
@@ -0,0 +1,90 @@
+import ipaddress
+import os
+
+import numpy as np
+
+from ip_ranges import IPRangeIndex, classify_ips, merge_intervals, public_mask
+
+PREFIXES = ["13.64.0.0/11", "13.80.0.0/12", "40.64.0.0/10", "2603:1000::/24", "2a01:111:f403::/48",
+            "2a01:111:f400:7e00::/120", "not-a-prefix"]
+IPS = ["13.64.0.1", "13.81.0.1", "13.96.0.0", "40.127.255.255", "8.8.8.8", "2603:10ff::1",
+       "2603:1100::1", "2a01:111:f403:c000::1", "2a01:111:f400:7e00::ff", "2a01:111:f400:7e00::1:0",
+       "::ffff:13.64.0.1", "", None, "bogus"]
+
+
+def expected_contains(prefixes, ips):
+    networks = []
+    for prefix in prefixes:
+        try:
+            networks.append(ipaddress.ip_network(prefix))
+        except ValueError:
+            continue
+    found = []
+    for ip in ips:
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            found.append(False)
+            continue
+        found.append(any(address in network for network in networks if network.version == address.version))
+    return found
+
+
+def test_contains_matches_ipaddress():
+    index = IPRangeIndex.from_prefixes(PREFIXES)
+    assert index.contains(IPS).tolist() == expected_contains(PREFIXES, IPS)
+    # The nested IPv4 prefix is merged into its parent; the /120 is a long IPv6 prefix
+    assert index.v4_starts.size == 2
+    assert len(index.v6_long) == 1
+
+
+def test_empty_index_and_input():
+    empty = IPRangeIndex.from_prefixes([])
+    assert len(empty) == 0
+    assert not empty.contains(IPS).any()
+    assert IPRangeIndex.from_prefixes(PREFIXES).contains([]).size == 0
+
+
+def test_merge_intervals():
+    starts, ends = merge_intervals(np.array([10, 1, 4, 20], dtype=np.uint32), np.array([12, 5, 8, 30], dtype=np.uint32))
+    assert starts.tolist() == [1, 10, 20]
+    assert ends.tolist() == [8, 12, 30]
+
+
+def test_load_rebuilds_cache_when_csv_changes(tmp_path):
+    csv_path = tmp_path / "msft-public-ips.csv"
+    csv_path.write_text("Prefix,Type\n13.64.0.0/11,Azure\n")
+    assert IPRangeIndex.load(str(csv_path)).contains(["13.64.0.1", "40.64.0.1"]).tolist() == [True, False]
+    cache_path = f"{csv_path}.index.npz"
+    assert os.path.exists(cache_path)
+    assert IPRangeIndex.load(str(csv_path)).contains(["13.64.0.1"]).tolist() == [True]
+
+    csv_path.write_text("Prefix,Type\n40.64.0.0/10,Azure\n2603:1000::/24,Azure\n")
+    index = IPRangeIndex.load(str(csv_path))
+    assert index.contains(["13.64.0.1", "40.64.0.1", "2603:1000::1"]).tolist() == [False, True, True]
+
+    # A damaged cache file is rebuilt
+    with open(cache_path, "wb") as f:
+        f.write(b"garbage")
+    assert IPRangeIndex.load(str(csv_path)).contains(["40.64.0.1"]).tolist() == [True]
+
+
+def test_classify_and_public_mask_match_ipaddress():
+    ips = ["8.8.8.8", "10.1.2.3", "127.0.0.1", "169.254.1.1", "224.0.0.1", "240.0.0.1", "0.0.0.0",
+           "192.0.2.5", "198.51.100.7", "2001:4860::8888", "fe80::1", "::1", "::", "ff02::1",
+           "::ffff:10.0.0.1", "::ffff:8.8.8.8", "2001:db8::1", "fc00::1", "", "bogus"]
+    flags = classify_ips(ips)
+    expected_public = []
+    for i, ip in enumerate(ips):
+        try:
+            address = ipaddress.ip_address(ip)
+        except ValueError:
+            assert not flags["valid"][i]
+            expected_public.append(False)
+            continue
+        for flag in ("private", "loopback", "link_local", "multicast", "reserved", "unspecified"):
+            assert flags[flag][i] == getattr(address, f"is_{flag}"), (ip, flag)
+        expected_public.append(not any(getattr(address, f"is_{flag}") for flag in (
+            "private", "loopback", "link_local", "multicast", "reserved", "unspecified")))
+    assert public_mask(ips).tolist() == expected_public
+    assert public_mask([]).size == 0
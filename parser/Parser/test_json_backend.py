@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+import json_backend
+from json_backend import BACKEND_LOADERS, PREFERRED_BACKENDS, available_backends, get_backend
+
+
+def not_installed():
+    raise ImportError("not installed")
+
+
+@pytest.fixture
+def no_override(monkeypatch):
+    monkeypatch.delenv("UAL_JSON_BACKEND", raising=False)
+
+
+def test_fastest_installed_backend_is_preferred(monkeypatch, no_override):
+    installed = available_backends()
+    assert installed[-1] == "json"
+    assert installed == [name for name in PREFERRED_BACKENDS if name in installed]
+    assert get_backend()[0] == installed[0]
+
+    # A missing backend is skipped in preference order
+    monkeypatch.setitem(BACKEND_LOADERS, "orjson", not_installed)
+    monkeypatch.setitem(BACKEND_LOADERS, "msgspec", not_installed)
+    assert available_backends() == ["json"]
+    assert get_backend()[0] == "json"
+
+
+def test_environment_override(monkeypatch):
+    monkeypatch.setenv("UAL_JSON_BACKEND", "json")
+    name, loads, errors = get_backend()
+    assert name == "json"
+    assert loads is json.loads
+    assert errors == (json.JSONDecodeError,)
+
+
+def test_unknown_or_missing_backend_falls_back_to_stdlib(monkeypatch, capsys, no_override):
+    assert get_backend("simdjson")[0] == "json"
+    assert "Unknown JSON backend 'simdjson'" in capsys.readouterr().out
+    monkeypatch.setitem(BACKEND_LOADERS, "orjson", not_installed)
+    assert get_backend("orjson")[0] == "json"
+    assert "JSON backend 'orjson' is not installed" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("name", available_backends())
+def test_backends_decode_alike_and_raise_their_decode_errors(name):
+    loads, errors = BACKEND_LOADERS[name]()
+    text = '{"Id": "r1", "LogonType": 0, "Size": 1.5, "Folders": [{"Path": "\\\\Inbox"}], "Flag": null}'
+    assert loads(text) == json.loads(text)
+    assert loads(text.encode("utf-8")) == json.loads(text)
+    for bad in ['{"Id": ', "not json", ""]:
+        with pytest.raises(errors):
+            loads(bad)
+
+
+def test_module_backend_is_usable():
+    assert json_backend.BACKEND_NAME in BACKEND_LOADERS
+    assert json_backend.loads('{"a": {"b": 1}}') == {"a": {"b": 1}}
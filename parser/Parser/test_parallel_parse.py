@@ -0,0 +1,93 @@
+import csv
+import io
+import json
+
+import pandas as pd
+import pytest
+
+from audit_flatten import iter_flattened_chunks
+from columnar_store import ChunkedParquetWriter
+from parallel_parse import ByteRangeReader, find_record_boundaries, parse_parallel, read_headers
+from parse_cache import ParseCache
+
+
+def make_records(n):
+    # Multi-line values with doubled quotes and commas once written as CSV
+    return [{"Id": f"r{i}", "Operation": "MailItemsAccessed", "Seq": i,
+             "Subject": f'line one\n"quoted" line {i}, with comma'} for i in range(n)]
+
+
+def read_range(path, start, end):
+    with open(path, "rb") as f:
+        f.seek(start)
+        return list(csv.reader(io.StringIO(f.read(end - start).decode("utf-8"), newline="")))
+
+
+@pytest.mark.parametrize("n_shards,block_size", [(2, 1 << 20), (7, 64), (40, 7)])
+def test_boundaries_never_split_quoted_records(tmp_path, write_ual, n_shards, block_size):
+    path = tmp_path / "UAL.csv"
+    write_ual(path, make_records(25), indent=2)
+    header_end, ranges = find_record_boundaries(str(path), n_shards, block_size=block_size)
+
+    assert read_headers(str(path), header_end) == read_range(path, 0, header_end)[0]
+    assert ranges[0][0] == header_end
+    assert ranges[-1][1] == path.stat().st_size
+    assert all(end == start for (_, end), (start, _) in zip(ranges, ranges[1:]))
+    assert len(ranges) > 1
+
+    rows = [row for start, end in ranges for row in read_range(path, start, end)]
+    assert [row[0] for row in rows] == [f"r{i}" for i in range(25)]
+    assert all(json.loads(row[-1])["Seq"] == i for i, row in enumerate(rows))
+
+
+def test_boundaries_of_header_only_and_empty_files(tmp_path):
+    (tmp_path / "header.csv").write_text("RecordId,Operation,AuditData\n")
+    assert find_record_boundaries(str(tmp_path / "header.csv"), 4) == (29, [])
+    (tmp_path / "empty.csv").write_text("")
+    assert find_record_boundaries(str(tmp_path / "empty.csv"), 4) == (0, [])
+
+
+def test_byte_range_reader_stops_at_range_end(tmp_path):
+    path = tmp_path / "data.bin"
+    path.write_bytes(bytes(range(256)) * 40)
+    with open(path, "rb") as f:
+        stream = io.BufferedReader(ByteRangeReader(f, 1000, 9000), buffer_size=64)
+        assert stream.read(10) == (bytes(range(256)) * 40)[1000:1010]
+        assert stream.read() == (bytes(range(256)) * 40)[1010:9000]
+        assert stream.read() == b""
+
+
+def parse(input_file, output_file, workers=None, cache=None):
+    writer = ChunkedParquetWriter(str(output_file))
+    if workers is None:
+        for df in iter_flattened_chunks(str(input_file), chunk_size=4):
+            writer.write(df)
+    else:
+        parse_parallel(str(input_file), writer, workers=workers, chunk_size=4, cache=cache)
+    writer.close()
+    if cache is not None:
+        cache.update(str(output_file))
+    return pd.read_parquet(output_file)
+
+
+def test_parallel_output_matches_sequential(tmp_path, write_ual):
+    write_ual(tmp_path / "UAL.csv", make_records(60), indent=2)
+    sequential = parse(tmp_path / "UAL.csv", tmp_path / "seq.parquet")
+    parallel = parse(tmp_path / "UAL.csv", tmp_path / "par.parquet", workers=3)
+    assert parallel["Seq"].tolist() == list(range(60))
+    pd.testing.assert_frame_equal(parallel, sequential[parallel.columns])
+
+
+def test_parallel_cache_reuses_rows_in_order(tmp_path, write_ual):
+    write_ual(tmp_path / "UAL.csv", make_records(30), indent=2)
+    first = parse(tmp_path / "UAL.csv", tmp_path / "first.parquet", workers=2, cache=ParseCache(str(tmp_path / "cache")))
+
+    cache = ParseCache(str(tmp_path / "cache"))
+    again = parse(tmp_path / "UAL.csv", tmp_path / "again.parquet", workers=2, cache=cache)
+    assert cache.reused == 30
+    pd.testing.assert_frame_equal(again, first[again.columns])
+
+
+def test_parallel_empty_input(tmp_path):
+    (tmp_path / "UAL.csv").write_text("RecordId,Operation,AuditData\n")
+    assert parse(tmp_path / "UAL.csv", tmp_path / "out.parquet", workers=2).empty
@@ -0,0 +1,110 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+from audit_flatten import iter_flattened_batches, iter_flattened_chunks
+from columnar_store import ChunkedParquetWriter
+from parse_cache import HASH_COLUMN, ParseCache, record_hash
+
+
+def make_records(ids, version=0):
+    return [{"Id": f"r{i}", "Operation": "MailItemsAccessed", "Seq": i, "Version": version} for i in ids]
+
+
+def parse(input_file, output_file, cache=None, chunk_size=4):
+    writer = ChunkedParquetWriter(str(output_file))
+    if cache is None:
+        for df in iter_flattened_chunks(str(input_file), chunk_size=chunk_size):
+            writer.write(df)
+    else:
+        for df, positions, hit_positions, hit_hashes in iter_flattened_batches(
+                str(input_file), cache, batch_size=chunk_size):
+            writer.write(cache.fill(df, positions, hit_positions, hit_hashes))
+    writer.close()
+    if cache is not None:
+        cache.update(str(output_file))
+    return pd.read_parquet(output_file)
+
+
+@pytest.fixture
+def case(tmp_path):
+    return tmp_path, str(tmp_path / "cache")
+
+
+def test_record_hash_depends_on_id_and_audit_data():
+    assert record_hash("{}", "a") == record_hash("{}", "a")
+    assert record_hash("{}", "a") != record_hash("{}", "b")
+    assert record_hash('{"x": 1}', "a") != record_hash("{}", "a")
+
+
+def test_cached_rows_keep_input_order(case, write_ual):
+    tmp_path, cache_dir = case
+    write_ual(tmp_path / "a.csv", make_records(range(10)))
+    first = parse(tmp_path / "a.csv", tmp_path / "a.parquet", ParseCache(cache_dir))
+    assert first["Seq"].tolist() == list(range(10))
+
+    # Changed, new and reordered records mixed with cached ones
+    records = make_records([9, 0, 1]) + make_records([2], version=1) + make_records([3, 42, 5, 4, 43, 7, 6, 8])
+    write_ual(tmp_path / "b.csv", records)
+    cache = ParseCache(cache_dir)
+    cached = parse(tmp_path / "b.csv", tmp_path / "cached.parquet", cache)
+    fresh = parse(tmp_path / "b.csv", tmp_path / "fresh.parquet")
+
+    assert cache.reused == 9
+    assert cached["Seq"].tolist() == [9, 0, 1, 2, 3, 42, 5, 4, 43, 7, 6, 8]
+    assert cached["Version"].tolist() == fresh["Version"].tolist()
+    pd.testing.assert_frame_equal(cached, fresh[cached.columns])
+
+
+def test_fully_cached_run(case, write_ual):
+    tmp_path, cache_dir = case
+    write_ual(tmp_path / "a.csv", make_records(range(7)))
+    first = parse(tmp_path / "a.csv", tmp_path / "a.parquet", ParseCache(cache_dir))
+    cache = ParseCache(cache_dir)
+    again = parse(tmp_path / "a.csv", tmp_path / "again.parquet", cache)
+    assert cache.reused == 7
+    pd.testing.assert_frame_equal(first, again)
+
+
+def test_take_reads_across_row_groups(case, write_ual):
+    tmp_path, cache_dir = case
+    write_ual(tmp_path / "a.csv", make_records(range(12)))
+    # One row group per chunk of 4 records
+    parse(tmp_path / "a.csv", tmp_path / "a.parquet", ParseCache(cache_dir))
+    assert pq.ParquetFile(os.path.join(cache_dir, "records.parquet")).num_row_groups == 3
+
+    cache = ParseCache(cache_dir)
+    first = pd.read_parquet(tmp_path / "a.parquet")
+    hashes = first[HASH_COLUMN].to_numpy()[[11, 0, 5, 4, 10]]
+    assert cache.contains(hashes).all()
+    assert cache.take(hashes).column("Seq").to_pylist() == [11, 0, 5, 4, 10]
+
+
+def test_signature_change_invalidates_cache(case, write_ual):
+    tmp_path, cache_dir = case
+    write_ual(tmp_path / "a.csv", make_records(range(5)))
+    parse(tmp_path / "a.csv", tmp_path / "a.parquet", ParseCache(cache_dir, signature="full|geo=1:1"))
+
+    assert ParseCache(cache_dir, signature="full|geo=1:1").known.size == 5
+    # A new GeoIP/ASN build or another projection starts from scratch
+    assert ParseCache(cache_dir, signature="full|geo=2:1").known.size == 0
+    assert ParseCache(cache_dir, signature="id,operation|geo=1:1").known.size == 0
+
+
+def test_cache_without_positions_is_ignored(case, write_ual):
+    tmp_path, cache_dir = case
+    write_ual(tmp_path / "a.csv", make_records(range(5)))
+    parse(tmp_path / "a.csv", tmp_path / "a.parquet", ParseCache(cache_dir))
+    os.remove(os.path.join(cache_dir, "positions.npy"))
+    assert ParseCache(cache_dir).known.size == 0
+
+
+def test_empty_and_missing_cache(case, write_ual):
+    tmp_path, cache_dir = case
+    cache = ParseCache(cache_dir)
+    assert not cache.contains(np.array([1, 2], dtype=np.int64)).any()
+    write_ual(tmp_path / "empty.csv", [])
+    assert parse(tmp_path / "empty.csv", tmp_path / "empty.parquet", cache).empty
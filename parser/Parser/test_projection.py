@@ -0,0 +1,80 @@
+import zipfile
+
+import yaml
+
+from audit_flatten import flatten_audit_data
+from projection import ColumnProjection, columns_from_dashboard_export, load_projection
+
+CHARTS = {
+    "Logons_1.yaml": {"slice_name": "Logons", "params": {
+        "groupby": ["Country", "City"],
+        "metrics": [{"column": {"column_name": "OperationCount"}, "aggregate": "SUM"}, "count"],
+        "adhoc_filters": [{"subject": "Workload", "operator": "=="}],
+        "x_axis": "CreationDate",
+    }},
+    "Table_2.yaml": {"slice_name": "Table", "params": {
+        "all_columns": ["UserId", "Item.Subject"],
+        "temporal_columns_lookup": {"CreationDate": True},
+    }},
+    "Empty_3.yaml": {"slice_name": "Empty", "params": None},
+}
+EXPECTED = {"country", "city", "operationcount", "workload", "creationdate", "userid", "item.subject"}
+
+
+def write_export(root):
+    charts = root / "dashboard_export" / "charts"
+    charts.mkdir(parents=True)
+    for name, chart in CHARTS.items():
+        (charts / name).write_text(yaml.safe_dump(chart))
+    # Dataset definitions are not chart columns
+    (root / "dashboard_export" / "datasets").mkdir()
+    (root / "dashboard_export" / "datasets" / "logs.yaml").write_text(yaml.safe_dump({"params": {"groupby": ["X"]}}))
+    return root / "dashboard_export"
+
+
+def test_columns_from_export_folder_and_zip(tmp_path):
+    folder = write_export(tmp_path)
+    assert columns_from_dashboard_export(str(folder)) == EXPECTED
+
+    archive = tmp_path / "dashboard_export.zip"
+    with zipfile.ZipFile(archive, "w") as zf:
+        for path in folder.rglob("*.yaml"):
+            zf.write(path, f"dashboard_export/{path.relative_to(folder).as_posix()}")
+    assert columns_from_dashboard_export(str(archive)) == EXPECTED
+
+
+def test_load_projection(tmp_path):
+    assert load_projection() is None
+    assert load_projection(columns=[" ", ""]) is None
+
+    projection = load_projection(columns=["Item.ParentFolder.Path "], dashboard_export=str(write_export(tmp_path)))
+    assert {"item.subject", "item.parentfolder.path", "country"} <= projection.paths
+    # The columns the pipeline itself needs are always kept
+    assert {"clientip", "sessionid", "operation", "creationtime"} <= projection.paths
+
+
+def test_projection_flattens_only_allowed_paths():
+    record = {
+        "Id": "r1", "Operation": "Send", "ClientIP": "8.8.8.8", "OperationCount": 3,
+        "Item": {"Subject": "Invoice", "Id": "i1", "ParentFolder": {"Path": "\\Sent Items", "Id": "p1"}},
+        "Folders": [{"Id": "f1"}], "Extra": {"Value": 1},
+    }
+    projection = ColumnProjection(["item.subject", "ITEM.PARENTFOLDER", "operationcount"])
+    flat = projection.flatten(record)
+    assert flat == {
+        "Id": "r1", "Operation": "Send", "ClientIP": "8.8.8.8", "OperationCount": 3,
+        "Item.Subject": "Invoice", "Item.ParentFolder.Path": "\\Sent Items", "Item.ParentFolder.Id": "p1",
+    }
+    # Every projected value is what the full flattener gives for that path
+    full = flatten_audit_data(record)
+    assert all(full[name] == value for name, value in flat.items())
+    assert not projection.keep_raw
+    assert ColumnProjection(["AuditDataRaw"]).keep_raw
+
+
+def test_projection_keeps_rule_columns():
+    # The detection rules read the user agent columns even when no chart shows them
+    record = {"Operation": "UserLoggedIn", "ClientInfoString": "Client=REST;;axios/1.6.7", "UserAgent": "axios/1.6.7",
+              "ActorInfoString": "axios/1.6.7", "DeviceProperties": {"OS": "Windows 10"}}
+    flat = ColumnProjection(["country"]).flatten(record)
+    assert set(flat) == {"Operation", "ClientInfoString", "UserAgent", "ActorInfoString"}
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from audit_flatten import iter_flattened_chunks
+from columnar_store import ChunkedParquetWriter
+from schema_registry import SchemaRegistry, cast_column, infer_kind, widen
+
+
+def sparse_records(n=300):
+    records = []
+    for i in range(n):
+        record = {
+            "CreationTime": f"2024-05-01T10:{i // 60 % 60:02d}:{i % 60:02d}",
+            "Operation": "MailItemsAccessed",
+            "Workload": "Exchange",
+            "RecordType": 50,
+            "UserId": "a@contoso.com",
+        }
+        # Present on a few rows only, so from_records fills the gaps with NaN
+        if i % 7 == 0:
+            record["LogonType"] = i % 3
+            record["OperationCount"] = i
+            record["ExternalAccess"] = i % 2 == 0
+            record["Item"] = {"SizeInBytes": 1000 + i}
+        records.append(record)
+    return records
+
+
+def test_sparse_int_fields_are_int64_in_parquet(tmp_path, write_ual):
+    write_ual(tmp_path / "UAL.csv", sparse_records())
+    registry = SchemaRegistry()
+    writer = ChunkedParquetWriter(str(tmp_path / "out.parquet"))
+    for df in iter_flattened_chunks(str(tmp_path / "UAL.csv"), chunk_size=100):
+        writer.write(registry.apply(df))
+    assert writer.close() == 300
+
+    schema = pq.read_schema(tmp_path / "out.parquet")
+    assert schema.field("LogonType").type == pa.int64()
+    assert schema.field("OperationCount").type == pa.int64()
+    assert schema.field("Item.SizeInBytes").type == pa.int64()
+    assert schema.field("ExternalAccess").type == pa.bool_()
+    assert schema.field("CreationTime").type == pa.timestamp("ns")
+
+    df = pd.read_parquet(tmp_path / "out.parquet")
+    assert df["OperationCount"].dropna().tolist() == list(range(0, 300, 7))
+    assert df["LogonType"].isna().sum() == 300 - len(range(0, 300, 7))
+
+
+def test_apply_casts_float_and_bool_columns():
+    df = pd.DataFrame({
+        "Operation": ["MailItemsAccessed"] * 3,
+        "LogonType": [0.0, np.nan, 2.0],
+        "ExternalAccess": [1.0, 0.0, np.nan],
+        "Score": [0.5, 1.5, np.nan],
+    })
+    df = SchemaRegistry().apply(df)
+    assert str(df["LogonType"].dtype) == "Int64"
+    assert str(df["ExternalAccess"].dtype) == "boolean"
+    assert df["ExternalAccess"].tolist()[:2] == [True, False]
+    assert df["Score"].dtype == np.float64
+
+
+def test_apply_keeps_non_integral_floats():
+    df = pd.DataFrame({"Operation": ["MailItemsAccessed"] * 2, "LogonType": [1.5, np.nan]})
+    assert SchemaRegistry().apply(df)["LogonType"].dtype == np.float64
+
+
+def test_all_null_and_empty_columns():
+    df = pd.DataFrame({"Operation": ["MailItemsAccessed"] * 2, "LogonType": [np.nan, np.nan], "Empty": [None, None]})
+    df = SchemaRegistry().apply(df)
+    assert str(df["LogonType"].dtype) == "Int64"
+    assert df["Empty"].isna().all()
+    assert SchemaRegistry().apply(pd.DataFrame()).empty
+
+
+def test_cast_column_leaves_unfit_values():
+    series = pd.Series(["1", "two", None], dtype=object)
+    assert cast_column(series, "int") is series
+
+
+def test_infer_and_widen():
+    assert infer_kind([1, 2]) == "int"
+    assert infer_kind([1, 2.5]) == "float"
+    assert infer_kind([True, False]) == "bool"
+    assert infer_kind(["2024-05-01T10:00:00Z"]) == "datetime"
+    assert infer_kind([]) is None
+    assert widen("int", "float") == "float"
+    assert widen("int", "category") == "string"
+
+
+def test_save_and_reload(tmp_path):
+    path = tmp_path / "registry.json"
+    registry = SchemaRegistry(str(path))
+    registry.apply(pd.DataFrame({"Operation": ["MailItemsAccessed"], "Item.SizeInBytes": [10]}, dtype=object))
+    registry.save()
+    schemas = SchemaRegistry(str(path)).schemas
+    assert schemas["|MailItemsAccessed|"]["Item.SizeInBytes"] == {"kind": "int", "rows": 1}
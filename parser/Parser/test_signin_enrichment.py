@@ -0,0 +1,111 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+
+from geo_enrichment import load_msft_ip_ranges
+from signin_enrichment import SIGNIN_COLUMNS, collect_ips, enrich_signin_csv, http_lookup, offline_lookup
+
+# ipinfo-style answers of the stub server
+IPINFO = {
+    "1.1.1.1": {"ip": "1.1.1.1", "city": "Brisbane", "region": "Queensland", "country": "AU",
+                "org": "AS13335 Cloudflare, Inc."},
+    "9.9.9.9": {"ip": "9.9.9.9", "city": "Berkeley", "region": "California", "country": "US",
+                "org": "AS19281 Quad9"},
+}
+
+
+class IpinfoStub(BaseHTTPRequestHandler):
+    requests = []
+
+    def do_GET(self):
+        type(self).requests.append((time.monotonic(), self.path))
+        ip = self.path.split("/")[1]
+        if ip == "4.4.4.4":
+            self.send_response(429)
+            self.end_headers()
+            return
+        if ip not in IPINFO:
+            self.send_response(404)
+            self.end_headers()
+            return
+        body = json.dumps(IPINFO[ip]).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def ipinfo_url():
+    IpinfoStub.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), IpinfoStub)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_http_lookup(ipinfo_url):
+    table = http_lookup(["1.1.1.1", "9.9.9.9"], base_url=ipinfo_url, token="abc", workers=2, rate=100)
+    assert list(table.columns) == SIGNIN_COLUMNS
+    assert table.loc["1.1.1.1"].tolist() == ["Brisbane", "Queensland", "AU", "AS13335 Cloudflare, Inc."]
+    assert table.loc["9.9.9.9", "Country"] == "US"
+    assert sorted(path for _, path in IpinfoStub.requests) == ["/1.1.1.1/json?token=abc", "/9.9.9.9/json?token=abc"]
+
+
+def test_http_lookup_failures_stay_empty(ipinfo_url):
+    # 404 from the server, a rate-limited (429) answer and an unreachable host
+    table = http_lookup(["8.8.4.4", "4.4.4.4"], base_url=ipinfo_url, workers=2, rate=100)
+    assert (table == "").all().all()
+    unreachable = http_lookup(["1.1.1.1"], base_url="http://127.0.0.1:9", rate=100, timeout=2)
+    assert unreachable.loc["1.1.1.1"].tolist() == ["", "", "", ""]
+
+
+def test_http_lookup_is_rate_limited(ipinfo_url):
+    ips = ["1.1.1.1", "9.9.9.9"] * 3
+    http_lookup(ips, base_url=ipinfo_url, workers=6, rate=20)
+    times = sorted(t for t, _ in IpinfoStub.requests)
+    assert len(times) == 6
+    # Six requests at 20/s need at least five intervals of 50 ms, even with six threads
+    assert times[-1] - times[0] >= 5 * 0.05 * 0.9
+
+
+def test_offline_lookup_matches_http_format(geo_dir):
+    table = offline_lookup(
+        ["8.8.8.8", "81.2.69.160", "10.1.2.3", "1.1.1.1", "13.64.0.5"],
+        city_db_path=str(geo_dir / "GeoLite2-City.mmdb"), asn_db_path=str(geo_dir / "GeoLite2-ASN.mmdb"),
+        msft_ranges=load_msft_ip_ranges(str(geo_dir / "msft-public-ips.csv"))
+    )
+    assert table.loc["8.8.8.8"].tolist() == ["Mountain View", "California", "US", "AS15169 GOOGLE"]
+    # ASN without an organization name gives no Org
+    assert table.loc["81.2.69.160"].tolist() == ["London", "England", "GB", ""]
+    assert (table.loc[["10.1.2.3", "1.1.1.1"]] == "").all().all()
+    # Microsoft address without an ASN record
+    assert table.loc["13.64.0.5"].tolist() == ["", "", "", "Microsoft"]
+
+
+def test_enrich_signin_csv(tmp_path, geo_dir):
+    pd.DataFrame({
+        "UserPrincipalName": ["a@contoso.com", "b@contoso.com", "c@contoso.com"],
+        "IPAddress": ["8.8.8.8", " 81.2.69.160 ", ""],
+    }).to_csv(tmp_path / "SignInLogs.csv", index=False)
+    ips = collect_ips(tmp_path / "SignInLogs.csv")
+    assert ips == {"8.8.8.8", "81.2.69.160"}
+    lookup = offline_lookup(
+        ips, city_db_path=str(geo_dir / "GeoLite2-City.mmdb"), asn_db_path=str(geo_dir / "GeoLite2-ASN.mmdb"),
+        msft_ranges=load_msft_ip_ranges(str(geo_dir / "msft-public-ips.csv"))
+    )
+    rows = enrich_signin_csv(tmp_path / "SignInLogs.csv", tmp_path / "out.csv", lookup, chunk_size=2)
+    assert rows == 3
+    out = pd.read_csv(tmp_path / "out.csv", dtype=str, keep_default_na=False)
+    assert out["Country"].tolist() == ["US", "GB", ""]
+    assert out["City"].tolist() == ["Mountain View", "London", ""]
@@ -1,86 +1,102 @@
-import csv
-import json
-import pandas as pd
-import subprocess
 import os
-import sys
-
-all_rows = []
-
-# Read UAL CSV and flatten AuditData JSON
-input_file = os.getenv("UAL_INPUT_FILE", "UAL.csv")
-with open(input_file, 'r', encoding='utf-8') as file:
-    reader = csv.reader(file)
-    headers = next(reader) 
-    audit_data_index = headers.index("AuditData")
-
-    for line in reader:
-        try:
-            audit_data_raw = line[audit_data_index]
-            json_obj = json.loads(audit_data_raw)
-            flat = pd.json_normalize(json_obj)
-
-            base_row = {
-                headers[i]: line[i]
-                for i in range(len(headers))
-                if i != audit_data_index
-            }
-
-            flat_dict = flat.iloc[0].to_dict()
-
-            # Add raw AuditData for debugging
-            flat_dict["AuditDataRaw"] = audit_data_raw
-
-            # Combine ClientIP and ClientIPAddress
-            client_ip = flat_dict.get("ClientIP") or flat_dict.get("ClientIPAddress")
-            flat_dict["ResolvedClientIP"] = client_ip
-
-            merged = {**base_row, **flat_dict}
-            all_rows.append(merged)
-
-        except (json.JSONDecodeError, IndexError):
-            continue
-
-# Create flattened output
-final_df = pd.DataFrame(all_rows)
-final_df.to_excel('output_accessed.xlsx', index=False)
-
-# Remove previous geolocation file if exists
-geo_csv = 'public_ips_geolocation_accessed.csv'
-if os.path.exists(geo_csv):
-    os.remove(geo_csv)
-
-# Run IP geolocation script
-ip_parser_path = os.path.join(os.path.dirname(__file__), "IP-parser.py")
-try:
-    subprocess.run([sys.executable, ip_parser_path], check=True)
-except subprocess.CalledProcessError as e:
-    print(f"❌ Failed to run IP-parser.py: {e}")
-    raise
-
-# Reload enriched output and geolocation CSV
-df = pd.read_excel('output_accessed.xlsx')
-geo_df = pd.read_csv('public_ips_geolocation_accessed.csv')
-
-# Create lookup dictionary based on ClientIP
-geo_lookup = geo_df.set_index('ClientIP')[['Country', 'City', 'ASN', 'ISP']].to_dict(orient='index')
-
-# Add geolocation info based on ResolvedClientIP
-for col in ['Country', 'City', 'ASN', 'ISP']:
-    df[col] = df.apply(lambda row: geo_lookup.get(row.get('ResolvedClientIP'), {}).get(col, ""), axis=1)
-
-# Reorder columns to place Country, City, ASN, ISP right after ResolvedClientIP
-cols = list(df.columns)
-if 'ResolvedClientIP' in cols:
-    ip_index = cols.index('ResolvedClientIP')
-    for col in ['ISP', 'ASN', 'City', 'Country']:
-        if col in cols:
-            cols.remove(col)
-    for col in reversed(['Country', 'City', 'ASN', 'ISP']):
-        cols.insert(ip_index + 1, col)
-
-df = df[cols]  # Apply new column order
-
-# Save final enriched output
-output_file = os.getenv("UAL_OUTPUT_FILE", "output_accessed.xlsx")
-df.to_excel(output_file, index=False)
+from functools import partial
+from audit_flatten import iter_flattened_batches, iter_flattened_chunks
+from columnar_store import ChunkedParquetWriter
+from dedup import RecordDeduplicator
+from geo_cache import GeoCache
+from geo_enrichment import GeoEnricher, load_msft_ip_ranges
+from parallel_parse import parse_parallel
+from parse_cache import ParseCache
+from projection import load_projection
+from schema_registry import SchemaRegistry
+
+
+def enrich_chunk(df, geo):
+    # Add Country, City, ASN, ISP based on ResolvedClientIP
+    return geo.enrich(df, ip_column='ResolvedClientIP')
+
+
+def cache_signature(projection, geo):
+    # Cached records are only reused for the same columns, geo mode and GeoIP/ASN database builds
+    parts = [projection.signature if projection is not None else "full"]
+    try:
+        city_epoch, asn_epoch = geo.engine.epoch
+    except (OSError, ValueError):
+        city_epoch = asn_epoch = "none"
+    parts.append(f"geo={city_epoch}:{asn_epoch}")
+    if geo.by_network:
+        parts.append("network")
+    return "|".join(parts)
+
+
+def main():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    input_file = os.getenv("UAL_INPUT_FILE", "UAL.csv")
+    output_file = os.getenv("UAL_OUTPUT_FILE", "output_accessed.parquet")
+    chunk_size = int(os.getenv("UAL_CHUNK_SIZE", "50000"))
+    workers = int(os.getenv("UAL_PARSE_WORKERS", "1"))
+    registry_file = os.getenv("UAL_SCHEMA_REGISTRY", os.path.join(script_dir, "ual_schema_registry.json"))
+    cache_dir = os.getenv("UAL_PARSE_CACHE")
+    dedup_enabled = os.getenv("UAL_DEDUP", "1") != "0"
+    columns = [c for c in os.getenv("UAL_COLUMNS", "").split(",") if c.strip()]
+    dashboard_export = os.getenv("UAL_DASHBOARD_EXPORT")
+    geo_dir = os.getenv("UAL_GEO_DIR", script_dir)
+    geo_cache_file = os.getenv("UAL_GEO_CACHE", os.path.join(geo_dir, "geo_cache.sqlite"))
+    geo_by_network = os.getenv("UAL_GEO_BY_NETWORK", "0") == "1"
+
+    # Only extract the AuditData paths the dashboards need, when an allow-list is given
+    projection = load_projection(columns, dashboard_export)
+    if projection is not None:
+        print(f"🔎 Projection parse: extracting {len(projection.paths)} column path(s) from AuditData.")
+
+    # In-process GeoIP/ASN enrichment of the distinct IPs in each chunk
+    geo = GeoEnricher(
+        city_db_path=os.path.join(geo_dir, "GeoLite2-City.mmdb"),
+        asn_db_path=os.path.join(geo_dir, "GeoLite2-ASN.mmdb"),
+        msft_ranges=load_msft_ip_ranges(os.path.join(geo_dir, "msft-public-ips.csv")),
+        cache=GeoCache(geo_cache_file) if geo_cache_file != "0" else None,
+        by_network=geo_by_network
+    )
+    process_chunk = partial(enrich_chunk, geo=geo)
+
+    # Typed columns per Workload/Operation/RecordType, shared across cases
+    registry = SchemaRegistry(registry_file)
+
+    # Records already parsed in a previous run of this case are reused in place
+    cache = ParseCache(cache_dir, signature=cache_signature(projection, geo)) if cache_dir else None
+
+    # Read UAL CSV, flatten AuditData JSON, enrich and type it chunk by chunk
+    writer = ChunkedParquetWriter(output_file)
+    if workers > 1:
+        parse_parallel(input_file, writer, process_chunk, workers=workers, chunk_size=chunk_size,
+                       registry=registry, cache=cache, projection=projection)
+    elif cache is not None:
+        for df, positions, hit_positions, hit_hashes in iter_flattened_batches(
+                input_file, cache, batch_size=chunk_size, projection=projection):
+            if not df.empty:
+                df = registry.apply(process_chunk(df))
+            writer.write(cache.fill(df, positions, hit_positions, hit_hashes))
+    else:
+        for df in iter_flattened_chunks(input_file, chunk_size=chunk_size, projection=projection):
+            writer.write(registry.apply(process_chunk(df)))
+    registry.save()
+
+    if cache is not None:
+        print(f"♻️ Reused {cache.reused} unchanged record(s) from the parse cache.")
+
+    # Drop records repeated across merged or overlapping exports, keeping the first
+    dedup = RecordDeduplicator(f"{output_file}.dedup") if dedup_enabled else None
+
+    # Save final enriched output as a single typed Parquet file
+    total_rows = writer.close(row_filter=dedup.filter_table if dedup else None)
+    if dedup is not None:
+        print(f"🧹 Dropped {dedup.dropped} duplicate record(s).")
+        dedup.close()
+    print(f"✅ Saved {total_rows} parsed records to '{output_file}'")
+
+    if cache is not None:
+        cache.update(output_file)
+
+
+if __name__ == "__main__":
+    main()
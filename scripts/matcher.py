@@ -1,25 +1,389 @@
+import hashlib
 import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from tqdm import tqdm
 from openpyxl import load_workbook
-from openpyxl.styles import PatternFill
+import xlsxwriter
+from xlsxwriter.utility import xl_col_to_name
 import yaml
 
+# Data rows available on one worksheet (1,048,576 minus the header row)
+EXCEL_MAX_ROWS = 1048575
+
+# Columns shared by the main log and the analyzer outputs used for matching
+MATCH_KEYS = ["CREATIONTIME", "SESSIONID"]
+
+PROVENANCE_COLUMNS = ["ROW", "FILE", "KEY_TYPE", "KEY"]
+
+# Identity columns combined with CREATIONTIME by the as-of join mode
+COMPOSITE_KEYS = ["SESSIONID", "USERID"]
+COMPOSITE_PREFIX = "COMPOSITE:"
+KEY_SEPARATOR = "\x1f"
+
+# Bumped whenever the cached key format changes
+KEY_CACHE_VERSION = 2
+
+# Rows converted to Python values at a time while streaming the marked workbook
+XLSX_CHUNK_SIZE = 50000
+
+# Row group size of the marked Parquet file; the DB loader streams it one group at a time
+PARQUET_ROW_GROUP_SIZE = 100000
+
+# Integer and boolean columns are read as nullable dtypes, so NULLs do not turn them into float64
+NULLABLE_DTYPES = {
+    pa.int8(): pd.Int8Dtype(), pa.int16(): pd.Int16Dtype(), pa.int32(): pd.Int32Dtype(),
+    pa.int64(): pd.Int64Dtype(), pa.bool_(): pd.BooleanDtype(),
+}
+
+
+def normalize_name(name):
+    return str(name).encode('ascii', 'ignore').decode('ascii').strip().upper()
+
+
+def read_case_table(file_path):
+    """
+    Parsed case data as a DataFrame whose integer and boolean columns keep their Parquet types.
+    """
+    return pq.read_table(file_path).to_pandas(types_mapper=NULLABLE_DTYPES.get)
+
+
+def normalize_columns(df):
+    # Names that only differ by case (e.g. ClientIp/ClientIP) get the ".1", ".2"
+    # suffixes read_excel gives duplicate headers, so the frame stays writable to Parquet
+    columns = []
+    seen = {}
+    for col in df.columns:
+        name = normalize_name(col)
+        count = seen.get(name, 0)
+        seen[name] = count + 1
+        while count and f"{name}.{count}" in seen:
+            count += 1
+        columns.append(f"{name}.{count}" if count else name)
+        if count:
+            seen[columns[-1]] = 1
+    df.columns = columns
+    return df
+
+
+def normalize_key(series, key):
+    # Comparable form of a match key; missing values stay missing and never match.
+    # Each distinct value is normalized once and mapped back to the rows.
+    codes, uniques = pd.factorize(series)
+    uniques = pd.Series(uniques)
+    if key == "CREATIONTIME":
+        normalized = pd.to_datetime(uniques, errors="coerce").dt.strftime("%Y-%m-%d %H:%M:%S").astype("string")
+    else:
+        normalized = uniques.astype("string").str.strip().str.lower()
+    return pd.Series(normalized.array.take(codes, allow_fill=True), index=series.index)
+
+
+def normalize_time(series):
+    # Timestamps as naive UTC; values without a timezone are taken as UTC
+    return pd.to_datetime(series, errors="coerce", utc=True).dt.tz_localize(None)
+
+
+def composite_keys(df):
+    """
+    Row-wise (identity columns + CREATIONTIME) keys of an analyzer output for the
+    as-of join mode, as a (KEY_TYPE, KEY) frame, or None when it lacks the columns.
+    Each row is keyed on all of its non-empty identity columns.
+    """
+    by = [key for key in COMPOSITE_KEYS if key in df.columns]
+    if "CREATIONTIME" not in df.columns or not by:
+        return None
+    ids = pd.DataFrame({key: normalize_key(df[key], key) for key in by})
+    times = normalize_time(df["CREATIONTIME"]).dt.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+    frames = []
+    assigned = times.isna()
+    for subset in dict.fromkeys([tuple(by)] + [(key,) for key in by]):
+        rows = ids[list(subset)].notna().all(axis=1) & ~assigned
+        assigned |= rows
+        if not rows.any():
+            continue
+        parts = ids.loc[rows, list(subset)].assign(CREATIONTIME=times[rows]).drop_duplicates()
+        frames.append(pd.DataFrame({
+            "KEY_TYPE": COMPOSITE_PREFIX + "+".join(subset),
+            "KEY": parts.astype(str).agg(KEY_SEPARATOR.join, axis=1),
+        }))
+    if not frames:
+        return None
+    return pd.concat(frames, ignore_index=True)
+
+
+def read_key_columns(file_path, key_types):
+    """
+    Stream only the key columns of the first sheet of a workbook, or None when it has none of them.
+    """
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        positions = {}
+        for i, name in enumerate(next(rows, ())):
+            name = normalize_name(name) if name is not None else ""
+            if name in key_types and name not in positions:
+                positions[name] = i
+        if not positions:
+            return None
+        values = {key: [] for key in positions}
+        for row in rows:
+            for key, i in positions.items():
+                values[key].append(row[i] if i < len(row) else None)
+    finally:
+        wb.close()
+    return pd.DataFrame(values, dtype=object)
+
+
+def load_suspicious_keys(file_path, key_types):
+    """
+    Normalized match keys of one analyzer output as a (KEY_TYPE, KEY, FILE) frame,
+    or None when the file has none of the key columns.
+    """
+    df = read_key_columns(file_path, key_types)
+    if df is None:
+        return None
+    frames = [
+        pd.DataFrame({"KEY_TYPE": key, "KEY": normalize_key(df[key], key).dropna().unique()})
+        for key in df.columns if key in MATCH_KEYS
+    ]
+    frames.append(composite_keys(df))
+    frames = [frame for frame in frames if frame is not None]
+    if not frames:
+        return None
+    return pd.concat(frames, ignore_index=True).assign(FILE=file_path)
+
+
+class KeyCache:
+    """
+    Extracted keys of each analyzer output, stored as one parquet file per
+    (path, size, mtime). Unchanged workbooks are never opened again; entries
+    of workbooks that changed or disappeared are removed by prune().
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.used = set()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def entry(self, file_path):
+        stat = os.stat(file_path)
+        stamp = f"{KEY_CACHE_VERSION}|{os.path.abspath(file_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+        name = hashlib.sha1(stamp.encode("utf-8")).hexdigest() + ".parquet"
+        self.used.add(name)
+        return os.path.join(self.cache_dir, name)
+
+    def get(self, file_path):
+        # Cached (KEY_TYPE, KEY) frame, empty when the file had no key column, or None when not cached
+        entry = self.entry(file_path)
+        if not os.path.exists(entry):
+            return None
+        return pd.read_parquet(entry).assign(FILE=file_path)
+
+    def put(self, file_path, keys):
+        if keys is None:
+            keys = pd.DataFrame({"KEY_TYPE": pd.Series(dtype=str), "KEY": pd.Series(dtype=str)})
+        keys[["KEY_TYPE", "KEY"]].astype(str).to_parquet(self.entry(file_path), index=False)
+
+    def prune(self):
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".parquet") and name not in self.used:
+                os.remove(os.path.join(self.cache_dir, name))
+
+
+def load_all_suspicious_keys(suspicious_files, workers=None, cache=None):
+    """
+    Keys of all analyzer outputs, taken from the cache where possible and read
+    by a process pool otherwise. Returns one (KEY_TYPE, KEY, FILE) frame.
+    """
+    frames = []
+    to_read = []
+    for file_path in suspicious_files:
+        keys = cache.get(file_path) if cache is not None else None
+        if keys is None:
+            to_read.append(file_path)
+        elif keys.empty:
+            print(f"⚠️ Skipping {file_path} — no shared key.")
+        else:
+            frames.append(keys)
+    if cache is not None:
+        print(f"♻️ {len(suspicious_files) - len(to_read)} suspicious file(s) from cache, {len(to_read)} to read.")
+
+    if to_read:
+        workers = max(1, min(workers or os.cpu_count() or 1, len(to_read)))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # Every key column is extracted so cached entries serve any main log
+            futures = {executor.submit(load_suspicious_keys, f, MATCH_KEYS + COMPOSITE_KEYS): f for f in to_read}
+            for future in tqdm(as_completed(futures), total=len(futures), desc="📊 Loading suspicious keys"):
+                file_path = futures[future]
+                try:
+                    keys = future.result()
+                except Exception as e:
+                    print(f"❌ Error processing {file_path}: {e}")
+                    continue
+                if cache is not None:
+                    cache.put(file_path, keys)
+                if keys is None:
+                    print(f"⚠️ Skipping {file_path} — no shared key.")
+                    continue
+                frames.append(keys)
+
+    if not frames:
+        return pd.DataFrame(columns=["KEY_TYPE", "KEY", "FILE"])
+    return pd.concat(frames, ignore_index=True)
+
+
+def match_keys(log_keys, suspicious_keys):
+    """
+    Hash-join the normalized main-log keys against all suspicious keys at once.
+    Returns the provenance table: one (ROW, FILE, KEY_TYPE, KEY) entry per log
+    row, source file and key that matched it.
+    """
+    provenance = []
+    for key, values in log_keys.items():
+        file_keys = suspicious_keys.loc[suspicious_keys["KEY_TYPE"] == key]
+        if file_keys.empty:
+            continue
+        hits = values[values.isin(file_keys["KEY"].unique())]
+        hits = pd.DataFrame({"ROW": hits.index, "KEY": hits.to_numpy()})
+        provenance.append(hits.merge(file_keys, on="KEY")[PROVENANCE_COLUMNS])
+    if not provenance:
+        return pd.DataFrame(columns=PROVENANCE_COLUMNS)
+    return pd.concat(provenance, ignore_index=True).drop_duplicates()
+
+
+def match_asof(output_df, suspicious_keys, tolerance):
+    """
+    Composite-key join: each analyzer row is matched to every log row with the
+    same SESSIONID/USERID whose CREATIONTIME is at most `tolerance` away.
+    Log rows are sorted by (identity, time) and each analyzer row's time window
+    is found with two binary searches (an interval join). Returns the provenance
+    table like match_keys.
+    """
+    provenance = []
+    if "CREATIONTIME" not in output_df.columns:
+        return pd.DataFrame(columns=PROVENANCE_COLUMNS)
+    log_time = normalize_time(output_df["CREATIONTIME"])
+    log_ids = {}
+    tolerance = pd.Timedelta(tolerance).value
+
+    composite = suspicious_keys[suspicious_keys["KEY_TYPE"].str.startswith(COMPOSITE_PREFIX)]
+    for key_type, group in composite.groupby("KEY_TYPE"):
+        by = key_type[len(COMPOSITE_PREFIX):].split("+")
+        if any(key not in output_df.columns for key in by):
+            print(f"⚠️ Main log has no {', '.join(by)} column(s) — skipping {key_type} keys.")
+            continue
+
+        parts = group["KEY"].str.split(KEY_SEPARATOR, expand=True)
+        left_time = pd.to_datetime(parts[len(by)].to_numpy())
+        valid = ~left_time.isna()
+        if not valid.any():
+            continue
+        left_ids = parts.loc[valid, list(range(len(by)))].set_axis(by, axis=1)
+        for key in by:
+            if key not in log_ids:
+                log_ids[key] = normalize_key(output_df[key], key)
+        right_ids = pd.DataFrame({key: log_ids[key] for key in by})
+        right_ids = right_ids[log_time.notna().to_numpy() & right_ids.notna().all(axis=1).to_numpy()]
+
+        # One integer group per identity combination
+        groups = pd.MultiIndex.from_frame(left_ids).drop_duplicates()
+        left_group = groups.get_indexer(pd.MultiIndex.from_frame(left_ids)).astype("int64")
+        right_group = groups.get_indexer(pd.MultiIndex.from_frame(right_ids)).astype("int64")
+        in_group = right_group >= 0
+        right_rows = right_ids.index[in_group].to_numpy()
+        right_group = right_group[in_group]
+        right_time = log_time.loc[right_rows].to_numpy().astype("int64")
+        left_time = left_time[valid].to_numpy().astype("int64")
+
+        # Rank log times and window edges together, so (group, time) fits in one sortable int64
+        ranks = np.unique(np.concatenate([right_time, left_time - tolerance, left_time + tolerance]),
+                          return_inverse=True)[1]
+        width = len(ranks) + 1
+        n_right, n_left = len(right_time), len(left_time)
+        right_key = right_group * width + ranks[:n_right]
+        order = np.argsort(right_key, kind="stable")
+        right_key = right_key[order]
+        start = np.searchsorted(right_key, left_group * width + ranks[n_right:n_right + n_left], side="left")
+        end = np.searchsorted(right_key, left_group * width + ranks[n_right + n_left:], side="right")
+
+        # Expand every analyzer row into the log rows inside its window
+        counts = end - start
+        left_index = np.repeat(np.arange(n_left), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        matched = right_rows[order[np.repeat(start, counts) + offsets]]
+        provenance.append(pd.DataFrame({
+            "ROW": matched.astype("int64"),
+            "FILE": group["FILE"].to_numpy()[valid][left_index],
+            "KEY_TYPE": key_type,
+            "KEY": group["KEY"].to_numpy()[valid][left_index],
+        })[PROVENANCE_COLUMNS])
+
+    if not provenance:
+        return pd.DataFrame(columns=PROVENANCE_COLUMNS)
+    return pd.concat(provenance, ignore_index=True).drop_duplicates()
+
+
+def matched_sources(provenance, suspicious_files):
+    """
+    Source files of each matched row, in discovery order, as one "; "-joined string indexed by ROW.
+    """
+    file_order = {f: i for i, f in enumerate(suspicious_files)}
+    sources = provenance[["ROW", "FILE"]].drop_duplicates()
+    sources = sources.assign(ORDER=sources["FILE"].map(file_order)).sort_values(by=["ORDER", "ROW"])
+    return sources.groupby("ROW", sort=True)["FILE"].agg("; ".join).rename("Matched From")
+
+
+def write_marked_xlsx(df, file_path):
+    """
+    Stream the marked log to an .xlsx file row by row (xlsxwriter constant_memory mode)
+    and highlight suspicious rows with a single conditional-format rule.
+    """
+    workbook = xlsxwriter.Workbook(file_path, {
+        "constant_memory": True,
+        "strings_to_formulas": False,
+        "strings_to_urls": False,
+        "remove_timezone": True,
+        "default_date_format": "yyyy-mm-dd hh:mm:ss",
+    })
+    worksheet = workbook.add_worksheet()
+    worksheet.write_row(0, 0, list(df.columns), workbook.add_format({"bold": True, "border": 1}))
+
+    row = 1
+    for start in range(0, len(df), XLSX_CHUNK_SIZE):
+        chunk = df.iloc[start:start + XLSX_CHUNK_SIZE].astype(object)
+        for values in chunk.where(chunk.notna(), None).itertuples(index=False, name=None):
+            worksheet.write_row(row, 0, values)
+            row += 1
+
+    if "SUSPICIOUS" in df.columns and len(df):
+        suspicious_col = xl_col_to_name(df.columns.get_loc("SUSPICIOUS"))
+        worksheet.conditional_format(1, 0, len(df), len(df.columns) - 1, {
+            "type": "formula",
+            "criteria": f'=${suspicious_col}2="yes"',
+            "format": workbook.add_format({"bg_color": "#FFFF00"}),
+        })
+    workbook.close()
+
+
 def run_matcher(config):
 
     # --- Paths from config ---
     processed_dir = os.path.join(config["paths"]["current_case"], "processed")
-    output_access_file = os.path.join(processed_dir, "output_accessed.xlsx")
+    output_access_file = os.path.join(processed_dir, "output_accessed.parquet")
     output_matched_file = os.path.join(processed_dir, "matched_rows_from_suspicious_folders.xlsx")
-    output_marked_file = os.path.join(processed_dir, "output_accessed_marked.xlsx")
+    output_marked_file = os.path.join(processed_dir, "output_accessed_marked.parquet")
+    output_marked_xlsx = os.path.join(processed_dir, "output_accessed_marked.xlsx")
+    output_provenance_file = os.path.join(processed_dir, "matched_provenance.parquet")
+    export_xlsx = config.get("exports", {}).get("marked_xlsx", False)
+    matcher_config = config.get("matcher") or {}
     # --- Load main access log ---
-    output_df = pd.read_excel(output_access_file)
-    output_df.columns = output_df.columns.str.encode('ascii', 'ignore').str.decode('ascii')
-    output_df.columns = output_df.columns.str.strip().str.upper()
+    output_df = normalize_columns(read_case_table(output_access_file))
     output_df["SUSPICIOUS"] = "no"
 
-    matched_rows = []
-
     # --- Step 1: Find suspicious folders ---
     suspicious_roots = []
     for root, dirs, files in os.walk(processed_dir):
@@ -38,70 +402,56 @@ def run_matcher(config):
     print(f"📁 Found {len(suspicious_files)} suspicious .xlsx file(s).")
 
     # --- Step 3: Match ---
-    for file_path in tqdm(suspicious_files, desc="📊 Matching rows"):
-        try:
-            df = pd.read_excel(file_path)
-            df.columns = df.columns.str.encode('ascii', 'ignore').str.decode('ascii')
-            df.columns = df.columns.str.strip().str.upper()
-
-            required_keys = {"CREATIONTIME", "SESSIONID"}
-            available_keys = required_keys.intersection(df.columns).intersection(output_df.columns)
-
-            if not available_keys:
-                print(f"⚠️ Skipping {file_path} — no shared key.")
-                continue
-
-            mask = pd.Series(False, index=output_df.index)
-            for key in available_keys:
-                if key == "CREATIONTIME":
-                    df[key] = pd.to_datetime(df[key], errors="coerce").dt.strftime("%Y-%m-%d %H:%M:%S")
-                    output_df[key] = pd.to_datetime(output_df[key], errors="coerce").dt.strftime("%Y-%m-%d %H:%M:%S")
-                else:
-                    df[key] = df[key].astype(str).str.strip().str.lower()
-                    output_df[key] = output_df[key].astype(str).str.strip().str.lower()
-                
-                mask |= output_df[key].isin(df[key].dropna())
-
-            output_df.loc[mask, "SUSPICIOUS"] = "yes"
-            matched = output_df[mask]
-
-            for _, m in matched.iterrows():
-                matched_rows.append({
-                    "Matched From": file_path,
-                    **m.to_dict()
-                })
-
-        except Exception as e:
-            print(f"❌ Error processing {file_path}: {e}")
+    key_cache = KeyCache(os.path.join(processed_dir, "matcher_key_cache")) if matcher_config.get("key_cache", True) else None
+    suspicious_keys = load_all_suspicious_keys(suspicious_files, workers=matcher_config.get("workers"), cache=key_cache)
+    if key_cache is not None:
+        key_cache.prune()
+
+    # Normalize the main log's match keys once
+    log_keys = {key: normalize_key(output_df[key], key) for key in MATCH_KEYS if key in output_df.columns}
+    join_mode = matcher_config.get("join_mode", "exact")
+    if join_mode == "asof":
+        tolerance = pd.Timedelta(seconds=matcher_config.get("tolerance_seconds", 1))
+        print(f"🔗 As-of join on {'/'.join(COMPOSITE_KEYS)} + CREATIONTIME (±{tolerance.total_seconds():g}s)")
+        provenance = match_asof(output_df, suspicious_keys, tolerance)
+        # Files without a time column or without identity columns have no composite keys: match them exactly
+        composite_files = suspicious_keys.loc[suspicious_keys["KEY_TYPE"].str.startswith(COMPOSITE_PREFIX), "FILE"]
+        exact_keys = suspicious_keys[~suspicious_keys["FILE"].isin(composite_files.unique())]
+        if not exact_keys.empty:
+            print(f"🔗 Exact keys for {exact_keys['FILE'].nunique()} file(s) without composite keys")
+            provenance = pd.concat([provenance, match_keys(log_keys, exact_keys)], ignore_index=True).drop_duplicates()
+    else:
+        provenance = match_keys(log_keys, suspicious_keys)
+    output_df.loc[output_df.index.isin(provenance["ROW"]), "SUSPICIOUS"] = "yes"
+
+    # One report row per matched log row, listing every file that matched it
+    sources = matched_sources(provenance, suspicious_files)
+    matched_rows = output_df.loc[sources.index].reset_index(drop=True)
+    matched_rows.insert(0, "Matched From", sources.to_numpy())
 
     # --- Step 4: Save matched suspicious rows ---
-    if matched_rows:
-        df_result = pd.DataFrame(matched_rows)
+    if not matched_rows.empty:
+        df_result = matched_rows
         if "CREATIONTIME" in df_result.columns:
             df_result["CREATIONTIME"] = pd.to_datetime(df_result["CREATIONTIME"], errors='coerce')
             df_result = df_result.sort_values(by="CREATIONTIME")
         df_result.to_excel(output_matched_file, index=False)
         print(f"✅ Suspicious records saved to {output_matched_file}")
+        provenance.assign(ROW=provenance["ROW"].astype("int64")).to_parquet(output_provenance_file, index=False)
+        print(f"✅ Match provenance saved to {output_provenance_file}")
     else:
         print("⚠️ No suspicious records found.")
 
-    # --- Step 5: Save full output with highlights ---
-    output_df.to_excel(output_marked_file, index=False)
-    wb = load_workbook(output_marked_file)
-    ws = wb.active
-
-    suspicious_col = None
-    for i, col in enumerate(ws[1], start=1):
-        if col.value and str(col.value).strip().upper() == "SUSPICIOUS":
-            suspicious_col = i
-            break
-
-    if suspicious_col:
-        fill = PatternFill(start_color="FFFF00", end_color="FFFF00", fill_type="solid")
-        for row in ws.iter_rows(min_row=2):
-            if row[suspicious_col - 1].value == "yes":
-                for cell in row:
-                    cell.fill = fill
-
-    wb.save(output_marked_file)
-    print(f"✅ Full output with highlights saved to {output_marked_file}")
+    # --- Step 5: Save full output for the DB loader ---
+    output_df.to_parquet(output_marked_file, index=False, row_group_size=PARQUET_ROW_GROUP_SIZE)
+    print(f"✅ Full marked output saved to {output_marked_file}")
+
+    # --- Step 6: Optional analyst export with highlights ---
+    if not export_xlsx:
+        return
+    if len(output_df) > EXCEL_MAX_ROWS:
+        print(f"⚠️ Skipping {output_marked_xlsx} — {len(output_df)} rows exceed the Excel limit of {EXCEL_MAX_ROWS}.")
+        return
+
+    write_marked_xlsx(output_df, output_marked_xlsx)
+    print(f"✅ Full output with highlights saved to {output_marked_xlsx}")
@@ -0,0 +1,160 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import yaml
+
+# Registered rules in bit order: (bit, name, predicate, required columns)
+RULES = []
+
+INBOX_RULE_OPERATIONS = ["New-InboxRule", "Set-InboxRule", "UpdateInboxRules", "Enable-InboxRule"]
+
+
+def rule(bit, name, columns):
+    """
+    Register a detection rule. The predicate receives the case frame and the
+    rule settings and returns one boolean per row. Bits are fixed per rule so
+    RuleHits values stay comparable across cases.
+    """
+    def register(predicate):
+        RULES.append((bit, name, predicate, columns))
+        return predicate
+    return register
+
+
+def find_column(df, name):
+    # Column lookup that ignores case and surrounding whitespace
+    for col in df.columns:
+        if str(col).strip().lower() == name.lower():
+            return col
+    return None
+
+
+def map_unique(series, func):
+    # Evaluate a vectorized string function once per distinct value
+    codes, uniques = pd.factorize(series)
+    result = np.asarray(func(pd.Series(uniques, dtype=object)), dtype=bool)
+    return np.where(codes >= 0, result[codes] if len(result) else False, False)
+
+
+@rule(0, "axios_user_agent", ["ClientInfoString|UserAgent|ActorInfoString"])
+def axios_user_agent(df, settings):
+    hits = np.zeros(len(df), dtype=bool)
+    pattern = settings.get("user_agent_pattern", "axios")
+    for name in ("ClientInfoString", "UserAgent", "ActorInfoString"):
+        col = find_column(df, name)
+        if col is not None:
+            hits |= map_unique(df[col], lambda v: v.astype(str).str.contains(pattern, case=False, regex=True))
+    return hits
+
+
+@rule(1, "rare_operation", ["Operation"])
+def rare_operation(df, settings):
+    codes, uniques = pd.factorize(df[find_column(df, "Operation")])
+    if (codes < 0).all():
+        # Empty frame or every Operation missing: nothing to count
+        return np.zeros(len(df), dtype=bool)
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    return (codes >= 0) & (counts[codes] <= settings.get("rare_operation_max_count", 5))
+
+
+@rule(2, "new_asn_for_user", ["UserId", "ASN", "CreationTime"])
+def new_asn_for_user(df, settings):
+    frame = pd.DataFrame({
+        "user": df[find_column(df, "UserId")].astype(str).str.lower().to_numpy(),
+        "asn": df[find_column(df, "ASN")].astype(str).to_numpy(),
+        "time": pd.to_datetime(df[find_column(df, "CreationTime")], errors="coerce").to_numpy(),
+    })
+    known = ~frame["asn"].isin(["N/A", "nan", "None", "<NA>", ""])
+    frame = frame[known].sort_values("time", kind="stable")
+    # First appearance of an ASN for a user, except the user's very first ASN
+    first_pair = ~frame.duplicated(subset=["user", "asn"])
+    first_user = ~frame.duplicated(subset=["user"])
+    hits = np.zeros(len(df), dtype=bool)
+    hits[frame.index[first_pair & ~first_user]] = True
+    return hits
+
+
+@rule(3, "inbox_rule_creation", ["Operation"])
+def inbox_rule_creation(df, settings):
+    operations = settings.get("inbox_rule_operations", INBOX_RULE_OPERATIONS)
+    return map_unique(df[find_column(df, "Operation")], lambda v: v.isin(operations))
+
+
+def available(df, columns):
+    # Each entry names a required column; "A|B" means any one of them
+    return all(any(find_column(df, name) is not None for name in entry.split("|")) for entry in columns)
+
+
+def rule_names(bitmask, rules):
+    """
+    "; "-joined names of the rules set in each bitmask, computed once per distinct value.
+    """
+    codes, uniques = pd.factorize(bitmask)
+    labels = np.array(["; ".join(name for bit, name, _, _ in rules if value >> bit & 1) for value in uniques], dtype=object)
+    return labels[codes]
+
+
+def evaluate_rules(df, settings=None, select=None, workers=None):
+    """
+    Run the registered rules over the frame in a thread pool.
+    Returns (RuleHits bitmask per row, rules that ran, hit count per rule).
+    """
+    settings = settings or {}
+    selected = []
+    for entry in RULES:
+        bit, name, _, columns = entry
+        if select and name not in select:
+            continue
+        if not available(df, columns):
+            print(f"⚠️ Skipping rule '{name}' — missing column(s) {', '.join(columns)}.")
+            continue
+        selected.append(entry)
+
+    bitmask = np.zeros(len(df), dtype=np.int64)
+    counts = {}
+    if not selected:
+        return bitmask, selected, counts
+
+    with ThreadPoolExecutor(max_workers=workers or min(len(selected), os.cpu_count() or 1)) as executor:
+        futures = [(entry, executor.submit(entry[2], df, settings)) for entry in selected]
+        for (bit, name, _, _), future in futures:
+            hits = np.asarray(future.result(), dtype=bool)
+            bitmask |= hits.astype(np.int64) << bit
+            counts[name] = int(hits.sum())
+    return bitmask, selected, counts
+
+
+def run_rules(config):
+    """
+    Rules stage: add RuleHits (bitmask) and RuleNames columns to the parsed case data.
+    """
+    processed_dir = os.path.join(config["paths"]["current_case"], "processed")
+    output_access_file = os.path.join(processed_dir, "output_accessed.parquet")
+    rules_config = config.get("rules") or {}
+    if not rules_config.get("enabled", True):
+        print("⏭️ Rules engine disabled.")
+        return
+
+    # Only the new columns are added to the Arrow table; the other columns keep their Parquet types
+    table = pq.read_table(output_access_file)
+    table = table.drop([name for name in ("RuleHits", "RuleNames") if name in table.column_names])
+    df = table.to_pandas()
+    bitmask, selected, counts = evaluate_rules(
+        df, settings=rules_config, select=rules_config.get("select"), workers=rules_config.get("workers")
+    )
+    table = table.append_column("RuleHits", pa.array(bitmask, type=pa.int64()))
+    table = table.append_column("RuleNames", pa.array(rule_names(bitmask, selected), type=pa.string()))
+    pq.write_table(table, output_access_file)
+
+    print(f"🧭 Rules evaluated on {len(df)} row(s):")
+    for bit, name, _, _ in selected:
+        print(f"   bit {bit:<3}{name:<24}{counts[name]:>10} hit(s)")
+    print(f"✅ RuleHits saved to {output_access_file}")
+
+
+if __name__ == '__main__':
+    with open("config/settings.yaml", "r") as f:
+        run_rules(yaml.safe_load(f))
@@ -0,0 +1,228 @@
+import os
+
+import numpy as np
+import openpyxl
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from matcher import KeyCache, composite_keys, match_asof, normalize_columns, run_matcher, write_marked_xlsx
+
+
+def make_case(tmp_path, log, suspicious):
+    """
+    Case folder with a parsed log and one analyzer workbook per entry of `suspicious`.
+    """
+    processed = tmp_path / "case_test" / "processed"
+    os.makedirs(processed / "suspicious_items")
+    if isinstance(log, pa.Table):
+        # Written like the parser writes it, without pandas metadata
+        pq.write_table(log, processed / "output_accessed.parquet")
+    else:
+        log.to_parquet(processed / "output_accessed.parquet", index=False)
+    for name, frame in suspicious.items():
+        frame.to_excel(processed / "suspicious_items" / name, index=False)
+    return {"paths": {"current_case": str(tmp_path / "case_test")}}
+
+
+def read_marked(config):
+    return pd.read_parquet(os.path.join(config["paths"]["current_case"], "processed", "output_accessed_marked.parquet"))
+
+
+def test_normalize_columns_suffixes_case_duplicates():
+    df = pd.DataFrame([[1, 2, 3, 4]], columns=["ClientIP", "ClientIp", " clientip ", "SessionId"])
+    assert list(normalize_columns(df).columns) == ["CLIENTIP", "CLIENTIP.1", "CLIENTIP.2", "SESSIONID"]
+
+
+def test_normalize_columns_avoids_existing_suffix():
+    df = pd.DataFrame([[1, 2, 3]], columns=["Name.1", "Name", "NAME"])
+    assert list(normalize_columns(df).columns) == ["NAME.1", "NAME", "NAME.2"]
+
+
+def test_run_matcher_with_case_duplicate_columns(tmp_path):
+    log = pd.DataFrame({
+        "CreationTime": ["2024-05-01T10:00:00", "2024-05-01T10:05:00"],
+        "SessionId": ["s-1", "s-2"],
+        "ClientIP": ["8.8.8.8", "1.1.1.1"],
+        "ClientIp": ["8.8.8.8", None],
+    })
+    config = make_case(tmp_path, log, {"a.xlsx": pd.DataFrame({"SessionId": ["s-2"]})})
+    run_matcher(config)
+
+    marked = read_marked(config)
+    assert list(marked.columns) == ["CREATIONTIME", "SESSIONID", "CLIENTIP", "CLIENTIP.1", "SUSPICIOUS"]
+    assert marked["SUSPICIOUS"].tolist() == ["no", "yes"]
+    assert pq.ParquetFile(
+        os.path.join(config["paths"]["current_case"], "processed", "output_accessed_marked.parquet")
+    ).metadata.num_rows == 2
+
+
+def test_run_matcher_keeps_nullable_int_and_bool_columns(tmp_path):
+    log = pa.table({
+        "CreationTime": ["2024-05-01T10:00:00", "2024-05-01T10:05:00"],
+        "SessionId": ["s-1", "s-2"],
+        "LogonType": pa.array([0, None], type=pa.int64()),
+        "ExternalAccess": pa.array([None, True], type=pa.bool_()),
+    })
+    config = make_case(tmp_path, log, {"a.xlsx": pd.DataFrame({"SessionId": ["s-2"]})})
+    config["exports"] = {"marked_xlsx": True}
+    run_matcher(config)
+
+    schema = pq.read_schema(os.path.join(config["paths"]["current_case"], "processed", "output_accessed_marked.parquet"))
+    assert schema.field("LOGONTYPE").type == pa.int64()
+    assert schema.field("EXTERNALACCESS").type == pa.bool_()
+    assert read_marked(config)["LOGONTYPE"].tolist()[0] == 0
+
+
+def test_write_marked_xlsx_highlights_suspicious_rows(tmp_path):
+    df = pd.DataFrame({
+        "CREATIONTIME": pd.to_datetime(["2024-05-01 10:00:00", "2024-05-01 10:05:00", None]),
+        "LOGONTYPE": pd.array([0, None, 2], dtype="Int64"),
+        "SUBJECT": ["=SUM(A1)", "https://contoso.com", None],
+        "SUSPICIOUS": ["no", "yes", "no"],
+    })
+    write_marked_xlsx(df, tmp_path / "marked.xlsx")
+
+    worksheet = openpyxl.load_workbook(tmp_path / "marked.xlsx").active
+    rows = list(worksheet.iter_rows(values_only=True))
+    assert rows[0] == ("CREATIONTIME", "LOGONTYPE", "SUBJECT", "SUSPICIOUS")
+    # Strings are written as text, never as formulas or links
+    assert rows[1:] == [
+        (pd.Timestamp("2024-05-01 10:00:00"), 0, "=SUM(A1)", "no"),
+        (pd.Timestamp("2024-05-01 10:05:00"), None, "https://contoso.com", "yes"),
+        (None, 2, None, "no"),
+    ]
+    # One rule over the data rows instead of a format per suspicious row
+    rules = [(str(cf.sqref), rule.formula) for cf in worksheet.conditional_formatting for rule in cf.rules]
+    assert rules == [("A2:D4", ['$D2="yes"'])]
+
+
+def test_run_matcher_without_suspicious_files(tmp_path):
+    log = pd.DataFrame({"CreationTime": ["2024-05-01T10:00:00"], "SessionId": ["s-1"]})
+    config = make_case(tmp_path, log, {})
+    run_matcher(config)
+    assert read_marked(config)["SUSPICIOUS"].tolist() == ["no"]
+    assert not os.path.exists(os.path.join(config["paths"]["current_case"], "processed", "matched_provenance.parquet"))
+
+
+@pytest.mark.parametrize("key", ["CreationTime", "SessionId"])
+def test_run_matcher_exact_key(tmp_path, key):
+    log = pd.DataFrame({
+        "CreationTime": ["2024-05-01T10:00:00", "2024-05-01T10:05:00", None],
+        "SessionId": ["s-1", "s-2", None],
+    })
+    config = make_case(tmp_path, log, {"a.xlsx": log.iloc[[1]][[key]]})
+    run_matcher(config)
+    assert read_marked(config)["SUSPICIOUS"].tolist() == ["no", "yes", "no"]
+
+
+def asof_keys(rows):
+    df = normalize_columns(pd.DataFrame(rows))
+    return composite_keys(df).assign(FILE="a.xlsx")
+
+
+def test_match_asof_flags_every_row_in_window():
+    log = normalize_columns(pd.DataFrame({
+        "CreationTime": ["2024-05-01T10:00:00", "2024-05-01T10:00:01", "2024-05-01T09:59:59",
+                         "2024-05-01T10:00:03", "2024-05-01T10:00:00"],
+        "SessionId": ["s-1", "s-1", "S-1 ", "s-1", "s-2"],
+    }))
+    keys = asof_keys({"CreationTime": ["2024-05-01 10:00:00"], "SessionId": ["s-1"]})
+    provenance = match_asof(log, keys, pd.Timedelta(seconds=1))
+    assert sorted(provenance["ROW"]) == [0, 1, 2]
+    assert set(provenance["KEY_TYPE"]) == {"COMPOSITE:SESSIONID"}
+
+
+def test_match_asof_matches_brute_force():
+    rng = np.random.default_rng(1213)
+    base = pd.Timestamp("2024-05-01")
+    log = normalize_columns(pd.DataFrame({
+        "CreationTime": base + pd.to_timedelta(rng.integers(0, 120, 400), unit="s"),
+        "SessionId": rng.choice(["s-1", "s-2", "s-3", None], 400),
+        "UserId": rng.choice(["a@contoso.com", "b@contoso.com"], 400),
+    }))
+    analyzer = pd.DataFrame({
+        "CreationTime": base + pd.to_timedelta(rng.integers(0, 120, 40), unit="s"),
+        "SessionId": rng.choice(["s-1", "s-2", "s-9"], 40),
+        "UserId": rng.choice(["a@contoso.com", "b@contoso.com", None], 40),
+    })
+    tolerance = pd.Timedelta(seconds=3)
+    provenance = match_asof(log, asof_keys(analyzer), tolerance)
+
+    expected = set()
+    for _, key in normalize_columns(analyzer.copy()).iterrows():
+        same = log["SESSIONID"] == key["SESSIONID"]
+        if key["USERID"] is not None:
+            same &= log["USERID"] == key["USERID"]
+        near = (log["CREATIONTIME"] - key["CREATIONTIME"]).abs() <= tolerance
+        expected |= set(log.index[same & near])
+    assert set(provenance["ROW"]) == expected
+    assert len(expected) > 40
+
+
+def test_match_asof_without_keys_or_time():
+    log = normalize_columns(pd.DataFrame({"CreationTime": ["2024-05-01T10:00:00"], "SessionId": ["s-1"]}))
+    empty = pd.DataFrame(columns=["KEY_TYPE", "KEY", "FILE"])
+    assert match_asof(log, empty, pd.Timedelta(seconds=1)).empty
+    no_time = normalize_columns(pd.DataFrame({"SessionId": ["s-1"]}))
+    keys = asof_keys({"CreationTime": ["2024-05-01 10:00:00"], "SessionId": ["s-1"]})
+    assert match_asof(no_time, keys, pd.Timedelta(seconds=1)).empty
+
+
+def test_run_matcher_asof_falls_back_to_exact_keys(tmp_path):
+    log = pd.DataFrame({
+        "CreationTime": ["2024-05-01T10:00:00", "2024-05-01T10:05:00", "2024-05-01T10:09:00", "2024-05-01T10:10:00"],
+        "SessionId": ["s-1", "s-2", "s-3", "s-4"],
+    })
+    config = make_case(tmp_path, log, {
+        "both.xlsx": pd.DataFrame({"CreationTime": ["2024-05-01 10:00:01"], "SessionId": ["s-1"]}),
+        "session_only.xlsx": pd.DataFrame({"SessionId": ["s-2"]}),
+        "time_only.xlsx": pd.DataFrame({"CreationTime": ["2024-05-01 10:09:00"]}),
+    })
+    config["matcher"] = {"join_mode": "asof", "tolerance_seconds": 1}
+    run_matcher(config)
+    assert read_marked(config)["SUSPICIOUS"].tolist() == ["yes", "yes", "yes", "no"]
+    provenance = pd.read_parquet(os.path.join(config["paths"]["current_case"], "processed", "matched_provenance.parquet"))
+    assert sorted(provenance["KEY_TYPE"]) == ["COMPOSITE:SESSIONID", "CREATIONTIME", "SESSIONID"]
+
+
+def test_key_cache_hit_invalidation_and_prune(tmp_path):
+    workbook = tmp_path / "a.xlsx"
+    pd.DataFrame({"SessionId": ["s-1"]}).to_excel(workbook, index=False)
+    cache = KeyCache(str(tmp_path / "cache"))
+    assert cache.get(str(workbook)) is None
+
+    cache.put(str(workbook), pd.DataFrame({"KEY_TYPE": ["SESSIONID"], "KEY": ["s-1"], "FILE": [str(workbook)]}))
+    assert cache.get(str(workbook)).values.tolist() == [["SESSIONID", "s-1", str(workbook)]]
+    cache.put(str(workbook), None)
+    assert cache.get(str(workbook)).empty
+
+    # A rewritten workbook gets a new entry; the stale one goes on prune()
+    pd.DataFrame({"SessionId": ["s-1", "s-2"]}).to_excel(workbook, index=False)
+    os.utime(workbook, ns=(0, 0))
+    cache = KeyCache(str(tmp_path / "cache"))
+    assert cache.get(str(workbook)) is None
+    cache.put(str(workbook), pd.DataFrame({"KEY_TYPE": ["SESSIONID"], "KEY": ["s-2"]}))
+    cache.prune()
+    assert len(os.listdir(tmp_path / "cache")) == 1
+
+
+def test_run_matcher_reuses_and_refreshes_cached_keys(tmp_path, capsys):
+    log = pd.DataFrame({"CreationTime": ["2024-05-01T10:00:00", "2024-05-01T10:05:00"], "SessionId": ["s-1", "s-2"]})
+    config = make_case(tmp_path, log, {"a.xlsx": pd.DataFrame({"SessionId": ["s-1"]})})
+    run_matcher(config)
+    assert "0 suspicious file(s) from cache, 1 to read" in capsys.readouterr().out
+
+    run_matcher(config)
+    assert "1 suspicious file(s) from cache, 0 to read" in capsys.readouterr().out
+    assert read_marked(config)["SUSPICIOUS"].tolist() == ["yes", "no"]
+
+    workbook = os.path.join(config["paths"]["current_case"], "processed", "suspicious_items", "a.xlsx")
+    pd.DataFrame({"SessionId": ["s-2"]}).to_excel(workbook, index=False)
+    os.utime(workbook, ns=(0, 0))
+    run_matcher(config)
+    assert "0 suspicious file(s) from cache, 1 to read" in capsys.readouterr().out
+    assert read_marked(config)["SUSPICIOUS"].tolist() == ["no", "yes"]
+    cache_dir = os.path.join(config["paths"]["current_case"], "processed", "matcher_key_cache")
+    assert len(os.listdir(cache_dir)) == 1
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from rules_engine import evaluate_rules, rare_operation, rule_names, run_rules
+
+
+def test_rare_operation_counts_each_operation():
+    df = pd.DataFrame({"Operation": ["MailItemsAccessed"] * 3 + ["New-InboxRule", None]})
+    hits = rare_operation(df, {"rare_operation_max_count": 1})
+    assert hits.tolist() == [False, False, False, True, False]
+
+
+def test_rare_operation_all_null():
+    df = pd.DataFrame({"Operation": pd.Series([None, None, np.nan], dtype=object)})
+    assert rare_operation(df, {}).tolist() == [False, False, False]
+
+
+def test_rare_operation_empty():
+    df = pd.DataFrame({"Operation": pd.Series([], dtype=object)})
+    assert len(rare_operation(df, {})) == 0
+
+
+def test_evaluate_rules_sets_bits_and_names():
+    df = pd.DataFrame({
+        "Operation": ["New-InboxRule", "MailItemsAccessed", "MailItemsAccessed"],
+        "ClientInfoString": ["axios/1.6.7", "Outlook", None],
+    })
+    bitmask, selected, counts = evaluate_rules(df, settings={"rare_operation_max_count": 1}, workers=1)
+    names = rule_names(bitmask, selected)
+    assert bitmask.tolist() == [0b1011, 0, 0]
+    assert names[0] == "axios_user_agent; rare_operation; inbox_rule_creation"
+    assert names[1] == ""
+    assert counts["inbox_rule_creation"] == 1
+    # new_asn_for_user needs UserId/ASN/CreationTime and is skipped
+    assert "new_asn_for_user" not in counts
+
+
+def test_evaluate_rules_empty_frame():
+    df = pd.DataFrame({"Operation": pd.Series([], dtype=object), "ClientInfoString": pd.Series([], dtype=object)})
+    bitmask, selected, counts = evaluate_rules(df, workers=1)
+    assert len(bitmask) == 0
+    assert all(count == 0 for count in counts.values())
+
+
+def test_run_rules_keeps_parquet_types(tmp_path):
+    processed = tmp_path / "case_test" / "processed"
+    processed.mkdir(parents=True)
+    table = pa.table({
+        "Operation": ["New-InboxRule", "MailItemsAccessed", "MailItemsAccessed"],
+        "ClientInfoString": ["axios/1.6.7", "Outlook", None],
+        "LogonType": pa.array([0, None, 2], type=pa.int64()),
+        "ExternalAccess": pa.array([None, True, False], type=pa.bool_()),
+    })
+    pq.write_table(table, processed / "output_accessed.parquet")
+    config = {"paths": {"current_case": str(tmp_path / "case_test")}, "rules": {"rare_operation_max_count": 1}}
+
+    # A second run replaces the rule columns instead of adding them again
+    run_rules(config)
+    run_rules(config)
+    result = pq.read_table(processed / "output_accessed.parquet")
+    assert result.column_names == ["Operation", "ClientInfoString", "LogonType", "ExternalAccess", "RuleHits",
+                                   "RuleNames"]
+    assert result.schema.field("LogonType").type == pa.int64()
+    assert result.schema.field("ExternalAccess").type == pa.bool_()
+    assert result.column("LogonType").to_pylist() == [0, None, 2]
+    assert result.column("RuleHits").to_pylist() == [0b1011, 0, 0]
+    assert result.column("RuleNames").to_pylist()[1:] == ["", ""]